@@ -0,0 +1,300 @@
+"""
+End-to-end client benchmark against a local stand-in for Oobabooga.
+
+Starts a mock /v1/chat/completions server in a separate process, so the
+client's CPU time can be measured on its own, and streams synthetic (or
+recorded) SSE responses at a fixed token rate. Each response goes through the
+client pipeline `neu` runs, under asyncio: acall_api (up to the prefetched
+first event) -> aread_stream over AsyncSSEClient -> StreamState.handle, which
+renders into a null terminal and feeds the incremental Qwen tool call parser
+-> run_tool for the calls it found.
+
+    python benchmarks/bench_pipeline.py [--tokens N] [--rate TOK/S] [--chunk N]
+                                        [--tool-every N] [--runs N] [recording ...]
+
+Synthetic streams mix plain and **bold** text with a burst of Qwen
+<function=...> tool calls every --tool-every tokens. Recordings are raw SSE
+captures and are replayed --chunk events at a time.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from neumann.render import StreamRenderer
+from neumann.telemetry import RequestSpan
+
+STAGES = ("request", "sse", "decode", "render", "parse", "tools")
+
+
+# -----------------------------------------------------------------------------
+# Mock server (runs in its own process)
+# -----------------------------------------------------------------------------
+
+
+def synthetic_events(tokens, tool_every, tool_path):
+    """SSE events for a streamed answer with periodic tool-call bursts."""
+    words = ["The", " **quick**", " brown", " fox", " jumps", " over", " the", " dog."]
+    call = (
+        "\n<function=read>\n"
+        f"<parameter=path>{tool_path}</parameter>\n"
+        "<parameter=limit>20</parameter>\n"
+        "</function>\n"
+    )
+    pieces = []
+    for i in range(tokens):
+        pieces.append(words[i % len(words)])
+        if tool_every and (i + 1) % tool_every == 0:
+            # Tool calls arrive as a burst of small deltas, like real decoding.
+            pieces.extend(call[j : j + 4] for j in range(0, len(call), 4))
+    events = []
+    for piece in pieces:
+        chunk = {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion.chunk",
+            "choices": [{"index": 0, "delta": {"content": piece}}],
+        }
+        events.append(f"data: {json.dumps(chunk)}\n\n".encode())
+    events.append(b"data: [DONE]\n\n")
+    return events
+
+
+def recorded_events(path):
+    with open(path, "rb") as f:
+        data = f.read().replace(b"\r\n", b"\n")
+    return [event + b"\n\n" for event in data.split(b"\n\n") if event.strip()]
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        events, chunk, rate = self.server.events, self.server.chunk, self.server.rate
+        start = time.perf_counter()
+        try:
+            for i in range(0, len(events), chunk):
+                if rate:
+                    delay = start + i / rate - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                data = b"".join(events[i : i + chunk])
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def serve(events, chunk, rate, port_queue):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _MockHandler)
+    server.events, server.chunk, server.rate = events, chunk, rate
+    port_queue.put(server.server_port)
+    server.serve_forever()
+
+
+# -----------------------------------------------------------------------------
+# Client pipeline
+# -----------------------------------------------------------------------------
+
+
+class StageTimer:
+    """Accumulates wall and thread CPU time per stage."""
+
+    def __init__(self):
+        self.wall = dict.fromkeys(STAGES, 0.0)
+        self.cpu = dict.fromkeys(STAGES, 0.0)
+
+    def add(self, stage, wall, cpu):
+        self.wall[stage] += wall
+        self.cpu[stage] += cpu
+
+    def timed(self, func):
+        """func, with its wall and CPU time accumulated in `spent`."""
+        clock, cpu_clock = time.perf_counter, time.thread_time
+        spent = [0.0, 0.0]
+
+        def wrapper(*args):
+            w, c = clock(), cpu_clock()
+            try:
+                return func(*args)
+            finally:
+                spent[0] += clock() - w
+                spent[1] += cpu_clock() - c
+
+        return wrapper, spent
+
+
+async def run_once(main, strategy, timer, sink):
+    """One request through the pipeline; returns (content deltas, tool calls)."""
+    clock, cpu_clock = time.perf_counter, time.thread_time
+    renderer = StreamRenderer(sink, tty=True)
+
+    w, c = clock(), cpu_clock()
+    client = await main.acall_api([{"role": "user", "content": "bench"}])
+    if isinstance(client, dict):
+        raise SystemExit(f"API error: {client['error']}")
+    timer.add("request", clock() - w, cpu_clock() - c)
+
+    calls = []
+    span = RequestSpan()
+    state = main.StreamState(
+        parser=strategy.stream_parser(),
+        on_tool_call=calls.append,
+        span=span,
+        renderer=renderer,
+    )
+    # The stream loop is aread_stream's own; only the callbacks it makes are
+    # wrapped, so SSE time is what is left of the loop after handling.
+    state.handle, handled = timer.timed(state.handle)
+    renderer.write, rendered = timer.timed(renderer.write)
+    w, c = clock(), cpu_clock()
+    try:
+        await main.aread_stream(client, state=state)
+    finally:
+        client.close()
+    wall, cpu = clock() - w, cpu_clock() - c
+    # span.parse_time is wall time; parsing doesn't wait, so it stands for CPU too.
+    parse = span.parse_time
+    timer.add("sse", wall - handled[0], cpu - handled[1])
+    timer.add("render", *rendered)
+    timer.add("parse", parse, parse)
+    timer.add(
+        "decode", handled[0] - rendered[0] - parse, handled[1] - rendered[1] - parse
+    )
+
+    w, c = clock(), cpu_clock()
+    for tc in calls:
+        main.run_tool(tc["function"]["name"], json.loads(tc["function"]["arguments"]))
+    timer.add("tools", clock() - w, cpu_clock() - c)
+    return span.tokens, len(calls)
+
+
+async def run_all(main, strategy, sink, count):
+    """A warm-up run, then `count` timed ones, on one event loop (and connection)."""
+    await run_once(main, strategy, StageTimer(), sink)
+    runs = []
+    for _ in range(count):
+        timer = StageTimer()
+        wall, cpu = time.perf_counter(), time.process_time()
+        tokens, calls = await run_once(main, strategy, timer, sink)
+        runs.append(
+            (
+                timer,
+                time.perf_counter() - wall,
+                time.process_time() - cpu,
+                tokens,
+                calls,
+            )
+        )
+    return runs
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def bench(label, events, args):
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(
+        target=serve, args=(events, args.chunk, args.rate, port_queue), daemon=True
+    )
+    server.start()
+    try:
+        port = port_queue.get(timeout=10)
+        from neumann import main
+        from neumann.strategies import get_strategy
+
+        # Point acall_api at the mock server.
+        main.API_BACKENDS.close()
+        main.API_BACKENDS = main.BackendPool(
+            f"http://127.0.0.1:{port}/v1/chat/completions"
+        )
+        strategy = get_strategy("qwen")
+
+        sink = open(os.devnull, "w")
+        runs = asyncio.run(run_all(main, strategy, sink, args.runs))
+        sink.close()
+        tokens, calls = runs[-1][3:]
+    finally:
+        server.terminate()
+        server.join()
+
+    print(
+        f"{label}: {len(events) - 1} events, {calls} tool calls/run, {args.runs} runs"
+    )
+    print(f"  {'stage':<12} {'wall ms':>10} {'cpu ms':>10}")
+    for stage in STAGES:
+        wall = statistics.median(t.wall[stage] for t, *_ in runs) * 1000
+        cpu = statistics.median(t.cpu[stage] for t, *_ in runs) * 1000
+        print(f"  {stage:<12} {wall:10.2f} {cpu:10.2f}")
+    total_wall = statistics.median(r[1] for r in runs)
+    total_cpu = statistics.median(r[2] for r in runs)
+    print(f"  {'total':<12} {total_wall * 1000:10.2f} {total_cpu * 1000:10.2f}")
+    print(f"  client cpu   {total_cpu / tokens * 1e6:10.2f} us/token")
+    rss = peak_rss_mb()
+    if rss is not None:
+        print(f"  peak rss     {rss:10.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("recordings", nargs="*", help="Raw SSE captures to replay")
+    parser.add_argument("--tokens", type=int, default=5000)
+    parser.add_argument(
+        "--rate", type=float, default=0, help="Events per second (0: unthrottled)"
+    )
+    parser.add_argument("--chunk", type=int, default=1, help="Events per HTTP chunk")
+    parser.add_argument(
+        "--tool-every",
+        type=int,
+        default=500,
+        help="Tokens between tool calls (0: none)",
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tool_path = os.path.join(tmp, "target.py")
+        with open(tool_path, "w") as f:
+            f.writelines(f"line {i}\n" for i in range(1000))
+
+        streams = [(path, recorded_events(path)) for path in args.recordings]
+        if not streams:
+            label = f"synthetic ({args.tokens} tokens"
+            label += f" @ {args.rate:g}/s)" if args.rate else ", unthrottled)"
+            streams = [
+                (label, synthetic_events(args.tokens, args.tool_every, tool_path))
+            ]
+        for label, events in streams:
+            bench(label, events, args)
+
+
+if __name__ == "__main__":
+    main()
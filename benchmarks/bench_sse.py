@@ -0,0 +1,73 @@
+"""
+Micro-benchmark: neumann.sse.SSEClient vs the vendored sseclient-py parser.
+
+Replays recorded SSE streams (raw bytes as captured from the API) or, when no
+files are given, a synthetic Oobabooga chat-completion stream.
+
+    python benchmarks/bench_sse.py [--tokens N] [--chunk BYTES] [recording ...]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from neumann.sse import SSEClient
+from neumann.sse_client import SSEClient as VendoredSSEClient
+
+
+def synthetic_stream(tokens):
+    """Builds an OpenAI-style delta stream with `tokens` content chunks."""
+    out = []
+    for i in range(tokens):
+        chunk = {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion.chunk",
+            "choices": [{"index": 0, "delta": {"content": f" tok{i}"}}],
+        }
+        out.append(f"data: {json.dumps(chunk)}\n\n")
+    out.append("data: [DONE]\n\n")
+    return "".join(out).encode()
+
+
+def split(data, size):
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+def bench(client_cls, chunks, repeat):
+    best = float("inf")
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = sum(1 for _ in client_cls(iter(chunks)).events())
+        best = min(best, time.perf_counter() - start)
+    return best, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("recordings", nargs="*", help="Raw SSE captures to replay")
+    parser.add_argument("--tokens", type=int, default=50_000)
+    parser.add_argument("--chunk", type=int, default=1024, help="Bytes per read")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    streams = [(path, open(path, "rb").read()) for path in args.recordings]
+    if not streams:
+        streams = [(f"synthetic ({args.tokens} tokens)", synthetic_stream(args.tokens))]
+
+    for label, data in streams:
+        chunks = split(data, args.chunk)
+        new_t, new_n = bench(SSEClient, chunks, args.repeat)
+        old_t, old_n = bench(VendoredSSEClient, chunks, args.repeat)
+        print(f"{label}: {len(data) / 1e6:.1f} MB, {len(chunks)} chunks")
+        print(f"  vendored  {old_t * 1000:9.1f} ms  {old_n} events")
+        print(f"  sse       {new_t * 1000:9.1f} ms  {new_n} events")
+        print(f"  speedup   {old_t / new_t:9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
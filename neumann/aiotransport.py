@@ -0,0 +1,208 @@
+"""
+Keep-alive HTTP transport for the chat completions endpoint.
+
+Connections are kept in a small pool so each step of the agentic loop reuses
+the same TCP connection instead of reconnecting. This is a minimal HTTP/1.1
+client over asyncio streams, enough for the chat completions endpoint: one
+request per connection at a time, chunked or length-delimited bodies.
+Closing a response before its body is complete drops the TCP connection,
+which is how a generation is aborted: the backend notices the disconnect and
+stops decoding.
+"""
+
+import asyncio
+import http.client
+import io
+import urllib.parse
+
+_READ_SIZE = 64 * 1024
+
+# Errors that mean an idle pooled connection was closed by the server.
+_STALE_ERRORS = (asyncio.IncompleteReadError, ConnectionError)
+
+
+class AsyncResponse:
+    """Response whose body is read incrementally with read1() or `async for`."""
+
+    def __init__(self, pool, reader, writer, status, reason, headers, will_close):
+        self._pool = pool
+        self._reader = reader
+        self._writer = writer
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self._will_close = will_close
+        self._chunked = "chunked" in headers.get("Transfer-Encoding", "").lower()
+        length = headers.get("Content-Length")
+        self._remaining = int(length) if length and not self._chunked else None
+        self._chunk_left = 0
+        self._done = status in (204, 304) or self._remaining == 0
+
+    async def _io(self, coro):
+        return await asyncio.wait_for(coro, self._pool.read_timeout)
+
+    async def read1(self, n=_READ_SIZE):
+        """Returns the next available piece of the body, or b"" at its end."""
+        if self._done or self._writer is None:
+            return b""
+        reader = self._reader
+        if self._chunked:
+            if not self._chunk_left:
+                line = await self._io(reader.readline())
+                if not line:
+                    raise http.client.IncompleteRead(b"")
+                size = int(line.split(b";", 1)[0].strip() or b"0", 16)
+                if not size:
+                    while (await self._io(reader.readline())).strip():
+                        pass  # trailers
+                    self._done = True
+                    return b""
+                self._chunk_left = size
+            data = await self._io(reader.read(min(n, self._chunk_left)))
+            if not data:
+                raise http.client.IncompleteRead(b"")
+            self._chunk_left -= len(data)
+            if not self._chunk_left:
+                await self._io(reader.readexactly(2))
+            return data
+        if self._remaining is not None:
+            data = await self._io(reader.read(min(n, self._remaining)))
+            if not data:
+                raise http.client.IncompleteRead(b"")
+            self._remaining -= len(data)
+            self._done = not self._remaining
+            return data
+        data = await self._io(reader.read(n))
+        if not data:
+            self._done = True
+        return data
+
+    async def read(self):
+        parts = []
+        while True:
+            data = await self.read1()
+            if not data:
+                return b"".join(parts)
+            parts.append(data)
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        while True:
+            data = await self.read1()
+            if not data:
+                return
+            yield data
+
+    def close(self):
+        """Returns the connection to the pool if the body was read, else aborts it."""
+        writer, self._writer = self._writer, None
+        if writer is None:
+            return
+        if self._done and not self._will_close:
+            self._pool._release(self._reader, writer)
+        else:
+            writer.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+
+class AsyncConnectionPool:
+    """Pool of persistent asyncio connections to a single HTTP(S) endpoint."""
+
+    def __init__(self, url, connect_timeout=10.0, read_timeout=300.0, maxsize=4):
+        parsed = urllib.parse.urlsplit(url)
+        self.url = url
+        self.scheme = parsed.scheme or "http"
+        self.host = parsed.hostname
+        self.port = parsed.port or (443 if self.scheme == "https" else 80)
+        self.netloc = parsed.netloc
+        self.path = parsed.path or "/"
+        if parsed.query:
+            self.path += "?" + parsed.query
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.maxsize = maxsize
+        self._idle = []
+
+    async def _acquire(self):
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer, True
+            writer.close()
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                self.host, self.port, ssl=True if self.scheme == "https" else None
+            ),
+            self.connect_timeout,
+        )
+        return reader, writer, False
+
+    def _release(self, reader, writer):
+        if len(self._idle) < self.maxsize:
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+
+    async def _send(self, reader, writer, method, path, body, headers):
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.netloc}"]
+        if body is not None:
+            lines.append(f"Content-Length: {len(body)}")
+        lines += [f"{k}: {v}" for k, v in (headers or {}).items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        if body:
+            writer.write(body)
+        await writer.drain()
+        while True:
+            head = await asyncio.wait_for(
+                reader.readuntil(b"\r\n\r\n"), self.read_timeout
+            )
+            status_line, _, header_block = head.partition(b"\r\n")
+            version, status, reason = (
+                status_line.decode("latin-1").split(" ", 2) + [""]
+            )[:3]
+            if not 100 <= int(status) < 200:
+                break
+        headers = http.client.parse_headers(io.BytesIO(header_block))
+        will_close = (
+            version == "HTTP/1.0" or headers.get("Connection", "").lower() == "close"
+        )
+        return AsyncResponse(
+            self, reader, writer, int(status), reason, headers, will_close
+        )
+
+    async def request(self, method, body=None, headers=None, path=None):
+        """
+        Sends a request and returns an AsyncResponse with the body unread.
+        `path` defaults to the pool URL's path.
+        """
+        while True:
+            reader, writer, reused = await self._acquire()
+            try:
+                return await self._send(
+                    reader, writer, method, path or self.path, body, headers
+                )
+            except _STALE_ERRORS as err:
+                writer.close()
+                if reused:
+                    # The server dropped the idle connection; retry on a fresh one.
+                    continue
+                if isinstance(err, asyncio.IncompleteReadError):
+                    raise http.client.RemoteDisconnected(
+                        "Remote end closed connection without response"
+                    ) from None
+                raise
+            except BaseException:
+                writer.close()
+                raise
+
+    def close(self):
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
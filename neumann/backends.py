@@ -0,0 +1,169 @@
+"""
+Routing chat completion requests across several inference servers.
+
+Each backend keeps its own connection pool. A request goes to the healthy
+backend with the fewest requests in flight, except that a conversation sticks
+to the backend that served it last, so that server's prompt cache stays warm,
+unless it has fallen STICKY_SLACK requests behind the least busy one.
+
+A backend that refuses a connection or answers with a 5xx is marked down and
+left alone for a backoff period; after that it gets requests again (and is
+probed by check()). Callers fail over to another backend for any error that
+happens before the response starts streaming.
+"""
+
+import asyncio
+import http.client
+import threading
+import time
+
+from .aiotransport import AsyncConnectionPool
+
+STICKY_SLACK = 2  # in-flight requests a sticky backend may be behind the least busy one
+BACKEND_RETRY = 5.0  # seconds a failed backend is skipped; doubles per failure
+BACKEND_RETRY_MAX = 120.0
+BACKEND_HEALTH_INTERVAL = 15.0  # seconds between active health checks
+HEALTH_PATH = "/v1/models"
+
+# Request errors that mean the backend, not the request, is at fault.
+BACKEND_ERRORS = (OSError, asyncio.TimeoutError, http.client.HTTPException)
+
+
+def is_backend_failure(status):
+    """HTTP statuses worth retrying on another backend."""
+    return status >= 500 or status == 429
+
+
+class Backend:
+    def __init__(self, url, **timeouts):
+        self.url = url
+        self.async_pool = AsyncConnectionPool(url, **timeouts)
+        self.outstanding = 0  # requests routed here and not yet closed
+        self.served = 0
+        self.failures = 0  # consecutive
+        self.retry_at = 0.0  # monotonic time before which the backend is skipped
+
+    @property
+    def healthy(self):
+        return not self.failures
+
+    def available(self, now):
+        return not self.failures or now >= self.retry_at
+
+    def __repr__(self):
+        state = "up" if self.healthy else f"down ({self.failures} failures)"
+        return f"<Backend {self.url} {state}, {self.outstanding} in flight>"
+
+
+class TrackedResponse:
+    """Response wrapper that reports to the pool when it is closed."""
+
+    def __init__(self, response, on_close):
+        self._response = response
+        self._on_close = on_close
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+
+    def __getattr__(self, attr):
+        return getattr(self._response, attr)
+
+    def __aiter__(self):
+        return self._response.__aiter__()
+
+    def close(self):
+        self._response.close()
+        on_close, self._on_close = self._on_close, None
+        if on_close is not None:
+            on_close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+
+class BackendPool:
+    """The set of backends behind acall_api, shared by every conversation."""
+
+    def __init__(self, urls, **timeouts):
+        if isinstance(urls, str):
+            urls = [u.strip() for u in urls.split(",") if u.strip()]
+        self.backends = [Backend(url, **timeouts) for url in urls]
+        self._sticky = {}  # session key -> Backend
+        self._lock = threading.Lock()
+
+    def pick(self, session=None, exclude=()):
+        """
+        Chooses a backend for a request and counts it as in flight; None when
+        every backend has been excluded.
+        """
+        with self._lock:
+            now = time.monotonic()
+            candidates = [b for b in self.backends if b not in exclude]
+            if not candidates:
+                return None
+            # If everything is down, try anyway rather than fail without asking.
+            candidates = [b for b in candidates if b.available(now)] or candidates
+            least = min(b.outstanding for b in candidates)
+            backend = self._sticky.get(session)
+            if backend not in candidates or backend.outstanding > least + STICKY_SLACK:
+                backend = min(candidates, key=lambda b: (b.outstanding, b.served))
+            if session is not None:
+                self._sticky[session] = backend
+            backend.outstanding += 1
+            backend.served += 1
+            return backend
+
+    def release(self, backend):
+        with self._lock:
+            backend.outstanding -= 1
+
+    def track(self, backend, response):
+        """Wraps response so closing it releases the backend."""
+        return TrackedResponse(response, lambda: self.release(backend))
+
+    def failed(self, backend):
+        with self._lock:
+            backend.failures += 1
+            delay = min(BACKEND_RETRY * 2 ** (backend.failures - 1), BACKEND_RETRY_MAX)
+            backend.retry_at = time.monotonic() + delay
+
+    def succeeded(self, backend):
+        backend.failures = 0
+
+    async def _probe(self, backend):
+        pool = backend.async_pool
+
+        async def get():
+            response = await pool.request("GET", path=HEALTH_PATH)
+            async with response:
+                await response.read()
+            return response
+
+        try:
+            # A live server answers this at once, even while it is generating.
+            response = await asyncio.wait_for(get(), pool.connect_timeout)
+        except BACKEND_ERRORS:
+            self.failed(backend)
+            return
+        # Any answer means the server is up, except a gateway or overload error.
+        if response.status in (502, 503, 504):
+            self.failed(backend)
+        else:
+            self.succeeded(backend)
+
+    async def check(self):
+        """Probes every backend once, concurrently."""
+        await asyncio.gather(*(self._probe(b) for b in self.backends))
+
+    async def monitor(self, interval=BACKEND_HEALTH_INTERVAL):
+        """Runs check() every `interval` seconds until cancelled."""
+        while True:
+            await self.check()
+            await asyncio.sleep(interval)
+
+    def close(self):
+        for backend in self.backends:
+            backend.async_pool.close()
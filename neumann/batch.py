@@ -0,0 +1,331 @@
+"""
+Headless batch runs: `neu batch TASKS.jsonl`.
+
+Each line of the tasks file is a JSON object:
+
+    {"id": "fix-1", "prompt": "...", "cwd": "path/to/repo",
+     "tools": ["read", "grep", "edit"], "confirm": "deny", "timeout": 600}
+
+Only "prompt" is required. Every task runs as an independent session in its
+own worker process (tools resolve paths against the process cwd, and the
+caches are per session), at most --jobs at a time, so the backend sees a
+bounded number of concurrent requests. Confirm-gated tools follow the task's
+policy ("deny" unless set) instead of prompting.
+
+For each task the output directory gets:
+
+    <id>.transcript.jsonl  the conversation, one message per line, as it happens
+    <id>.log               the console output
+    <id>.trace.jsonl       telemetry spans (see --trace)
+    <id>.result.json       status, final answer and timings
+
+and summary.jsonl collects every result.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .constants import GREEN, RED, RESET, YELLOW
+from .shell import kill_group
+
+CONFIRM_POLICIES = ("deny", "allow")
+DEFAULT_BATCH_JOBS = 2
+DEFAULT_TASK_TIMEOUT = 1800.0  # seconds
+
+
+def _task_id(task, index):
+    raw = str(task.get("id") or f"task-{index + 1}")
+    return re.sub(r"[^\w.-]", "_", raw)
+
+
+class TaskFileError(ValueError):
+    pass
+
+
+def load_tasks(path):
+    """Parses the tasks file; raises TaskFileError naming the first bad line."""
+    base = os.path.dirname(os.path.abspath(path))
+    tasks = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                task = json.loads(line)
+            except json.JSONDecodeError as err:
+                raise TaskFileError(f"{path}:{number}: {err}") from None
+            if not isinstance(task, dict) or not isinstance(task.get("prompt"), str):
+                raise TaskFileError(f"{path}:{number}: a task needs a string 'prompt'")
+            if task.get("confirm", "deny") not in CONFIRM_POLICIES:
+                raise TaskFileError(
+                    f"{path}:{number}: confirm must be one of {CONFIRM_POLICIES}"
+                )
+            task["id"] = _task_id(task, len(tasks))
+            # Relative working directories are relative to the tasks file.
+            task["cwd"] = os.path.join(base, task.get("cwd") or ".")
+            tasks.append(task)
+    ids = [t["id"] for t in tasks]
+    duplicates = sorted({i for i in ids if ids.count(i) > 1})
+    if duplicates:
+        raise TaskFileError(f"{path}: duplicate task ids: {', '.join(duplicates)}")
+    return tasks
+
+
+# -----------------------------------------------------------------------------
+# Worker (one process per task)
+# -----------------------------------------------------------------------------
+
+
+class Transcript(list):
+    """A message list that appends each message to a JSONL file as it is added."""
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        with open(path, "w", encoding="utf-8"):
+            pass
+
+    def append(self, msg):
+        super().append(msg)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(msg, ensure_ascii=False) + "\n")
+
+
+async def _run_task(job):
+    """Runs the task's session and returns its result dict."""
+    from . import main
+    from .backends import BACKEND_ERRORS
+    from .context import ContextManager
+    from .executor import ToolExecutor
+    from .request import RequestBuilder
+    from .spool import get_spool
+    from .strategies import get_strategy
+    from .telemetry import telemetry
+    from .tools import TOOL_REGISTRY
+    from .walk import flush_indexes
+
+    task, out = job["task"], job["out"]
+    options = argparse.Namespace(**job["options"])
+    prefix = os.path.join(out, task["id"])
+    main.CONFIRM_POLICY = task.get("confirm", "deny")
+    bash = TOOL_REGISTRY["bash"]
+
+    if options.tool_dir:
+        main.load_external_tools(options.tool_dir)
+    if options.grep_index:
+        TOOL_REGISTRY["grep"].use_index = True
+    allowed = task.get("tools")
+    if allowed is not None:
+        for name in list(TOOL_REGISTRY):
+            if name not in allowed:
+                del TOOL_REGISTRY[name]
+
+    strategy = get_strategy("qwen")
+    system_prompt = options.system or strategy.get_system_prompt(TOOL_REGISTRY)
+    builder = RequestBuilder(
+        system_prompt,
+        ContextManager(options.context_budget, on_compact=main.TOOL_CACHE.forget),
+        cache_prompt=main.CACHE_PROMPT,
+    )
+    executor = ToolExecutor(TOOL_REGISTRY, main.run_tool)
+    messages = Transcript(prefix + ".transcript.jsonl")
+    telemetry.open_trace(prefix + ".trace.jsonl")
+
+    start = time.perf_counter()
+    status, error = "ok", None
+    messages.append({"role": "user", "content": task["prompt"]})
+    telemetry.begin_turn()
+    try:
+        await main.run_turn(messages, builder, strategy, executor, options)
+    except BACKEND_ERRORS as err:
+        status, error = "error", str(err) or type(err).__name__
+    except Exception as err:  # noqa: BLE001 - recorded in the result
+        status, error = "error", repr(err)
+    finally:
+        summary = telemetry.end_turn(status)
+        executor.shutdown()
+        bash.close()
+        get_spool().close()
+        flush_indexes()
+        main.API_BACKENDS.close()
+        telemetry.close()
+
+    last = messages[-1]
+    if status == "ok" and (last["role"] != "assistant" or last.get("tool_calls")):
+        # run_turn returns early when the API fails; it has printed why.
+        status, error = "error", "the agent loop stopped before a final answer"
+    return {
+        "id": task["id"],
+        "status": status,
+        "answer": last["content"] if last["role"] == "assistant" else None,
+        "error": error,
+        "messages": len(messages),
+        "duration_s": round(time.perf_counter() - start, 3),
+        "summary": summary,
+    }
+
+
+def worker_main():
+    """Runs the single task read from stdin; the process cwd is the task's."""
+    job = json.load(sys.stdin)
+    # Nothing may wait for a user, tools' child processes included.
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.close(devnull)
+    result = asyncio.run(_run_task(job))
+    prefix = os.path.join(job["out"], job["task"]["id"])
+    with open(prefix + ".result.json", "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+
+
+# -----------------------------------------------------------------------------
+# Coordinator
+# -----------------------------------------------------------------------------
+
+
+def _spawn(task, out, options, default_timeout):
+    """Runs one task in a worker process and returns its result dict."""
+    prefix = os.path.join(out, task["id"])
+    job = {"task": task, "out": out, "options": options}
+    timeout = float(task.get("timeout") or default_timeout)
+    # The worker runs in the task's directory; make sure it still finds us.
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    path = os.environ.get("PYTHONPATH")
+    env = dict(
+        os.environ,
+        PYTHONPATH=package_root + (os.pathsep + path if path else ""),
+    )
+    start = time.perf_counter()
+    with open(prefix + ".log", "wb") as log:
+        try:
+            proc = subprocess.Popen(
+                [sys.executable, "-m", "neumann.batch", "--worker"],
+                cwd=task["cwd"],
+                env=env,
+                stdin=subprocess.PIPE,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                start_new_session=hasattr(os, "killpg"),
+            )
+        except OSError as err:
+            return {"id": task["id"], "status": "error", "error": str(err)}
+        proc.stdin.write(json.dumps(job).encode())
+        proc.stdin.close()
+        try:
+            proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            if hasattr(os, "killpg"):
+                kill_group(proc)
+            else:
+                proc.kill()
+                proc.wait()
+            return {
+                "id": task["id"],
+                "status": "timeout",
+                "error": f"killed after {timeout:g}s",
+                "duration_s": round(time.perf_counter() - start, 3),
+            }
+    try:
+        with open(prefix + ".result.json", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {
+            "id": task["id"],
+            "status": "error",
+            "error": f"worker exited with status {proc.returncode}; see {prefix}.log",
+            "duration_s": round(time.perf_counter() - start, 3),
+        }
+
+
+def parse_batch_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="neu batch", description="Run tasks from a JSONL file unattended"
+    )
+    parser.add_argument("tasks", help="JSONL file with one task per line")
+    parser.add_argument(
+        "--out", default="neu-batch", help="Output directory (default: neu-batch)"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=DEFAULT_BATCH_JOBS,
+        help=f"Tasks run at once (default: {DEFAULT_BATCH_JOBS})",
+    )
+    parser.add_argument(
+        "--confirm",
+        choices=CONFIRM_POLICIES,
+        default="deny",
+        help="Policy for confirm-gated tools in tasks that don't set one",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_TASK_TIMEOUT,
+        help="Seconds before a task that doesn't set one is killed",
+    )
+    parser.add_argument("--system", type=str, default=None, help="Custom system prompt")
+    parser.add_argument("--tool-dir", type=str, default=None)
+    parser.add_argument("--early-stop", action="store_true")
+    parser.add_argument("--grep-index", action="store_true")
+    parser.add_argument(
+        "--context-budget",
+        type=int,
+        default=int(os.environ.get("NEU_CONTEXT_BUDGET", "0")),
+        metavar="TOKENS",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    args = parse_batch_args(argv)
+    try:
+        tasks = load_tasks(args.tasks)
+    except (OSError, ValueError) as err:
+        print(f"{RED}{err}{RESET}", file=sys.stderr)
+        return 2
+    out = os.path.abspath(args.out)
+    os.makedirs(out, exist_ok=True)
+    options = {
+        "system": args.system,
+        "tool_dir": args.tool_dir and os.path.abspath(args.tool_dir),
+        "early_stop": args.early_stop,
+        "grep_index": args.grep_index,
+        "context_budget": args.context_budget,
+        "raw": False,
+    }
+    for task in tasks:
+        task.setdefault("confirm", args.confirm)
+
+    print(f"{len(tasks)} tasks, {args.jobs} at a time -> {out}")
+    failed = 0
+    with ThreadPoolExecutor(max(args.jobs, 1)) as pool, open(
+        os.path.join(out, "summary.jsonl"), "w", encoding="utf-8"
+    ) as summary:
+        futures = [
+            pool.submit(_spawn, task, out, options, args.timeout) for task in tasks
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            summary.write(json.dumps(result, ensure_ascii=False) + "\n")
+            summary.flush()
+            ok = result["status"] == "ok"
+            failed += not ok
+            color = GREEN if ok else (YELLOW if result["status"] == "timeout" else RED)
+            detail = result.get("duration_s")
+            detail = f"{detail:.1f}s" if detail is not None else ""
+            if not ok and result.get("error"):
+                detail += f" ({result['error']})"
+            print(f"{color}⏺ {result['id']}: {result['status']}{RESET} {detail}")
+    print(f"{len(tasks) - failed}/{len(tasks)} tasks succeeded")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__" and sys.argv[1:] == ["--worker"]:
+    worker_main()
@@ -3,6 +3,9 @@ Neumann CLI Argument Parsing
 """
 
 import argparse
+import os
+
+from .constants import PLUGIN_MEMORY_MB, PLUGIN_TIMEOUT, SPOOL_THRESHOLD
 
 
 def parse_args():
@@ -16,7 +19,77 @@ def parse_args():
         default=None,
         help="Directory to load external tools from",
     )
+    parser.add_argument(
+        "--isolate-tools",
+        action="store_true",
+        help="Run --tool-dir tools in worker processes with a timeout and memory limit",
+    )
+    parser.add_argument(
+        "--tool-timeout",
+        type=float,
+        default=PLUGIN_TIMEOUT,
+        metavar="SECONDS",
+        help=f"Time limit per isolated tool call (default: {PLUGIN_TIMEOUT})",
+    )
+    parser.add_argument(
+        "--tool-memory",
+        type=int,
+        default=PLUGIN_MEMORY_MB,
+        metavar="MB",
+        help=f"Memory limit per tool worker, 0 for none (default: {PLUGIN_MEMORY_MB})",
+    )
     parser.add_argument(
         "--raw", action="store_true", help="Print raw API responses for debugging"
     )
+    parser.add_argument(
+        "--early-stop",
+        action="store_true",
+        help="Stop generating as soon as a tool call is complete",
+    )
+    parser.add_argument(
+        "--grep-index",
+        action="store_true",
+        help="Back grep with an on-disk trigram index of the workspace",
+    )
+    parser.add_argument(
+        "--repo-map",
+        action="store_true",
+        help="Put an outline of the workspace's Python symbols in the system prompt",
+    )
+    parser.add_argument(
+        "--context-budget",
+        type=int,
+        default=int(os.environ.get("NEU_CONTEXT_BUDGET", 0)),
+        metavar="TOKENS",
+        help="Compact the history sent to the API to fit this many tokens (0: no limit)",
+    )
+    parser.add_argument(
+        "--spool-threshold",
+        type=int,
+        default=int(os.environ.get("NEU_SPOOL_THRESHOLD", SPOOL_THRESHOLD)),
+        metavar="CHARS",
+        help="Spool tool results longer than this and send an excerpt (0: never)",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print latency, throughput and tool timings after each turn",
+    )
+    parser.add_argument(
+        "--trace",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="Append JSONL telemetry spans (requests, tools, turns) to FILE",
+    )
+    parser.add_argument(
+        "--persistent-shell",
+        action="store_true",
+        help="Run bash commands in one long-lived shell (cd and exports persist)",
+    )
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="Report the time spent loading each --tool-dir module",
+    )
     return parser.parse_args()
@@ -0,0 +1,83 @@
+"""
+Line input shared by the prompt loop and tool confirmations.
+
+input() blocks, so it runs on a daemon thread. Only one read is ever in
+flight: a caller that asks for a line while one is pending just shows its
+prompt and waits for the same line. A waiter can be cancelled (e.g. when a
+turn is interrupted at a confirmation prompt) without losing the terminal to
+an orphaned input() call.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class LineReader:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters = []
+        self._reading = False
+
+    def request(self, prompt=""):
+        """Returns a concurrent Future for the next line typed."""
+        future = Future()
+        with self._lock:
+            self._waiters.append(future)
+            start, self._reading = not self._reading, True
+        if start:
+            threading.Thread(target=self._read, args=(prompt,), daemon=True).start()
+        else:
+            print(prompt, end="", flush=True)
+        return future
+
+    def _read(self, prompt):
+        # Anything else input() raises still wakes the waiters, as end of
+        # input, before the thread reports it.
+        line, error = None, EOFError()
+        try:
+            line, error = input(prompt), None
+        except (EOFError, OSError, UnicodeDecodeError) as err:
+            error = err
+        finally:
+            self._deliver(line, error)
+
+    def _deliver(self, line, error):
+        with self._lock:
+            waiters, self._waiters = self._waiters, []
+            self._reading = False
+        for future in waiters:
+            if not future.set_running_or_notify_cancel():
+                continue
+            if error is None:
+                future.set_result(line)
+            else:
+                future.set_exception(error)
+
+    def cancel(self):
+        """Cancels every waiter; the pending read, if any, serves the next one."""
+        with self._lock:
+            waiters, self._waiters = self._waiters, []
+        for future in waiters:
+            future.cancel()
+
+
+_reader = LineReader()
+
+
+def read_line(prompt=""):
+    """Blocking input(), safe to call from any thread."""
+    return _reader.request(prompt).result()
+
+
+async def aread_line(prompt=""):
+    return await asyncio.wrap_future(_reader.request(prompt))
+
+
+def cancel_reads():
+    _reader.cancel()
+
+
+def read_pending():
+    """Whether a thread is still blocked in input()."""
+    return _reader._reading
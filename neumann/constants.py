@@ -1,5 +1,35 @@
+import os
+
 # API Configuration (Oobabooga)
 DEFAULT_API_URL = "http://127.0.0.1:5000/v1/chat/completions"
+DEFAULT_CONNECT_TIMEOUT = 10.0  # seconds to establish the TCP connection
+DEFAULT_READ_TIMEOUT = 300.0  # seconds to wait for any data (covers prompt prefill)
+
+# On-disk caches (indexes etc.), one subdirectory per workspace
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "neumann"
+)
+
+# Tool execution
+DEFAULT_TOOL_WORKERS = 8  # threads for concurrent read-only tool calls
+GLOB_RESULT_LIMIT = 100  # default number of paths glob returns
+READ_BYTE_BUDGET = 100_000  # characters a single read returns before it stops
+READ_MAX_LINE_CHARS = 2000  # longer lines are cut (minified files, data dumps)
+BASH_TIMEOUT = 30  # default seconds before a bash command's process group is killed
+BASH_MAX_TIMEOUT = 600  # upper bound for the timeout the model may ask for
+BASH_OUTPUT_BYTES = 32 * 1024  # output kept per command (head and tail halves)
+SPOOL_THRESHOLD = 30_000  # characters; longer tool results go to the session spool
+SPOOL_EXCERPT_LINES = 20  # lines shown from each end of a spooled result
+SPOOL_EXCERPT_CHARS = 2000  # cap on each end of the excerpt
+EDIT_CHUNK_BYTES = 1024 * 1024  # bytes the edit tool reads at a time
+PLUGIN_WORKERS = 2  # worker processes for --isolate-tools
+PLUGIN_TIMEOUT = 120  # default seconds an isolated tool call may take
+PLUGIN_MEMORY_MB = 2048  # default address-space limit of an isolated tool worker
+SEARCH_RESULTS = 5  # default number of chunks the search tool returns
+SEARCH_MAX_RESULTS = 20
+SEARCH_BYTES = 12_000  # characters of snippets a search returns
+REPO_MAP_CHARS = 6000  # size of the --repo-map outline in the system prompt
+TOOL_CACHE_BYTES = 16 * 1024 * 1024  # characters of read-only results kept per session
 
 # ANSI colors
 RESET, BOLD, DIM, ITALIC = "\033[0m", "\033[1m", "\033[2m", "\033[3m"
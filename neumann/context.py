@@ -0,0 +1,213 @@
+"""
+Token budgeting for the conversation sent to the API.
+
+The full history stays in memory; each request is built from a compacted view
+of it that fits the budget. Old tool results are replaced by short stubs first
+(oldest first), then whole turns are dropped from the start of the session and
+replaced by a one-message summary of what the user asked. The system prompt
+and the latest exchange are always sent as they are.
+"""
+
+import json
+
+CHARS_PER_TOKEN = 3  # errs high for code, which tokenizes worse than prose
+MESSAGE_OVERHEAD = 4  # role markers and separators added by the chat template
+COMPACT_TARGET = 0.75  # share of the budget a compaction brings the history down to
+SUMMARY_MAX_REQUESTS = 20  # dropped user requests listed in the summary
+SUMMARY_REQUEST_CHARS = 100
+
+
+def estimate_tokens(text):
+    """Default token estimator: a character count, rounded up."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class ContextReport:
+    """What was sent on one request."""
+
+    __slots__ = (
+        "budget",
+        "changed_at",
+        "compacted",
+        "dropped",
+        "messages",
+        "reused",
+        "tokens",
+    )
+
+    def __init__(self, tokens, budget, messages, compacted=0, dropped=0):
+        self.tokens = tokens
+        self.budget = budget
+        self.messages = messages
+        self.compacted = compacted  # tool results replaced by stubs
+        self.dropped = dropped  # turns replaced by the summary
+        self.reused = None  # tokens shared with the previous request's prefix
+        self.changed_at = None  # first message that differs from the previous request
+
+    def __str__(self):
+        text = f"~{self.tokens:,}"
+        if self.budget:
+            text += f"/{self.budget:,}"
+        text += f" tokens, {self.messages} messages"
+        if self.reused:
+            text += f", ~{self.tokens - self.reused:,} new"
+        if self.compacted:
+            text += f", {self.compacted} tool results compacted"
+        if self.dropped:
+            text += f", {self.dropped} turns dropped"
+        if self.budget and self.tokens > self.budget:
+            text += " (over budget)"
+        return text
+
+
+def _turn_starts(messages):
+    """Indexes of the messages the user typed, where each turn starts."""
+    return [
+        i
+        for i, msg in enumerate(messages)
+        if i == 0 or (msg["role"] == "user" and isinstance(msg["content"], str))
+    ]
+
+
+def _stub(msg):
+    content = msg.get("content") or ""
+    return {
+        **msg,
+        "content": (
+            f"[{msg.get('name', 'tool')} result compacted: "
+            f"{content.count(chr(10)) + 1} lines, {len(content)} chars. "
+            "Run the tool again if you still need it.]"
+        ),
+    }
+
+
+def _summary(messages, starts):
+    requests = [
+        messages[i]["content"]
+        for i in starts
+        if messages[i]["role"] == "user" and isinstance(messages[i]["content"], str)
+    ]
+    lines = [
+        (
+            f"[{len(starts)} earlier turns were dropped to fit the context "
+            "window. The user had asked:"
+        )
+    ]
+    if len(requests) > SUMMARY_MAX_REQUESTS:
+        lines.append(f"- ... ({len(requests) - SUMMARY_MAX_REQUESTS} more)")
+        requests = requests[-SUMMARY_MAX_REQUESTS:]
+    for request in requests:
+        request = " ".join(request.split())
+        if len(request) > SUMMARY_REQUEST_CHARS:
+            request = request[:SUMMARY_REQUEST_CHARS] + "..."
+        lines.append(f"- {request}")
+    return {"role": "user", "content": "\n".join(lines) + "]"}
+
+
+class ContextManager:
+    """
+    Builds request payloads within a token budget (0 means unlimited).
+
+    `estimate` is any callable mapping text to a token count, e.g. a real
+    tokenizer's length function. `on_compact`, if given, is called with each
+    tool message as it is stubbed or dropped.
+
+    Compaction decisions are sticky: once a tool result has been stubbed or a
+    turn dropped, it stays that way for the rest of the session, and each
+    compaction goes down to COMPACT_TARGET of the budget. Between compactions
+    the payload only grows at the end, so the backend can keep reusing its
+    cached prompt prefix.
+    """
+
+    def __init__(self, budget=0, estimate=estimate_tokens, on_compact=None):
+        self.budget = budget
+        self.estimate = estimate
+        self.on_compact = on_compact
+        self.reset()
+
+    def reset(self):
+        self._first = None  # first message of the history the state applies to
+        self._stubbed = 0  # tool results before this history index are stubs
+        self._dropped = 0  # turns replaced by the summary
+
+    def message_tokens(self, msg):
+        content = msg.get("content") or ""
+        if not isinstance(content, str):
+            content = json.dumps(content)
+        tokens = MESSAGE_OVERHEAD + self.estimate(content)
+        for tc in msg.get("tool_calls", ()):
+            function = tc["function"]
+            arguments = function["arguments"]
+            if not isinstance(arguments, str):
+                arguments = json.dumps(arguments)
+            tokens += self.estimate(function["name"]) + self.estimate(arguments)
+        return tokens
+
+    def _compacted(self, messages):
+        if self.on_compact is not None:
+            for msg in messages:
+                if msg["role"] == "tool":
+                    self.on_compact(msg)
+
+    def build(self, system_prompt, messages):
+        """Returns (payload messages, ContextReport) for the history."""
+        if not messages or messages[0] is not self._first:
+            self.reset()  # a new or cleared conversation
+            self._first = messages[0] if messages else None
+
+        system = {"role": "system", "content": system_prompt}
+        view = list(messages)
+        costs = [self.message_tokens(m) for m in view]
+        starts = _turn_starts(view)
+        compacted = 0
+
+        def stub(i):
+            nonlocal compacted
+            if view[i]["role"] != "tool":
+                return
+            msg = _stub(view[i])
+            cost = self.message_tokens(msg)
+            if cost < costs[i]:
+                view[i], costs[i] = msg, cost
+                compacted += 1
+
+        def measure():
+            first = starts[self._dropped] if self._dropped else 0
+            summary = _summary(view, starts[: self._dropped]) if self._dropped else None
+            tokens = self.message_tokens(system) + sum(costs[first:])
+            if summary is not None:
+                tokens += self.message_tokens(summary)
+            return tokens, summary, first
+
+        for i in range(min(self._stubbed, len(view))):
+            stub(i)
+        total, summary, first = measure()
+
+        if self.budget and total > self.budget:
+            target = self.budget * COMPACT_TARGET
+            # Never touched: the current turn's last assistant message and what
+            # follows (the results the model is about to read).
+            last = starts[-1] if starts else 0
+            protected = max(
+                (i for i in range(last, len(view)) if view[i]["role"] == "assistant"),
+                default=last,
+            )
+            while total > target and self._stubbed < protected:
+                stub(self._stubbed)
+                self._compacted(messages[self._stubbed : self._stubbed + 1])
+                self._stubbed += 1
+                total, summary, first = measure()
+            while total > target and self._dropped < len(starts) - 1:
+                self._dropped += 1
+                self._compacted(
+                    messages[starts[self._dropped - 1] : starts[self._dropped]]
+                )
+                total, summary, first = measure()
+
+        payload = [system]
+        if summary is not None:
+            payload.append(summary)
+        payload.extend(view[first:])
+        return payload, ContextReport(
+            total, self.budget, len(payload), compacted, self._dropped
+        )
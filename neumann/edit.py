@@ -0,0 +1,143 @@
+"""
+Streaming find-and-replace for the edit tool.
+
+The file is read in EDIT_CHUNK_BYTES pieces and written to a temporary file
+beside it as matches are replaced, so memory stays bounded however large the
+file is. The last len(old) - 1 bytes of each piece are carried into the next
+one, so a match that straddles two pieces is still found. The temporary file
+takes the original's mode and owner and replaces it with an atomic rename
+only once the whole file has been written: a failed or refused edit leaves
+the original untouched. Symlinks are resolved first, so the edit goes to the
+file they point to; a file with other hard links is copied over in place
+instead of renamed, so every link still sees the same file.
+"""
+
+import os
+import shutil
+import tempfile
+
+from .constants import EDIT_CHUNK_BYTES
+
+_CRLF_SNIFF_BYTES = 8192
+
+
+def open_temp(path, like=None):
+    """
+    A new temporary file beside path (or the file path links to), opened
+    for binary writing, with the mode and owner of `like` (default: path)
+    or, for a new file, the usual mode. Returns (file object, temporary path).
+    """
+    directory = os.path.dirname(os.path.realpath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".neu-", suffix=".tmp", dir=directory)
+    try:
+        try:
+            st = os.stat(like or path)
+        except FileNotFoundError:
+            # What open() would give a new file, not mkstemp's 0600.
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        else:
+            mode = st.st_mode & 0o7777
+            if hasattr(os, "chown"):
+                try:
+                    os.chown(tmp, st.st_uid, st.st_gid)
+                except OSError:
+                    pass  # not ours to give away; the file becomes ours
+        os.chmod(tmp, mode)
+        return os.fdopen(fd, "wb"), tmp
+    except BaseException:
+        os.close(fd)
+        os.unlink(tmp)
+        raise
+
+
+def install(tmp, path):
+    """
+    Puts the temporary file tmp in place of path (a resolved path, see
+    os.path.realpath): atomically by rename, or, when path has other hard
+    links, by copying tmp into it.
+    """
+    try:
+        links = os.stat(path).st_nlink
+    except FileNotFoundError:
+        links = 1
+    if links > 1:
+        with open(tmp, "rb") as src, open(path, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.unlink(tmp)
+    else:
+        os.replace(tmp, path)
+
+
+def _replace_stream(src, dst, old, new, replace_all, chunk_size):
+    """
+    Copies src to dst replacing old with new (all occurrences, or the first
+    one). Returns how many non-overlapping occurrences src has; once a
+    single replacement finds a second one, the rest is only counted.
+    """
+    count = 0
+    keep = len(old) - 1
+    buf = b""
+    writing = True
+    while True:
+        chunk = src.read(chunk_size)
+        buf += chunk
+        start = 0
+        while True:
+            i = buf.find(old, start)
+            if i == -1:
+                break
+            count += 1
+            if writing:
+                dst.write(buf[start:i])
+                if replace_all or count == 1:
+                    dst.write(new)
+                else:
+                    writing = False  # not unique; the output is discarded
+            start = i + len(old)
+        if not chunk:
+            if writing:
+                dst.write(buf[start:])
+            return count
+        # Carry over what could still be the start of a match.
+        cut = max(start, len(buf) - keep)
+        if writing:
+            dst.write(buf[start:cut])
+        buf = buf[cut:]
+
+
+def replace_in_file(path, old, new, replace_all=False, chunk_size=EDIT_CHUNK_BYTES):
+    """
+    Replaces old with new in the file at path (bytes). Returns the number of
+    occurrences found; the file is changed only if that is at least one and,
+    unless replace_all, exactly one.
+    """
+    if not old:
+        raise ValueError("old must not be empty")
+    path = os.path.realpath(path)
+    out, tmp = open_temp(path)
+    try:
+        with open(path, "rb") as src, out:
+            count = _replace_stream(src, out, old, new, replace_all, chunk_size)
+        if count and (replace_all or count == 1):
+            install(tmp, path)
+            tmp = None
+        return count
+    finally:
+        if tmp is not None:
+            os.unlink(tmp)
+
+
+def edit_file(path, old, new, replace_all=False):
+    """
+    replace_in_file for text from the model. Its newlines are matched as
+    CRLF in files that use CRLF.
+    """
+    old_b, new_b = old.encode("utf-8"), new.encode("utf-8")
+    if b"\n" in old_b and b"\r\n" not in old_b:
+        with open(path, "rb") as f:
+            if b"\r\n" in f.read(_CRLF_SNIFF_BYTES):
+                old_b = old_b.replace(b"\n", b"\r\n")
+                new_b = new_b.replace(b"\r\n", b"\n").replace(b"\n", b"\r\n")
+    return replace_in_file(path, old_b, new_b, replace_all)
@@ -0,0 +1,125 @@
+"""
+Tool execution for a single assistant turn.
+
+Tools that declare `read_only = True` (and don't need confirmation) may run
+concurrently on a thread pool; everything else runs one at a time, in order,
+and acts as a barrier, so a read never races a write issued before it.
+Tools can also set `max_concurrency` to cap how many of their calls run at once.
+"""
+
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .constants import DEFAULT_TOOL_WORKERS
+
+
+def parse_arguments(tc):
+    """Returns (args, ok) for a tool call, with empty args if they are not valid JSON."""
+    try:
+        args = json.loads(tc["function"]["arguments"])
+    except json.JSONDecodeError:
+        return {}, False
+    return (args, True) if isinstance(args, dict) else ({}, False)
+
+
+class ToolExecutor:
+    """Shared worker pool and per-tool concurrency limits for a session."""
+
+    def __init__(self, registry, runner, max_workers=DEFAULT_TOOL_WORKERS):
+        self._registry = registry
+        self._runner = runner
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix="neu-tool")
+        self._limits = {}
+        self._limits_lock = threading.Lock()
+
+    def is_concurrent(self, name):
+        tool = self._registry.get(name)
+        return (
+            tool is not None
+            and getattr(tool, "read_only", False)
+            and not getattr(tool, "confirm", False)
+        )
+
+    def _limit(self, name):
+        with self._limits_lock:
+            if name not in self._limits:
+                tool = self._registry.get(name)
+                limit = getattr(tool, "max_concurrency", None)
+                self._limits[name] = (
+                    threading.BoundedSemaphore(limit) if limit else None
+                )
+            return self._limits[name]
+
+    def _run(self, name, args):
+        limit = self._limit(name)
+        if limit is None:
+            return self._runner(name, args)
+        with limit:
+            return self._runner(name, args)
+
+    def submit(self, name, args):
+        return self._pool.submit(self._run, name, args)
+
+    def run(self, name, args):
+        return self._run(name, args)
+
+    def batch(self):
+        return ToolBatch(self)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class ToolBatch:
+    """
+    The tool calls of one assistant message.
+
+    add() may be called while the response is still streaming: read-only calls
+    start immediately unless an ordered call precedes them. Iterating yields
+    (tool_call, args, args_ok, future) in the original order; an ordered call
+    is only submitted once iteration reaches it, i.e. after everything before
+    it has been consumed.
+    """
+
+    def __init__(self, executor):
+        self._executor = executor
+        self._entries = []
+        self._barrier = False
+
+    def add(self, tc):
+        name = tc["function"]["name"]
+        args, ok = parse_arguments(tc)
+        concurrent = self._executor.is_concurrent(name)
+        future = None
+        if concurrent and not self._barrier:
+            future = self._executor.submit(name, args)
+        elif not concurrent:
+            self._barrier = True
+        self._entries.append([tc, args, ok, concurrent, future])
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        entries = self._entries
+        for i, (tc, args, ok, concurrent, future) in enumerate(entries):
+            name = tc["function"]["name"]
+            if future is None and concurrent:
+                # Start this read-only call and the ones after it, up to the next barrier.
+                for entry in entries[i:]:
+                    if not entry[3]:
+                        break
+                    if entry[4] is None:
+                        entry[4] = self._executor.submit(
+                            entry[0]["function"]["name"], entry[1]
+                        )
+            elif future is None:
+                entries[i][4] = self._executor.submit(name, args)
+            yield tc, args, ok, entries[i][4]
+
+    def cancel(self):
+        """Cancels the calls that haven't started; running ones finish in the background."""
+        for entry in self._entries:
+            if entry[4] is not None:
+                entry[4].cancel()
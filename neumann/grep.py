@@ -0,0 +1,192 @@
+"""
+Line search over a stream of files, shared by the GrepTool engines.
+
+Small searches run in-process. Larger ones are split into batches of files
+and fanned out to a persistent process pool; batch results are consumed in
+submission order, so hits come back in walk order, and the whole search stops
+as soon as the hit limit is reached.
+"""
+
+import io
+import multiprocessing
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from itertools import chain, islice
+
+from .trigram import INDEX_MAX_FILE_SIZE, query_matches, regex_query
+from .walk import BINARY_SNIFF_BYTES
+
+GREP_HIT_LIMIT = 50
+GREP_BATCH_FILES = 64  # files per worker task
+GREP_PARALLEL_MIN_FILES = 256  # below this, the pool isn't worth the overhead
+GREP_WORKERS = min(os.cpu_count() or 1, 8)
+GREP_READ_MAX = INDEX_MAX_FILE_SIZE  # larger files are scanned line by line
+
+_pool = None
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        # spawn: the session already runs tool threads, which fork doesn't mix with.
+        _pool = ProcessPoolExecutor(
+            GREP_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+def _prefilter(pattern):
+    """
+    A whole-file version of a line pattern, used to skip files without a match
+    before splitting them into lines. It may match where no single line does,
+    never the other way round. None when no such pattern is safe to build.
+    """
+    if "\\A" in pattern.pattern or "\\Z" in pattern.pattern:
+        return None
+    try:
+        return re.compile(pattern.pattern, pattern.flags | re.MULTILINE)
+    except re.error:
+        return None
+
+
+def search_file(path, pattern, prefilter=None, query=None):
+    """
+    Yields (line_num, line) for each line of path matching pattern.
+
+    `query` is the pattern's trigram query; files whose raw bytes lack the
+    required trigrams are skipped without being decoded. Files over
+    GREP_READ_MAX are streamed a line at a time instead of read whole, and
+    skip both prefilters.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read(BINARY_SNIFF_BYTES)
+            # Binary files are skipped, like an indexed search would.
+            if b"\0" in data:
+                return
+            if os.fstat(f.fileno()).st_size > GREP_READ_MAX:
+                f.seek(0)
+                yield from _search_lines(f, pattern)
+                return
+            data += f.read()
+    except OSError:
+        return
+    if query is not None and not query_matches(query, data.lower()):
+        return
+    text = data.decode("utf-8", errors="replace")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    if prefilter is not None and not prefilter.search(text):
+        return
+    lines = text.split("\n")
+    if not lines[-1]:
+        lines.pop()
+    search = pattern.search
+    for line_num, line in enumerate(lines, 1):
+        if search(line):
+            yield line_num, line
+
+
+def _search_lines(f, pattern):
+    """search_file's loop for large files, over the open binary file f."""
+    # newline=None folds \r\n and \r into \n, as search_file does.
+    text = io.TextIOWrapper(f, encoding="utf-8", errors="replace", newline=None)
+    search = pattern.search
+    try:
+        for line_num, line in enumerate(text, 1):
+            if line.endswith("\n"):
+                line = line[:-1]
+            if search(line):
+                yield line_num, line
+    finally:
+        text.detach()
+
+
+def _search_batch(paths, pattern, flags, limit):
+    """
+    Searches paths in order until `limit` hits are found (runs in a worker).
+
+    Returns (hits, more): hits formatted as path:line:text, and the number of
+    further matches in the file where the batch stopped.
+    """
+    pattern = re.compile(pattern, flags)
+    prefilter = _prefilter(pattern)
+    query = regex_query(pattern.pattern, flags)
+    hits = []
+    for path in paths:
+        matches = search_file(path, pattern, prefilter, query)
+        for line_num, line in matches:
+            hits.append(f"{path}:{line_num}:{line.rstrip()}")
+            if len(hits) == limit:
+                return hits, sum(1 for _ in matches)
+    return hits, 0
+
+
+def _batches(paths, size):
+    paths = iter(paths)
+    while True:
+        batch = list(islice(paths, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _scan_parallel(paths, pattern, limit):
+    """Yields each batch's results in order, keeping a few batches in flight."""
+    pool = get_pool()
+    batches = _batches(paths, GREP_BATCH_FILES)
+    pending = deque()
+
+    def submit(batch):
+        pending.append(
+            pool.submit(_search_batch, batch, pattern.pattern, pattern.flags, limit)
+        )
+
+    try:
+        for batch in islice(batches, GREP_WORKERS * 2):
+            submit(batch)
+        while pending:
+            yield pending.popleft().result()
+            batch = next(batches, None)
+            if batch is not None:
+                submit(batch)
+    finally:
+        # Reached when the consumer has enough hits: drop the queued batches.
+        for future in pending:
+            future.cancel()
+
+
+def _scan_local(paths, pattern, limit):
+    yield _search_batch(paths, pattern.pattern, pattern.flags, limit)
+
+
+def grep_files(paths, pattern, limit=GREP_HIT_LIMIT):
+    """
+    Searches paths (any iterable, consumed lazily) in order and returns up to
+    `limit` hits as path:line:text. Scanning stops at the limit; matches
+    already seen past it are reported as a count.
+    """
+    paths = iter(paths)
+    head = list(islice(paths, GREP_PARALLEL_MIN_FILES))
+    paths = chain(head, paths)
+    if len(head) < GREP_PARALLEL_MIN_FILES or GREP_WORKERS < 2:
+        results = _scan_local(paths, pattern, limit)
+    else:
+        results = _scan_parallel(paths, pattern, limit)
+
+    hits = []
+    with closing(results):
+        for batch_hits, batch_more in results:
+            room = limit - len(hits)
+            hits.extend(batch_hits[:room])
+            if len(hits) == limit:
+                more = len(batch_hits) - room + batch_more
+                note = f"(limit of {limit} reached; search stopped"
+                if more:
+                    note += f", at least {more} more matches not shown"
+                hits.append(note + ")")
+                break
+    return "\n".join(hits) or "none"
@@ -0,0 +1,144 @@
+"""
+Line-offset index for paging through large files.
+
+A LineIndex maps line numbers to byte offsets. It is built lazily over an
+mmap of the file, only as far as a request needs, and cached per path until
+the file's mtime or size changes. A slice is then served with a single seek,
+without reading the lines before it into Python strings. Tail reads
+(negative offsets) scan backwards from the end and count the file's lines
+once per version.
+"""
+
+import mmap
+import os
+import threading
+from array import array
+from collections import OrderedDict
+
+from .constants import READ_BYTE_BUDGET, READ_MAX_LINE_CHARS
+
+_CACHE_SIZE = 32
+_COUNT_CHUNK = 16 * 1024 * 1024
+
+
+class LineIndex:
+    """Byte offsets of line starts in one version of a file."""
+
+    def __init__(self, st):
+        self.key = (st.st_mtime_ns, st.st_size)
+        self.size = st.st_size
+        self.offsets = array("Q", [0]) if self.size else array("Q")
+        self.complete = not self.size
+        self.line_count = None  # counted once, for tail reads
+        self.lock = threading.Lock()
+
+    def _extend(self, mm, line):
+        """Indexes forward until `line` (0-based) has a known start, or EOF."""
+        offsets = self.offsets
+        find = mm.find
+        pos = offsets[-1] if offsets else 0
+        while len(offsets) <= line and not self.complete:
+            nl = find(b"\n", pos)
+            if nl == -1 or nl + 1 >= self.size:
+                self.complete = True
+                break
+            pos = nl + 1
+            offsets.append(pos)
+
+    def total_lines(self, mm):
+        if self.complete:
+            return len(self.offsets)
+        if self.line_count is None:
+            count = 0
+            for start in range(0, self.size, _COUNT_CHUNK):
+                count += mm[start : start + _COUNT_CHUNK].count(b"\n")
+            if mm[self.size - 1 : self.size] != b"\n":
+                count += 1
+            self.line_count = count
+        return self.line_count
+
+    def start_of(self, mm, line):
+        """Byte offset where `line` (0-based) starts, or None past the end."""
+        self._extend(mm, line)
+        return self.offsets[line] if line < len(self.offsets) else None
+
+    def tail_start(self, mm, n):
+        """(line, offset) of the first of the last n lines, found scanning backwards."""
+        end = self.size - 1 if mm[self.size - 1 : self.size] == b"\n" else self.size
+        pos = 0
+        for _ in range(n):
+            nl = mm.rfind(b"\n", 0, end)
+            if nl == -1:
+                pos = 0
+                break
+            pos, end = nl + 1, nl
+        return max(self.total_lines(mm) - n, 0), pos
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _get_index(path, st):
+    key = os.path.abspath(path)
+    with _cache_lock:
+        index = _cache.get(key)
+        if index is None or index.key != (st.st_mtime_ns, st.st_size):
+            index = _cache[key] = LineIndex(st)
+        _cache.move_to_end(key)
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+        return index
+
+
+def format_line(number, raw):
+    line = raw.decode("utf-8", errors="replace")
+    if line.endswith("\r\n"):
+        line = line[:-2] + "\n"
+    body = line.rstrip("\n")
+    if len(body) > READ_MAX_LINE_CHARS:
+        cut = len(body) - READ_MAX_LINE_CHARS
+        line = f"{body[:READ_MAX_LINE_CHARS]}... ({cut} more chars){line[len(body) :]}"
+    return f"{number:4}| {line}"
+
+
+def read_numbered(path, offset=0, limit=None, budget=READ_BYTE_BUDGET):
+    """
+    Returns lines of path prefixed with their 1-based line numbers.
+
+    offset is the number of lines to skip; a negative offset reads the last
+    -offset lines. Lines longer than READ_MAX_LINE_CHARS are cut, and output
+    stops once `budget` characters have been produced, with a note on the
+    offset to continue from.
+    """
+    st = os.stat(path)
+    index = _get_index(path, st)
+    if not index.size:
+        return ""
+    with open(path, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mm, index.lock:
+        if offset < 0:
+            if limit is None:
+                limit = -offset
+            offset, pos = index.tail_start(mm, -offset)
+        else:
+            pos = index.start_of(mm, offset)
+            if pos is None:
+                return ""
+
+        out = []
+        used = 0
+        line = offset
+        while pos < index.size and (limit is None or line < offset + limit):
+            nl = mm.find(b"\n", pos)
+            end = index.size if nl == -1 else nl + 1
+            text = format_line(line + 1, mm[pos:end])
+            if out and used + len(text) > budget:
+                out.append(f"... (output limit reached; continue with offset={line})\n")
+                break
+            out.append(text)
+            used += len(text)
+            pos = end
+            line += 1
+        return "".join(out)
@@ -3,38 +3,97 @@ Neumann CLI
 The universal constructor for your terminal.
 """
 
-import importlib.util
+import asyncio
 import json
 import os
 import re
-import urllib.request
+import shutil
+import signal
+import sys
+import time
 
+from .backends import BACKEND_ERRORS, BackendPool, is_backend_failure
 from .cli import parse_args
+from .console import aread_line, cancel_reads, read_line, read_pending
 from .constants import (
     BLUE,
     BOLD,
     CYAN,
     DEFAULT_API_URL,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
     DIM,
     GREEN,
     RED,
+    REPO_MAP_CHARS,
     RESET,
+    YELLOW,
 )
-from .sse_client import SSEClient
+from .context import ContextManager
+from .executor import ToolExecutor
+from .pluginpool import PluginPool
+from .plugins import StartupProfile, load_plugins
+from .render import StreamRenderer
+from .request import RequestBuilder
+from .snapshot import invalidate_all
+from .spool import get_spool
+from .sse import AsyncSSEClient
 from .strategies import get_strategy
+from .symbols import get_symbol_index
+from .telemetry import RequestSpan, telemetry
+from .toolcache import ToolResultCache
 from .tools import TOOL_REGISTRY
+from .walk import flush_indexes
 
-API_URL = os.environ.get("NEU_API_URL", DEFAULT_API_URL)
+# One endpoint, or a comma-separated list of equivalent backends.
+API_URLS = os.environ.get("NEU_API_URL", DEFAULT_API_URL)
+
+_TIMEOUTS = {
+    "connect_timeout": float(
+        os.environ.get("NEU_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT)
+    ),
+    "read_timeout": float(os.environ.get("NEU_READ_TIMEOUT", DEFAULT_READ_TIMEOUT)),
+}
+API_BACKENDS = BackendPool(API_URLS, **_TIMEOUTS)
+
+# Ask llama.cpp-style backends to reuse the KV cache for a matching prompt prefix.
+CACHE_PROMPT = os.environ.get("NEU_CACHE_PROMPT", "1") != "0"
+
+# How confirm-gated tools are handled: None asks the user; "allow" or "deny"
+# decide without asking (unattended batch runs).
+CONFIRM_POLICY = None
+
+# Read-only results repeated within the session are served from memory.
+TOOL_CACHE = ToolResultCache(TOOL_REGISTRY)
 
 
 def run_tool(name, args):
+    start = time.perf_counter()
+    result = TOOL_CACHE.run(name, args, _run_spooled)
+    telemetry.tool(name, start, time.perf_counter(), result)
+    return result
+
+
+def _run_spooled(name, args):
+    result = _run_tool(name, args)
+    if getattr(TOOL_REGISTRY.get(name), "spool", True):
+        result = get_spool().fit(name, result)
+    return result
+
+
+def _run_tool(name, args):
     try:
         tool = TOOL_REGISTRY.get(name)
         if not tool:
             return f"error: Tool '{name}' not found."
 
         # Check for confirmation requirement
-        if getattr(tool, "confirm", False):
+        if getattr(tool, "confirm", False) and CONFIRM_POLICY == "deny":
+            return (
+                "error: User denied execution permission. Reason: "
+                f"'{name}' needs confirmation and this is an unattended run."
+            )
+        if getattr(tool, "confirm", False) and CONFIRM_POLICY is None:
             print(f"\n{RED}⚠️  CAUTION: The model wants to execute '{name}':{RESET}")
             for k, v in args.items():
                 val_str = str(v)
@@ -44,11 +103,13 @@ def run_tool(name, args):
                 print(f"{RED}   {k}: {val_str}{RESET}")
 
             while True:
-                choice = input(f"{BOLD}Allow execution? [y/N] {RESET}").lower().strip()
+                choice = (
+                    read_line(f"{BOLD}Allow execution? [y/N] {RESET}").lower().strip()
+                )
                 if choice in ("y", "yes"):
                     break
                 elif choice in ("n", "no", ""):
-                    reason = input(
+                    reason = read_line(
                         f"{DIM}Reason for rejection (optional): {RESET}"
                     ).strip()
                     msg = "User denied execution permission."
@@ -56,95 +117,235 @@ def run_tool(name, args):
                         msg += f" Reason: {reason}"
                     return f"error: {msg}"
 
-        return tool.run(args)
+        try:
+            return tool.run(args)
+        finally:
+            if not getattr(tool, "read_only", False):
+                # Not every tool that writes files (plugins, for one) tells
+                # the workspace snapshot which ones.
+                invalidate_all()
     except Exception as err:
         return f"error: {err}"
 
 
-def load_external_tools(tool_dir):
-    """Loads custom tools from python files in the specified directory."""
+def load_external_tools(tool_dir, profile=None, pool=None):
+    """
+    Loads custom tools from python files in the specified directory; with a
+    PluginPool they run in its worker processes.
+    """
     if not os.path.isdir(tool_dir):
         print(f"{RED}Warning: Tool directory '{tool_dir}' not found.{RESET}")
         return
 
-    count = 0
-    for filename in os.listdir(tool_dir):
-        if filename.endswith(".py") and not filename.startswith("_"):
-            filepath = os.path.join(tool_dir, filename)
-            try:
-                spec = importlib.util.spec_from_file_location(filename[:-3], filepath)
-                module = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(module)
-
-                tools_in_this_file = 0
-
-                # Scan for tool classes
-                for attr_name in dir(module):
-                    attr = getattr(module, attr_name)
-
-                    # Must be a class defined in this file
-                    if isinstance(attr, type) and attr.__module__ == module.__name__:
-                        # Check contract
-                        required = {"name", "description", "parameters", "run"}
-                        missing = required - set(dir(attr))
-
-                        if not missing:
-                            try:
-                                tool_instance = attr()
-                                TOOL_REGISTRY[tool_instance.name] = tool_instance
-                                count += 1
-                                tools_in_this_file += 1
-                            except Exception as e:
-                                print(
-                                    f"{RED}Failed to instantiate {attr_name} from {filename}: {e}{RESET}"
-                                )
-
-                        # Heuristic: If it has 'run' or 'parameters' but missed the check, warn the user
-                        elif "run" in dir(attr) or "parameters" in dir(attr):
-                            print(
-                                f"{RED}Skipped potential tool '{attr_name}' in {filename}. Missing attributes: {missing}{RESET}"
-                            )
-
-                if tools_in_this_file == 0:
-                    print(
-                        f"{DIM}Loaded {filename} but found no valid tools (classes with name, description, parameters, run).{RESET}"
-                    )
-
-            except Exception as e:
-                print(f"{RED}Error loading tool file {filename}: {e}{RESET}")
-
+    count = load_plugins(
+        tool_dir,
+        TOOL_REGISTRY,
+        profile,
+        warn=lambda msg: print(f"{RED}{msg}{RESET}"),
+        pool=pool,
+    )
     if count > 0:
-        # We print this to stderr so it doesn't interfere with the TUI if that evolves
-        # but for now standard print is fine as it happens before main loop
         print(f"{GREEN}Loaded {count} external tools from {tool_dir}{RESET}")
 
 
-def call_api(messages, stream=True):
+async def acall_api(request, stream=True, session=None, span=None):
+    """
+    Sends a chat completion request: a list of messages, or a full request
+    body from RequestBuilder; streams come back as an AsyncSSEClient.
+    Requests go to the least busy backend (sticking to the last one for
+    `session`) and fail over on connection errors, 5xx answers and streams
+    that break before their first event. A telemetry span gets the times the
+    response and its first event arrived.
+    """
     headers = {
         "Content-Type": "application/json",
     }
+    if isinstance(request, list):
+        request = {"messages": request, "stream": stream}
+    body = json.dumps(request).encode()
 
-    request = urllib.request.Request(
-        API_URL,
-        data=json.dumps(
-            {
-                "messages": messages,
-                "stream": stream,
-            }
-        ).encode(),
-        headers=headers,
-    )
+    tried, error = [], "no API backend configured"
+    while True:
+        backend = API_BACKENDS.pick(session, exclude=tried)
+        if backend is None:
+            return {"error": error}
+        tried.append(backend)
+        try:
+            response = await backend.async_pool.request(
+                "POST", body=body, headers=headers
+            )
+        except BACKEND_ERRORS as e:
+            API_BACKENDS.release(backend)
+            API_BACKENDS.failed(backend)
+            error = str(e) or type(e).__name__
+            continue
+        except BaseException:
+            API_BACKENDS.release(backend)
+            raise
+        if span is not None:
+            span.first_byte = time.perf_counter()
+
+        if response.status >= 400:
+            response.close()
+            API_BACKENDS.release(backend)
+            error = f"HTTP Error {response.status}: {response.reason}"
+            if is_backend_failure(response.status):
+                API_BACKENDS.failed(backend)
+                continue
+            return {"error": error}
+        response = API_BACKENDS.track(backend, response)
+        if not request.get("stream"):
+            async with response:
+                return json.loads(await response.read())
+
+        client = AsyncSSEClient(response)
+        try:
+            await client.prefetch()
+            if span is not None:
+                span.first_event = time.perf_counter()
+        except BACKEND_ERRORS as e:
+            client.close()
+            API_BACKENDS.failed(backend)
+            error = str(e) or type(e).__name__
+            continue
+        except BaseException:
+            client.close()
+            raise
+        API_BACKENDS.succeeded(backend)
+        return client
+
+
+class StreamState:
+    """
+    Accumulates one chat completion stream, event by event, printing content
+    as it arrives; aread_stream() drives it.
+
+    Content deltas are fed to the strategy's stream parser as they arrive, so
+    text-format tool calls are known as soon as each block closes and are
+    passed to on_tool_call right away. With stop_after_tool the stream is
+    abandoned after the first complete call.
+    """
+
+    def __init__(
+        self,
+        raw=False,
+        parser=None,
+        stop_after_tool=False,
+        on_tool_call=None,
+        span=None,
+        renderer=None,
+    ):
+        self.raw = raw
+        self.parser = parser
+        self.stop_after_tool = stop_after_tool
+        self.on_tool_call = on_tool_call
+        self.content = ""
+        self.tool_calls_data = {}
+        self.parsed_calls = []
+        self.stopped = False
+        self.span = span  # telemetry.RequestSpan to fill in, if any
+        self.renderer = renderer or StreamRenderer()
+
+    def _emit(self, calls):
+        for tc in calls:
+            self.parsed_calls.append(tc)
+            if self.on_tool_call:
+                self.on_tool_call(tc)
+
+    def handle(self, event):
+        """Processes one SSE event; returns True when the stream should be abandoned."""
+        span = self.span
+        if span is not None:
+            span.events += 1
+            if span.first_event is None:
+                span.first_event = time.perf_counter()
+
+        if event.data == "[DONE]":
+            return True
+
+        if self.raw:
+            self.renderer.line(f"\n{DIM}[RAW] {event.data}{RESET}")
+
+        try:
+            chunk_data = json.loads(event.data)
+            delta = chunk_data["choices"][0]["delta"]
+
+            # Handle Content
+            if "content" in delta and delta["content"]:
+                text_chunk = delta["content"]
+                self.content += text_chunk
+                self.renderer.write(text_chunk)
+                if span is not None:
+                    span.tokens += 1
+                    if span.first_token is None:
+                        span.first_token = time.perf_counter()
+                if self.parser:
+                    started = time.perf_counter()
+                    self._emit(self.parser.feed(text_chunk))
+                    if span is not None:
+                        span.parse_time += time.perf_counter() - started
+                    if self.stop_after_tool and self.parsed_calls:
+                        # Nothing after the closing tag is kept, so stop decoding.
+                        self.content = self.content[: self.parser.consumed]
+                        self.stopped = True
+                        return True
+
+            # Handle Tools (Standard - kept as fallback if model uses native despite no 'tools' prompt)
+            if "tool_calls" in delta and delta["tool_calls"]:
+                for tc in delta["tool_calls"]:
+                    idx = tc["index"]
+                    if idx not in self.tool_calls_data:
+                        self.tool_calls_data[idx] = {
+                            "id": "",
+                            "name": "",
+                            "args": "",
+                        }
+                    if "id" in tc:
+                        self.tool_calls_data[idx]["id"] = tc["id"]
+                    if "function" in tc:
+                        if "name" in tc["function"]:
+                            self.tool_calls_data[idx]["name"] = tc["function"]["name"]
+                        if "arguments" in tc["function"]:
+                            self.tool_calls_data[idx]["args"] += tc["function"][
+                                "arguments"
+                            ]
+
+        except (json.JSONDecodeError, KeyError):
+            pass
+        return False
+
+    def finish(self):
+        """
+        Returns the full text content, any native tool call fragments keyed by
+        index, and the text-format tool calls parsed during the stream.
+        """
+        if self.parser and not self.stopped:
+            started = time.perf_counter()
+            self._emit(self.parser.finish())
+            if self.span is not None:
+                self.span.parse_time += time.perf_counter() - started
+        return self.content, self.tool_calls_data, self.parsed_calls
+
+
+async def aread_stream(
+    client, raw=False, parser=None, stop_after_tool=False, on_tool_call=None, state=None
+):
+    """
+    Consumes an SSE chat completion stream; see StreamState. Pass `state` to
+    keep the partial content if the task is cancelled mid-stream.
+    """
+    state = state or StreamState(raw, parser, stop_after_tool, on_tool_call)
     try:
-        response = urllib.request.urlopen(request)
-        if stream:
-            return SSEClient(response)
-        return json.loads(response.read())
-    except urllib.error.URLError as e:
-        return {"error": str(e)}
+        async for event in client.events():
+            if state.handle(event):
+                break
+    finally:
+        state.renderer.close()
+    return state.finish()
 
 
 def separator():
-    return f"{DIM}{'─' * min(os.get_terminal_size().columns, 80)}{RESET}"
+    return f"{DIM}{'─' * min(shutil.get_terminal_size().columns, 80)}{RESET}"
 
 
 def render_markdown(text):
@@ -188,26 +389,216 @@ def print_history(messages):
     print()
 
 
-def main():
-    args = parse_args()
-
+async def run_turn(messages, builder, strategy, executor, args):
+    """
+    The agentic loop for one user message: request, stream, run tools, repeat
+    until the model answers without tool calls. Cancelling the task aborts the
+    stream (closing the connection, so the backend stops generating) or stops
+    waiting for tools; the history is left well-formed either way.
+    """
+    while True:
+        request, report = builder.build(messages, stream=True)
+        if report.changed_at is not None:
+            print(
+                f"{YELLOW}  prompt prefix changed at message {report.changed_at}; "
+                f"the backend re-processes ~{report.tokens - report.reused:,} tokens{RESET}"
+            )
+        print(f"{DIM}  ↑ {report}{RESET}")
+
+        span = RequestSpan(prompt_tokens=report.tokens)
+        client_or_response = await acall_api(
+            request, session=builder.session, span=span
+        )
+
+        if isinstance(client_or_response, dict) and "error" in client_or_response:
+            span.status = "error"
+            telemetry.request(span)
+            print(f"{RED}⏺ API Error: {client_or_response['error']}{RESET}")
+            return
+
+        print(f"\n{CYAN}⏺{RESET} ", end="", flush=True)
+
+        batch = executor.batch()
+        state = StreamState(
+            raw=args.raw,
+            parser=strategy.stream_parser(),
+            stop_after_tool=args.early_stop,
+            on_tool_call=batch.add,
+            span=span,
+        )
+        try:
+            full_content, tool_calls_data, parsed_calls = await aread_stream(
+                client_or_response, state=state
+            )
+        except asyncio.CancelledError:
+            span.status = "cancelled"
+            batch.cancel()
+            if state.content:
+                messages.append({"role": "assistant", "content": state.content})
+            raise
+        except BaseException:
+            span.status = "error"
+            raise
+        finally:
+            client_or_response.close()
+            span.end = time.perf_counter()
+            span.chunks = client_or_response.chunks
+            span.bytes = client_or_response.bytes
+            telemetry.request(span)
+
+        print()  # Newline after stream ends
+
+        # Standard Tool Assembly
+        tool_calls = []
+        if tool_calls_data:
+            for idx in sorted(tool_calls_data.keys()):
+                data = tool_calls_data[idx]
+                tool_calls.append(
+                    {
+                        "id": data["id"] or f"call_{os.urandom(4).hex()}",
+                        "type": "function",
+                        "function": {
+                            "name": data["name"],
+                            "arguments": data["args"],
+                        },
+                    }
+                )
+
+        # Qwen XML Tool Fallback (Primary method now), parsed during the stream
+        if not tool_calls:
+            tool_calls = parsed_calls
+
+        # Save full message
+        assistant_msg = {"role": "assistant", "content": full_content}
+
+        if tool_calls:
+            assistant_msg["tool_calls"] = tool_calls
+
+        messages.append(assistant_msg)
+
+        if not tool_calls:
+            return  # End of agent loop
+
+        # Execute Tools (read-only calls may already be running)
+        if tool_calls is not parsed_calls:
+            batch = executor.batch()
+            for tc in tool_calls:
+                batch.add(tc)
+
+        answered = 0
+        try:
+            for tc, tool_args, args_ok, future in batch:
+                tool_name = tc["function"]["name"]
+                if not args_ok:
+                    print(f"{RED}⏺ Error parsing arguments for {tool_name}{RESET}")
+
+                arg_preview = str(list(tool_args.values())[0])[:50] if tool_args else ""
+                print(
+                    f"\n{GREEN}⏺ {tool_name.capitalize()}{RESET}({DIM}{arg_preview}{RESET})"
+                )
+
+                result = await asyncio.wrap_future(future)
+
+                result_lines = result.split("\n")
+                preview = result_lines[0][:60]
+                if len(result_lines) > 1:
+                    preview += f" ... +{len(result_lines) - 1} lines"
+                elif len(result_lines[0]) > 60:
+                    preview += "..."
+                print(f"  {DIM}⎿  {preview}{RESET}")
+
+                messages.append(
+                    {
+                        "role": "tool",
+                        "tool_call_id": tc["id"],
+                        "name": tool_name,
+                        "content": result,
+                    }
+                )
+                TOOL_CACHE.mark_shown(result, tc["id"])
+                answered += 1
+        except asyncio.CancelledError:
+            batch.cancel()
+            # Every call needs a result, or the next request is malformed.
+            for tc in tool_calls[answered:]:
+                messages.append(
+                    {
+                        "role": "tool",
+                        "tool_call_id": tc["id"],
+                        "name": tc["function"]["name"],
+                        "content": "error: interrupted by the user",
+                    }
+                )
+            raise
+
+
+async def session(args):
+    """Interactive session: reads prompts and runs each as a cancellable turn."""
     # Load external tools before starting
+    profile = StartupProfile() if args.startup_profile else None
+    bash = TOOL_REGISTRY["bash"]  # the built-in, even if a plugin replaces it
+    bash.persistent = args.persistent_shell
+    get_spool().threshold = args.spool_threshold
+    plugin_pool = None
     if args.tool_dir:
-        load_external_tools(args.tool_dir)
+        if args.isolate_tools:
+            plugin_pool = PluginPool(
+                timeout=args.tool_timeout, memory_mb=args.tool_memory
+            )
+        load_external_tools(args.tool_dir, profile, plugin_pool)
+
+    if args.grep_index:
+        TOOL_REGISTRY["grep"].use_index = True
 
     messages = []
+    executor = ToolExecutor(TOOL_REGISTRY, run_tool)
 
     # Use dynamic system prompt if not overridden
     strategy = get_strategy("qwen")
+    repo_map = None
+    if args.repo_map and not args.system:
+        repo_map = get_symbol_index().repo_map(REPO_MAP_CHARS)
     system_prompt = (
-        args.system if args.system else strategy.get_system_prompt(TOOL_REGISTRY)
+        args.system
+        if args.system
+        else strategy.get_system_prompt(TOOL_REGISTRY, repo_map)
+    )
+
+    builder = RequestBuilder(
+        system_prompt,
+        ContextManager(args.context_budget, on_compact=TOOL_CACHE.forget),
+        cache_prompt=CACHE_PROMPT,
     )
 
     print_history(messages)
+    if profile is not None:
+        print(f"{DIM}{profile.report()}{RESET}")
 
-    while True:
-        try:
-            user_input = input(f"{BOLD}{BLUE}❯{RESET} ").strip()
+    health = None
+    if len(API_BACKENDS.backends) > 1:
+        health = asyncio.ensure_future(API_BACKENDS.monitor())
+
+    # Ctrl-C interrupts the running turn; at the prompt it quits.
+    loop = asyncio.get_running_loop()
+    waiting = None  # the turn task or the prompt future
+
+    def interrupt():
+        if waiting is not None:
+            waiting.cancel()
+
+    try:
+        loop.add_signal_handler(signal.SIGINT, interrupt)
+    except (NotImplementedError, RuntimeError):
+        pass  # e.g. Windows: Ctrl-C raises KeyboardInterrupt and ends the session
+
+    try:
+        while True:
+            try:
+                waiting = asyncio.ensure_future(aread_line(f"{BOLD}{BLUE}❯{RESET} "))
+                user_input = (await waiting).strip()
+            except (asyncio.CancelledError, EOFError):
+                print()
+                break
 
             if not user_input:
                 continue
@@ -217,151 +608,72 @@ def main():
 
             if user_input == "/c":
                 messages = []
+                TOOL_CACHE.clear()
                 print_history(messages)
                 continue
 
             print(separator())
             messages.append({"role": "user", "content": user_input})
 
-            # agentic loop
-            while True:
-                payload_messages = [
-                    {"role": "system", "content": system_prompt}
-                ] + messages
+            # The user may have edited files since the last turn.
+            invalidate_all()
+            telemetry.begin_turn()
+            status = "ok"
+            waiting = asyncio.ensure_future(
+                run_turn(messages, builder, strategy, executor, args)
+            )
+            try:
+                await waiting
+            except asyncio.CancelledError:
+                status = "cancelled"
+                cancel_reads()  # release a confirmation prompt, if one is open
+                print(f"\n{YELLOW}⏺ Interrupted{RESET}")
+            except BACKEND_ERRORS as err:
+                # The stream broke after its first event; no failover then.
+                status = "error"
+                print(f"{RED}⏺ Error: {str(err) or type(err).__name__}{RESET}")
+            except Exception as err:  # noqa: BLE001 - keep the session alive
+                status = "error"
+                print(f"{RED}⏺ Error: {err!r}{RESET}")
+            summary = telemetry.end_turn(status)
+            if args.stats:
+                print(f"{DIM}  ⏱ {summary}{RESET}")
+    finally:
+        waiting = None
+        try:
+            loop.remove_signal_handler(signal.SIGINT)
+        except (NotImplementedError, RuntimeError):
+            pass
+        executor.shutdown()
+        bash.close()
+        if plugin_pool is not None:
+            plugin_pool.close()
+        get_spool().close()
+        flush_indexes()
+        if health is not None:
+            health.cancel()
+        API_BACKENDS.close()
+        telemetry.close()
 
-                client_or_response = call_api(payload_messages, stream=True)
 
-                if (
-                    isinstance(client_or_response, dict)
-                    and "error" in client_or_response
-                ):
-                    print(f"{RED}⏺ API Error: {client_or_response['error']}{RESET}")
-                    break
+def main():
+    if sys.argv[1:2] == ["batch"]:
+        from .batch import main as run_batch
 
-                full_content = ""
-                tool_calls_data = {}
-
-                print(f"\n{CYAN}⏺{RESET} ", end="", flush=True)
-
-                for event in client_or_response.events():
-                    if event.data == "[DONE]":
-                        break
-
-                    if args.raw:
-                        print(f"\n{DIM}[RAW] {event.data}{RESET}", end="")
-
-                    try:
-                        chunk_data = json.loads(event.data)
-                        delta = chunk_data["choices"][0]["delta"]
-
-                        # Handle Content
-                        if "content" in delta and delta["content"]:
-                            text_chunk = delta["content"]
-                            full_content += text_chunk
-                            print(render_markdown(text_chunk), end="", flush=True)
-
-                        # Handle Tools (Standard - kept as fallback if model uses native despite no 'tools' prompt)
-                        if "tool_calls" in delta and delta["tool_calls"]:
-                            for tc in delta["tool_calls"]:
-                                idx = tc.index
-                                if idx not in tool_calls_data:
-                                    tool_calls_data[idx] = {
-                                        "id": "",
-                                        "name": "",
-                                        "args": "",
-                                    }
-                                if "id" in tc:
-                                    tool_calls_data[idx]["id"] = tc["id"]
-                                if "function" in tc:
-                                    if "name" in tc["function"]:
-                                        tool_calls_data[idx]["name"] = tc["function"][
-                                            "name"
-                                        ]
-                                    if "arguments" in tc["function"]:
-                                        tool_calls_data[idx]["args"] += tc["function"][
-                                            "arguments"
-                                        ]
-
-                    except (json.JSONDecodeError, KeyError):
-                        pass
-
-                print()  # Newline after stream ends
-
-                # Standard Tool Assembly
-                tool_calls = []
-                if tool_calls_data:
-                    for idx in sorted(tool_calls_data.keys()):
-                        data = tool_calls_data[idx]
-                        tool_calls.append(
-                            {
-                                "id": data["id"] or f"call_{os.urandom(4).hex()}",
-                                "type": "function",
-                                "function": {
-                                    "name": data["name"],
-                                    "arguments": data["args"],
-                                },
-                            }
-                        )
-
-                # Qwen XML Tool Fallback (Primary method now)
-                if not tool_calls and "<function=" in full_content:
-                    qwen_tools = strategy.parse_tool_calls(full_content)
-                    if qwen_tools:
-                        tool_calls.extend(qwen_tools)
-
-                # Save full message
-                assistant_msg = {"role": "assistant", "content": full_content}
-
-                if tool_calls:
-                    assistant_msg["tool_calls"] = tool_calls
-
-                messages.append(assistant_msg)
-
-                # Execute Tools
-                if tool_calls:
-                    for tc in tool_calls:
-                        func_data = tc["function"]
-                        tool_name = func_data["name"]
-                        try:
-                            tool_args = json.loads(func_data["arguments"])
-                        except json.JSONDecodeError:
-                            print(
-                                f"{RED}⏺ Error parsing arguments for {tool_name}{RESET}"
-                            )
-                            tool_args = {}
-
-                        arg_preview = (
-                            str(list(tool_args.values())[0])[:50] if tool_args else ""
-                        )
-                        print(
-                            f"\n{GREEN}⏺ {tool_name.capitalize()}{RESET}({DIM}{arg_preview}{RESET})"
-                        )
-
-                        result = run_tool(tool_name, tool_args)
-
-                        result_lines = result.split("\n")
-                        preview = result_lines[0][:60]
-                        if len(result_lines) > 1:
-                            preview += f" ... +{len(result_lines) - 1} lines"
-                        elif len(result_lines[0]) > 60:
-                            preview += "..."
-                        print(f"  {DIM}⎿  {preview}{RESET}")
-
-                        messages.append(
-                            {
-                                "role": "tool",
-                                "tool_call_id": tc["id"],
-                                "name": tool_name,
-                                "content": result,
-                            }
-                        )
-                else:
-                    break  # End of agent loop
-
-        except (KeyboardInterrupt, EOFError):
-            break
-        except Exception as err:
-            print(f"{RED}⏺ Error: {err}{RESET}")
+        sys.exit(run_batch(sys.argv[2:]))
+
+    args = parse_args()
+    if args.trace:
+        telemetry.open_trace(args.trace)
+    try:
+        asyncio.run(session(args))
+    except KeyboardInterrupt:
+        pass
+    if read_pending():
+        # Quit at the prompt: the reader thread still holds stdin, and a normal
+        # interpreter shutdown would abort waiting for it.
+        sys.stdout.flush()
+        os._exit(0)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,408 @@
+"""
+Unified diffs for the patch tool.
+
+A patch can touch several files with several hunks each, so one call replaces
+a string of write/edit calls and the model only emits the changed lines plus
+a little context. Hunks are located by their context, not their line numbers:
+each one is searched for after the previous hunk, nearest the line its
+header names, first exactly, then ignoring trailing whitespace, then
+ignoring all indentation. Header counts are only used to
+restore blank context lines lost at the end of a hunk, to tell a blank
+separator line from blank context, and to tell a removed "-- " line followed
+by an added "++ " line from the next file's ---/+++ header.
+
+Every file is checked before anything is written. If any hunk fails to
+apply, the result lists each failure with the closest match found, and no
+file is changed. Otherwise the new contents are written to temporary files
+next to the originals and renamed into place, and files already replaced are
+restored if a later rename fails.
+"""
+
+import os
+import re
+
+from .edit import install, open_temp
+from .snapshot import get_snapshot
+
+_HUNK_RE = re.compile(r"@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+_NULL_PATHS = ("/dev/null", "nul")
+_SHOWN_CHARS = 80  # of a line quoted in an error message
+
+# Matching passes, strictest first: (description, line normalization)
+_FUZZ = (
+    (None, lambda line: line),
+    ("ignoring trailing whitespace", str.rstrip),
+    ("ignoring indentation", str.strip),
+)
+
+
+class PatchError(Exception):
+    pass
+
+
+class Hunk:
+    def __init__(self, header, old_start, old_count, new_count):
+        self.header = header
+        self.old_start = old_start  # 1-based; None when the header has no numbers
+        self.old_count = old_count
+        self.new_count = new_count
+        self.lines = []  # (op, text) with op one of " ", "-", "+"
+        self.new_eof_newline = None  # False/True if a "\ No newline" marker says so
+
+    @property
+    def old(self):
+        return [text for op, text in self.lines if op != "+"]
+
+    @property
+    def new(self):
+        return [text for op, text in self.lines if op != "-"]
+
+    def remaining(self):
+        """(old, new) lines the header counts still expect; None without counts."""
+        if self.old_count is None:
+            return None
+        return self.old_count - len(self.old), self.new_count - len(self.new)
+
+    def close(self):
+        """Restores trailing blank context lines dropped by the sender."""
+        missing_old = (self.old_count or 0) - len(self.old)
+        missing_new = (self.new_count or 0) - len(self.new)
+        if self.old_count is not None and 0 < missing_old == missing_new:
+            self.lines.extend([(" ", "")] * missing_old)
+
+
+class FilePatch:
+    def __init__(self, old_path, new_path):
+        self.old_path = old_path  # None for a new file
+        self.new_path = new_path  # None for a deleted file
+        self.hunks = []
+
+    @property
+    def path(self):
+        return self.new_path or self.old_path
+
+
+def _header_path(line):
+    path = line[4:].split("\t")[0].strip()
+    if path.startswith('"') and path.endswith('"'):
+        path = path[1:-1]
+    return None if path.lower() in _NULL_PATHS else path
+
+
+def _strip_prefix(path, git):
+    """Drops the a/ or b/ of git-style paths."""
+    if path and path[:2] in ("a/", "b/") and (git or not os.path.exists(path)):
+        return path[2:]
+    return path
+
+
+def _is_file_header(hunk, lines, i):
+    """
+    Whether the ---/+++ pair ending at lines[i] starts a new file, rather than
+    being a removed "-- ..." and an added "++ ..." line of the open hunk.
+    """
+    left = hunk.remaining() if hunk is not None else None
+    if left is None or min(left) < 1:
+        return True
+    if left == (1, 1):
+        return False  # exactly the lines the hunk still needs
+    # The counts want more lines, but a hunk follows: they were wrong.
+    return i + 1 < len(lines) and lines[i + 1].startswith("@@")
+
+
+def parse_patch(text):
+    """Splits a unified diff into FilePatches; raises PatchError if it has none."""
+    files = []
+    current = hunk = None
+    git = False
+    lines = text.splitlines()
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        i += 1
+        if line.startswith("diff --git "):
+            git, hunk = True, None
+        elif (
+            line.startswith("--- ")
+            and i < len(lines)
+            and lines[i].startswith("+++ ")
+            and _is_file_header(hunk, lines, i)
+        ):
+            if hunk is not None:
+                hunk.close()
+            old, new = _header_path(line), _header_path(lines[i])
+            i += 1
+            current = FilePatch(_strip_prefix(old, git), _strip_prefix(new, git))
+            files.append(current)
+            hunk = None
+        elif line.startswith("@@"):
+            if current is None:
+                raise PatchError(f"line {i}: hunk before any ---/+++ file header")
+            if hunk is not None:
+                hunk.close()
+            m = _HUNK_RE.match(line)
+            if m:
+                old_count = int(m.group(2)) if m.group(2) is not None else 1
+                new_count = int(m.group(4)) if m.group(4) is not None else 1
+                hunk = Hunk(line.strip(), int(m.group(1)), old_count, new_count)
+            else:  # bare "@@": locate by context alone
+                hunk = Hunk(line.strip(), None, None, None)
+            current.hunks.append(hunk)
+        elif hunk is not None:
+            if line.startswith("\\"):
+                if hunk.lines and hunk.lines[-1][0] != "-":
+                    hunk.new_eof_newline = False
+                elif hunk.new_eof_newline is None:
+                    hunk.new_eof_newline = True
+            elif line[:1] in (" ", "-", "+"):
+                hunk.lines.append((line[0], line[1:]))
+            elif not line:
+                left = hunk.remaining()
+                if left is not None and max(left) <= 0:
+                    hunk = None  # a separator after a complete hunk
+                else:
+                    hunk.lines.append((" ", ""))  # blank context, space dropped
+            else:
+                hunk.close()
+                hunk = None  # trailing junk (e.g. "index ..." of the next file)
+    if hunk is not None:
+        hunk.close()
+    if not files:
+        raise PatchError("no ---/+++ file headers found; send a unified diff")
+    for fp in files:
+        # Blank lines between files parse as context; they belong to no hunk.
+        for h in fp.hunks:
+            while h.lines and h.lines[-1] == (" ", "") and h.old_count is None:
+                h.lines.pop()
+    return files
+
+
+def _shown(line):
+    line = line if len(line) <= _SHOWN_CHARS else line[:_SHOWN_CHARS] + "..."
+    return repr(line)
+
+
+def _find(lines, block, hint, start):
+    """
+    Position of block in lines at or after start, nearest to hint, trying
+    each fuzz level in turn; returns (position, fuzz description) or None.
+    """
+    last = len(lines) - len(block)
+    if last < start:
+        return None
+    for fuzz, norm in _FUZZ:
+        target = [norm(b) for b in block]
+        first = target[0]
+        hits = [
+            p
+            for p in range(start, last + 1)
+            if norm(lines[p]) == first
+            and all(norm(lines[p + k]) == target[k] for k in range(1, len(block)))
+        ]
+        if hits:
+            return min(hits, key=lambda p: abs(p - hint)), fuzz
+    return None
+
+
+def _closest(lines, block, start):
+    """Why block doesn't match: the window with most equal lines, described."""
+    best, best_pos = -1, start
+    for p in range(start, max(len(lines), start + 1)):
+        window = lines[p : p + len(block)]
+        score = sum(a.strip() == b.strip() for a, b in zip(window, block))
+        if score > best:
+            best, best_pos = score, p
+    if best <= 0:
+        where = f"after line {start} (the previous hunk)" if start else "in the file"
+        return f"its first line {_shown(block[0])} is not {where}"
+    window = lines[best_pos : best_pos + len(block)]
+    for k, expected in enumerate(block):
+        actual = window[k] if k < len(window) else None
+        if actual is None or actual.strip() != expected.strip():
+            found = _shown(actual) if actual is not None else "end of file"
+            return (
+                f"closest match at line {best_pos + 1} ({best}/{len(block)} lines), "
+                f"but line {best_pos + k + 1} is {found}, "
+                f"not {_shown(expected)}"
+            )
+    return f"closest match at line {best_pos + 1}"
+
+
+def _read(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        return f.read()
+
+
+def _apply(fp):
+    """
+    (new text or None if deleted, original text or None if created, notes,
+    errors) for one file. Nothing is written here.
+    """
+    notes, errors = [], []
+    if fp.old_path is None:
+        if os.path.exists(fp.new_path):
+            return (
+                None,
+                None,
+                notes,
+                [f"{fp.new_path}: patch creates it, but it exists"],
+            )
+        text = None
+    else:
+        if fp.new_path not in (None, fp.old_path) and os.path.exists(fp.new_path):
+            errors.append(
+                f"{fp.old_path}: patch renames it to {fp.new_path}, which exists"
+            )
+        try:
+            text = _read(fp.old_path)
+        except (OSError, UnicodeDecodeError) as err:
+            return None, None, notes, [f"{fp.old_path}: {err}"]
+    original, text = text, text or ""
+
+    eol = "\r\n" if "\r\n" in text else "\n"
+    eof_newline = text.endswith("\n") or not text
+    lines = text.split(eol)
+    if eof_newline:
+        lines.pop()
+
+    out, pos = [], 0  # pos: next unconsumed line of the original
+    for number, hunk in enumerate(fp.hunks, 1):
+        label = f"{fp.path} hunk {number} ({hunk.header})"
+        old = hunk.old
+        numbered = hunk.old_start is not None
+        hint = max(hunk.old_start - 1, pos) if numbered else pos
+        if not old:
+            # Pure addition: nothing to match, so trust the line number, which
+            # names the line to insert after (0: at the top).
+            at = hunk.old_start if numbered else len(lines)
+            found = (min(max(at, pos), len(lines)), None)
+        else:
+            found = _find(lines, old, hint, pos)
+        if found is None:
+            errors.append(f"{label}: context not found; {_closest(lines, old, pos)}")
+            continue
+        at, fuzz = found
+        if numbered and old and at != hunk.old_start - 1:
+            notes.append(f"{label} applied at line {at + 1}")
+        if fuzz:
+            notes.append(f"{label} matched {fuzz}")
+        out.extend(lines[pos:at])
+        # Context lines are kept as the file has them, not as the (possibly
+        # fuzzily matched) hunk quotes them.
+        k = at
+        for op, text in hunk.lines:
+            if op == " ":
+                out.append(lines[k])
+            elif op == "+":
+                out.append(text)
+            if op != "+":
+                k += 1
+        pos = at + len(old)
+        if hunk.new_eof_newline is not None and pos == len(lines):
+            eof_newline = hunk.new_eof_newline
+    out.extend(lines[pos:])
+
+    if fp.new_path is None:
+        if out:
+            errors.append(f"{fp.old_path}: patch deletes it, but lines would remain")
+        return None, original, notes, errors
+    new_text = eol.join(out)
+    if out and eof_newline:
+        new_text += eol
+    return new_text, original, notes, errors
+
+
+def _stage(path, text, like):
+    """Writes text to a temporary file beside path, with like's mode."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    f, tmp = open_temp(path, like)
+    try:
+        with f:
+            f.write(text.encode("utf-8"))
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return tmp
+
+
+def _commit(changes):
+    """
+    Puts every (FilePatch, new text, original text) change in place,
+    restoring the files already changed if one fails.
+    """
+    # Renaming onto a symlink would replace the link, not the file it names.
+    targets = [
+        os.path.realpath(fp.new_path) if fp.new_path is not None else None
+        for fp, _, _ in changes
+    ]
+    staged = []
+    try:
+        for (fp, text, _), target in zip(changes, targets):
+            if target is not None:
+                staged.append(_stage(target, text, fp.old_path or target))
+            else:
+                staged.append(None)
+    except OSError:
+        for tmp in staged:
+            if tmp is not None:
+                os.unlink(tmp)
+        raise
+
+    done = []  # (path, original text, or None if the patch created it)
+    try:
+        for (fp, _, original), target, tmp in zip(changes, targets, staged):
+            if target is not None:
+                install(tmp, target)
+                renamed = fp.old_path not in (None, fp.new_path)
+                done.append((target, None if renamed else original))
+            if fp.old_path is not None and fp.old_path != fp.new_path:
+                os.unlink(fp.old_path)  # deleted or renamed
+                done.append((fp.old_path, original))
+    except OSError:
+        for path, original in reversed(done):
+            if original is None:
+                os.unlink(path)
+            else:
+                with open(path, "w", encoding="utf-8", newline="") as f:
+                    f.write(original)
+        for tmp in staged:
+            if tmp is not None and os.path.exists(tmp):
+                os.unlink(tmp)
+        raise
+
+
+def apply_patch(text):
+    """Applies a unified diff; returns a summary, or raises PatchError."""
+    files = parse_patch(text)
+    changes, summary, notes, errors = [], [], [], []
+    for fp in files:
+        new_text, original, file_notes, file_errors = _apply(fp)
+        notes.extend(file_notes)
+        errors.extend(file_errors)
+        changes.append((fp, new_text, original))
+        if fp.old_path is None:
+            summary.append(f"created {fp.new_path}")
+        elif fp.new_path is None:
+            summary.append(f"deleted {fp.old_path}")
+        elif fp.old_path != fp.new_path:
+            summary.append(f"renamed {fp.old_path} -> {fp.new_path}")
+        else:
+            count = len(fp.hunks)
+            summary.append(
+                f"patched {fp.path} ({count} hunk{'s' if count != 1 else ''})"
+            )
+    paths = [fp.path for fp in files]
+    if len(set(paths)) != len(paths):
+        errors.append("patch changes the same file twice; merge its sections")
+    if errors:
+        raise PatchError(
+            "patch not applied, no file was changed:\n" + "\n".join(errors)
+        )
+
+    _commit(changes)
+    snapshot = get_snapshot()
+    for fp in files:
+        for path in (fp.old_path, fp.new_path):
+            if path:
+                snapshot.touch(path)
+    return "\n".join(["ok: " + ", ".join(summary), *notes])
@@ -0,0 +1,236 @@
+"""
+Running --tool-dir tools in worker processes (--isolate-tools).
+
+In-process, a slow plugin holds up the session and a crashing or leaking one
+takes it down. Here every call goes to one of a few long-lived workers
+(`python -m neumann.pluginpool --worker`), each of which imports a plugin
+module the first time one of its tools is called and keeps the instances
+for later calls. Calls and results are JSON lines over the worker's stdin
+and stdout; anything a tool prints goes to stderr.
+
+A call that runs past its timeout gets its worker's process group killed,
+as does a worker that dies; either way the call fails with an error the
+model can read and the next call starts a fresh worker. Workers run under
+an address-space limit, so a leaking tool fails with MemoryError instead of
+exhausting the machine.
+"""
+
+import json
+import os
+import queue
+import selectors
+import subprocess
+import sys
+import threading
+import time
+
+from .constants import PLUGIN_MEMORY_MB, PLUGIN_TIMEOUT, PLUGIN_WORKERS
+from .plugins import PluginModule
+from .shell import kill_group
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_READ_SIZE = 64 * 1024
+
+
+class WorkerError(Exception):
+    pass
+
+
+class Worker:
+    """One worker process; used by one call at a time."""
+
+    def __init__(self, memory_mb):
+        self.memory_mb = memory_mb
+        self.proc = None
+        self._buf = bytearray()
+
+    def start(self):
+        # The worker runs in our cwd, so tools see the same relative paths,
+        # and in its own session, so Ctrl-C at the prompt doesn't reach it.
+        package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        path = os.environ.get("PYTHONPATH")
+        env = dict(
+            os.environ,
+            PYTHONPATH=package_root + (os.pathsep + path if path else ""),
+        )
+        self.proc = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "neumann.pluginpool",
+                "--worker",
+                str(self.memory_mb),
+            ],
+            env=env,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            start_new_session=hasattr(os, "killpg"),
+        )
+        self._buf.clear()
+
+    def call(self, path, class_name, args, timeout):
+        """Runs one tool call; raises WorkerError if the worker must be replaced."""
+        if self.proc is None or self.proc.poll() is not None:
+            self.start()
+        request = {"path": path, "class": class_name, "args": args}
+        try:
+            self.proc.stdin.write(json.dumps(request).encode() + b"\n")
+            self.proc.stdin.flush()
+        except BrokenPipeError:
+            raise WorkerError(self._exit_reason()) from None
+        line = self._readline(time.monotonic() + timeout)
+        if line is None:
+            raise WorkerError(f"timed out after {timeout:g}s")
+        if not line:
+            raise WorkerError(self._exit_reason())
+        reply = json.loads(line)
+        if "error" in reply:
+            return f"error: {reply['error']}"
+        return reply["result"]
+
+    def _readline(self, deadline):
+        """The next reply line, b"" at EOF, or None at the deadline."""
+        stream = self.proc.stdout
+        with selectors.DefaultSelector() as sel:
+            sel.register(stream, selectors.EVENT_READ)
+            while True:
+                end = self._buf.find(b"\n")
+                if end != -1:
+                    line = bytes(self._buf[:end])
+                    del self._buf[: end + 1]
+                    return line
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                if not sel.select(remaining):
+                    continue
+                data = os.read(stream.fileno(), _READ_SIZE)
+                if not data:
+                    return b""
+                self._buf += data
+
+    def _exit_reason(self):
+        try:
+            status = self.proc.wait(1.0)
+        except subprocess.TimeoutExpired:
+            return "the worker stopped answering"
+        if status < 0:
+            return f"the worker was killed by signal {-status}"
+        return f"the worker exited with status {status}"
+
+    def close(self):
+        proc, self.proc = self.proc, None
+        if proc is None:
+            return
+        if proc.poll() is None:
+            if hasattr(os, "killpg"):
+                kill_group(proc)
+            else:
+                proc.kill()
+                proc.wait()
+        proc.stdin.close()
+        proc.stdout.close()
+
+
+class PluginPool:
+    """Up to `size` workers, started on demand and shared by all plugin tools."""
+
+    def __init__(
+        self, size=PLUGIN_WORKERS, timeout=PLUGIN_TIMEOUT, memory_mb=PLUGIN_MEMORY_MB
+    ):
+        self.size = size
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self._idle = queue.LifoQueue()  # warm workers first: their imports are done
+        self._workers = []
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._workers) < self.size:
+                worker = Worker(self.memory_mb)
+                self._workers.append(worker)
+                return worker
+        return self._idle.get()
+
+    def call(self, tool_name, path, class_name, args):
+        worker = self._acquire()
+        try:
+            return worker.call(path, class_name, args, self.timeout)
+        except WorkerError as err:
+            worker.close()  # the next call on it starts a new process
+            return f"error: {tool_name}: {err}; its worker was stopped and will restart"
+        finally:
+            self._idle.put(worker)
+
+    def close(self):
+        with self._lock:
+            workers = list(self._workers)
+        for worker in workers:
+            worker.close()
+
+
+# -----------------------------------------------------------------------------
+# Worker process
+# -----------------------------------------------------------------------------
+
+
+def _limit_memory(memory_mb):
+    if resource is None or not memory_mb:
+        return
+    limit = memory_mb * 1024 * 1024
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError):
+        pass  # e.g. above the hard limit; run without one
+
+
+def worker_main(memory_mb):
+    """Serves tool calls from stdin until it closes."""
+    # The protocol gets private copies of stdin and stdout: tools read from
+    # /dev/null and their prints go to stderr.
+    requests = os.fdopen(os.dup(0), "rb")
+    out = os.fdopen(os.dup(1), "wb")
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.close(devnull)
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+    _limit_memory(memory_mb)
+
+    modules = {}  # path -> PluginModule
+    tools = {}  # (path, class name) -> instance
+    for line in requests:
+        request = json.loads(line)
+        key = (request["path"], request["class"])
+        try:
+            tool = tools.get(key)
+            if tool is None:
+                module = modules.get(key[0])
+                if module is None:
+                    module = modules[key[0]] = PluginModule(key[0])
+                cls = getattr(module.load(), key[1], None)
+                if cls is None:
+                    raise AttributeError(f"{key[1]} no longer exists in {key[0]}")
+                tool = tools[key] = cls()
+            reply = {"result": str(tool.run(request["args"]))}
+        except MemoryError:
+            reply = {"error": f"out of memory (limit {memory_mb} MB)"}
+        except Exception as err:  # noqa: BLE001 - tool code can raise anything
+            message = str(err)
+            name = type(err).__name__
+            reply = {"error": f"{name}: {message}" if message else name}
+        out.write(json.dumps(reply).encode() + b"\n")
+        out.flush()
+
+
+if __name__ == "__main__" and sys.argv[1:2] == ["--worker"]:
+    worker_main(int(sys.argv[2]))
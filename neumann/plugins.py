@@ -0,0 +1,317 @@
+"""
+External tools from --tool-dir, loaded lazily through a manifest cache.
+
+Importing every plugin at launch is slow when plugins pull in heavy
+dependencies, and the system prompt only needs each tool's name, description
+and parameters. Those are recorded in a manifest in the workspace cache,
+keyed by file path and validated by mtime and size, then by content hash. A
+file whose entry is still valid is not imported: its tools are registered as
+LazyTool proxies, and the module is imported the first time one of them is
+called. Changed or new files are imported at once to refresh their entry.
+"""
+
+import hashlib
+import importlib.util
+import json
+import os
+import threading
+import time
+
+from .walk import cache_dir
+
+MANIFEST_VERSION = 1
+
+# Tool attributes other modules read without calling the tool; recorded so the
+# proxies can answer them without an import.
+_FLAGS = ("read_only", "confirm", "max_concurrency", "modifies")
+_REQUIRED = {"name", "description", "parameters", "run"}
+
+
+def _file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+class PluginError(Exception):
+    pass
+
+
+class PluginModule:
+    """One plugin file, imported at most once."""
+
+    def __init__(self, path, profile=None):
+        self.path = path
+        self.name = os.path.basename(path)[:-3]
+        self.profile = profile
+        self._module = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            if self._module is None:
+                start = time.perf_counter()
+                spec = importlib.util.spec_from_file_location(self.name, self.path)
+                module = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)
+                self._module = module
+                if self.profile is not None:
+                    self.profile.record(self.path, time.perf_counter() - start)
+            return self._module
+
+    def tool_classes(self):
+        """(attribute name, class, missing attributes) for candidate tool classes."""
+        module = self.load()
+        found = []
+        for attr_name in dir(module):
+            attr = getattr(module, attr_name)
+            # Must be a class defined in this file
+            if isinstance(attr, type) and attr.__module__ == module.__name__:
+                missing = _REQUIRED - set(dir(attr))
+                # Heuristic: if it has 'run' or 'parameters' it was meant to be a tool
+                if not missing or "run" in dir(attr) or "parameters" in dir(attr):
+                    found.append((attr_name, attr, missing))
+        return found
+
+
+class LazyTool:
+    """Stands in for a plugin tool until the model first calls it."""
+
+    def __init__(self, module, class_name, spec):
+        self._plugin = module
+        self._class_name = class_name
+        self._tool = None
+        self.name = spec["name"]
+        self.description = spec["description"]
+        self.parameters = spec["parameters"]
+        for flag in _FLAGS:
+            setattr(self, flag, spec.get(flag))
+
+    def _load(self):
+        if self._tool is None:
+            cls = getattr(self._plugin.load(), self._class_name, None)
+            if cls is None:
+                raise PluginError(
+                    f"{self._class_name} no longer exists in {self._plugin.path}"
+                )
+            self._tool = cls()
+        return self._tool
+
+    def run(self, args):
+        return self._load().run(args)
+
+    def __getattr__(self, attr):
+        # Anything not in the manifest (e.g. cache_state) comes from the real tool.
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        return getattr(self._load(), attr)
+
+
+class IsolatedTool:
+    """A plugin tool whose calls run in a PluginPool worker (--isolate-tools)."""
+
+    def __init__(self, pool, path, spec):
+        self._pool = pool
+        self._path = path
+        self._class_name = spec["class"]
+        self.name = spec["name"]
+        self.description = spec["description"]
+        self.parameters = spec["parameters"]
+        # Unlike LazyTool, nothing else is looked up on the real tool: that
+        # would import the module into this process.
+        for flag in _FLAGS:
+            setattr(self, flag, spec.get(flag))
+
+    def run(self, args):
+        return self._pool.call(self.name, self._path, self._class_name, args)
+
+
+class StartupProfile:
+    """Import and manifest-check times per plugin module, for --startup-profile."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.modules = []  # (path, seconds, how)
+        self.done = False  # startup is over; later imports are printed as they happen
+        self._lock = threading.Lock()
+
+    def record(self, path, seconds, how="import"):
+        with self._lock:
+            self.modules.append((path, seconds, how))
+        if self.done:
+            print(f"  ⏱ {how} {os.path.basename(path)}: {seconds * 1000:.2f}ms")
+
+    def report(self):
+        self.done = True
+        lines = [f"{'module':<32} {'ms':>9}  how"]
+        for path, seconds, how in sorted(self.modules, key=lambda m: -m[1]):
+            lines.append(f"{os.path.basename(path):<32} {seconds * 1000:9.2f}  {how}")
+        lines.append(
+            f"{'startup total':<32} {(time.perf_counter() - self.start) * 1000:9.2f}"
+        )
+        return "\n".join(lines)
+
+
+class PluginManifest:
+    """Cached tool specs for the plugin files of one directory."""
+
+    def __init__(self, tool_dir):
+        self.tool_dir = os.path.abspath(tool_dir)
+        self.path = os.path.join(cache_dir(self.tool_dir), "plugins.json")
+        self.files = {}  # path -> {"mtime_ns", "size", "sha1", "tools", "warnings"}
+        self.dirty = False
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if state.get("version") != MANIFEST_VERSION:
+            return False
+        self.files = state["files"]
+        return True
+
+    def save(self):
+        state = {"version": MANIFEST_VERSION, "files": self.files}
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+    def lookup(self, path, st):
+        """The cached entry for path, or None if the file changed."""
+        entry = self.files.get(path)
+        if entry is None:
+            return None
+        if entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+            return entry
+        if entry["size"] != st.st_size or entry["sha1"] != _file_hash(path):
+            return None
+        # Touched but not changed (checkout, copy): keep the entry.
+        entry["mtime_ns"] = st.st_mtime_ns
+        self.dirty = True
+        return entry
+
+    def update(self, path, st, tools, warnings):
+        self.files[path] = {
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+            "sha1": _file_hash(path),
+            "tools": tools,
+            "warnings": warnings,
+        }
+        self.dirty = True
+
+    def prune(self, paths):
+        for path in set(self.files) - set(paths):
+            del self.files[path]
+            self.dirty = True
+
+
+def _spec(tool, class_name):
+    """The manifest entry for a tool instance, or None if it can't be cached."""
+    spec = {
+        "class": class_name,
+        "name": tool.name,
+        "description": tool.description,
+        "parameters": tool.parameters,
+    }
+    for flag in _FLAGS:
+        if hasattr(tool, flag):
+            spec[flag] = getattr(tool, flag)
+    try:
+        json.dumps(spec)
+    except (TypeError, ValueError):
+        return None
+    return spec
+
+
+def load_plugins(tool_dir, registry, profile=None, warn=print, pool=None):
+    """
+    Registers the tools of every plugin file in tool_dir and returns how many.
+
+    `warn` receives one message per problem (import errors, classes that look
+    like tools but miss attributes, files without tools). With a PluginPool,
+    tools are registered as IsolatedTools that run in its workers; a changed
+    file is still imported here once, to describe its tools.
+    """
+    manifest = PluginManifest(tool_dir)
+    manifest.load()
+    paths = [
+        os.path.join(manifest.tool_dir, filename)
+        for filename in sorted(os.listdir(tool_dir))
+        if filename.endswith(".py") and not filename.startswith("_")
+    ]
+    count = 0
+    for path in paths:
+        filename = os.path.basename(path)
+        module = PluginModule(path, profile)
+        try:
+            start = time.perf_counter()
+            st = os.stat(path)
+            entry = manifest.lookup(path, st)
+            if entry is not None:
+                for spec in entry["tools"]:
+                    if pool is not None:
+                        registry[spec["name"]] = IsolatedTool(pool, path, spec)
+                    else:
+                        registry[spec["name"]] = LazyTool(module, spec["class"], spec)
+                count += len(entry["tools"])
+                for msg in entry["warnings"]:
+                    warn(msg)
+                if profile is not None:
+                    profile.record(path, time.perf_counter() - start, "manifest")
+                continue
+
+            specs, warnings, cacheable = [], [], True
+            for attr_name, cls, missing in module.tool_classes():
+                if missing:
+                    warnings.append(
+                        f"Skipped potential tool '{attr_name}' in {filename}. "
+                        f"Missing attributes: {missing}"
+                    )
+                    continue
+                try:
+                    tool = cls()
+                except Exception as e:  # noqa: BLE001 - plugin code can raise anything
+                    warn(f"Failed to instantiate {attr_name} from {filename}: {e!r}")
+                    cacheable = False
+                    continue
+                count += 1
+                spec = _spec(tool, attr_name)
+                if spec is None:
+                    cacheable = False
+                    if pool is not None:
+                        warn(
+                            f"{tool.name} from {filename} runs in-process: "
+                            "its description can't be sent to a worker"
+                        )
+                    registry[tool.name] = tool
+                else:
+                    specs.append(spec)
+                    registry[tool.name] = (
+                        IsolatedTool(pool, path, spec) if pool is not None else tool
+                    )
+
+            if not specs and cacheable:
+                warnings.append(
+                    f"Loaded {filename} but found no valid tools "
+                    "(classes with name, description, parameters, run)."
+                )
+            for msg in warnings:
+                warn(msg)
+            if cacheable:
+                manifest.update(path, st, specs, warnings)
+            elif manifest.files.pop(path, None) is not None:
+                manifest.dirty = True  # imported on every launch
+        except Exception as e:  # noqa: BLE001 - plugin code can raise anything
+            warn(f"Error loading tool file {filename}: {e!r}")
+
+    manifest.prune(paths)
+    if manifest.dirty:
+        try:
+            manifest.save()
+        except OSError:
+            pass
+    return count
@@ -0,0 +1,112 @@
+"""
+Buffered terminal output for streamed model text.
+
+Printing every delta costs a write syscall per token. StreamRenderer instead
+collects deltas and writes them at most `fps` times a second, or as soon as a
+line is complete; the first delta of a response is written at once so the
+answer still appears immediately. Markdown bold is tracked across deltas, so
+`**` markers split between chunks still render; an unclosed one ends at the
+next paragraph break. When the output isn't a terminal, text is passed
+through unchanged.
+"""
+
+import asyncio
+import sys
+import time
+
+from .constants import BOLD, RESET
+
+RENDER_FPS = 30
+
+
+class StreamRenderer:
+    def __init__(self, out=None, fps=RENDER_FPS, tty=None):
+        self.out = out or sys.stdout
+        self.tty = self.out.isatty() if tty is None else tty
+        self.interval = 1 / fps if fps else 0
+        self._pending = []
+        self._last_write = None  # perf_counter of the last write, None before the first
+        self._timer = None
+        self._bold = False
+        self._newline = False  # the last text rendered ended a line
+        self._star = False  # a trailing '*' held back: it may start a '**'
+
+    def _render(self, text):
+        if self._star:
+            text = "*" + text
+            self._star = False
+        if text.endswith("*") and not text.endswith("**"):
+            text = text[:-1]
+            self._star = True
+        parts = text.split("**")
+        out = [self._end_paragraph(parts[0])]
+        for part in parts[1:]:
+            self._bold = not self._bold
+            out.append(BOLD if self._bold else RESET)
+            out.append(self._end_paragraph(part))
+        return "".join(out)
+
+    def _end_paragraph(self, text):
+        # Bold can span a line break but not a paragraph break.
+        if self._bold:
+            # The reset goes between the two newlines wherever the deltas
+            # split them, so the output doesn't depend on chunking.
+            if self._newline and text.startswith("\n"):
+                i = 0
+            elif "\n\n" in text:
+                i = text.index("\n\n") + 1
+            else:
+                i = -1
+            if i != -1:
+                self._bold = False
+                text = text[:i] + RESET + text[i:]
+        if text:
+            self._newline = text.endswith("\n")
+        return text
+
+    def write(self, text):
+        if not text:
+            return
+        self._pending.append(self._render(text) if self.tty else text)
+        now = time.perf_counter()
+        if (
+            self._last_write is None
+            or "\n" in text
+            or now - self._last_write >= self.interval
+        ):
+            self.flush()
+        elif self._timer is None:
+            # Make sure a stalled stream doesn't leave text sitting in the buffer.
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            delay = self.interval - (now - self._last_write)
+            self._timer = loop.call_later(delay, self.flush)
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._pending:
+            self.out.write("".join(self._pending))
+            self._pending.clear()
+            self.out.flush()
+            self._last_write = time.perf_counter()
+
+    def line(self, text):
+        """Writes a whole line of other output (e.g. --raw) after the pending text."""
+        self.flush()
+        self.out.write(text)
+        self.out.flush()
+
+    def close(self):
+        """Writes everything still pending and resets the markdown state."""
+        if self._star:
+            self._pending.append("*")
+            self._star = False
+        if self._bold:
+            self._pending.append(RESET)
+            self._bold = False
+        self.flush()
+        self._last_write = None
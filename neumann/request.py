@@ -0,0 +1,54 @@
+"""
+Chat request construction with a stable prompt prefix.
+
+llama.cpp-based backends (including Oobabooga's) skip prefill for the part of
+a prompt that matches the previous one token for token. The builder keeps the
+system prompt fixed for the session, sends the history in the same form every
+time (compacted only by the sticky ContextManager), and compares each payload
+with the previous one so a broken prefix is reported instead of silently
+costing a full re-prefill.
+"""
+
+import hashlib
+import json
+import os
+
+from .context import ContextManager
+
+
+def _fingerprint(msg):
+    return hashlib.sha1(
+        json.dumps(msg, sort_keys=True, ensure_ascii=False).encode()
+    ).digest()
+
+
+class RequestBuilder:
+    def __init__(self, system_prompt, context=None, cache_prompt=True):
+        self.system_prompt = system_prompt
+        self.context = context or ContextManager()
+        self.cache_prompt = cache_prompt
+        self.session = os.urandom(6).hex()  # routes the conversation to one backend
+        self._sent = []  # fingerprints of the previous payload's messages
+
+    def build(self, messages, stream=True):
+        """
+        Returns (request body, ContextReport). The report's `reused` is the
+        estimated number of tokens in the prefix shared with the previous
+        request and `changed_at` the index of the first message that differs
+        from it (None while the previous payload is a prefix of this one).
+        """
+        payload, report = self.context.build(self.system_prompt, messages)
+        sent = [_fingerprint(m) for m in payload]
+        common = 0
+        for old, new in zip(self._sent, sent):
+            if old != new:
+                break
+            common += 1
+        report.reused = sum(self.context.message_tokens(m) for m in payload[:common])
+        report.changed_at = common if common < len(self._sent) else None
+        self._sent = sent
+
+        body = {"messages": payload, "stream": stream}
+        if self.cache_prompt:
+            body["cache_prompt"] = True
+        return body, report
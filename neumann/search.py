@@ -0,0 +1,299 @@
+"""
+BM25 retrieval over the workspace, for the search tool.
+
+Text files are split into chunks: a new chunk starts at an unindented line
+or a definition keyword once the current one has SEARCH_MIN_CHUNK_LINES, and
+no chunk grows past SEARCH_CHUNK_LINES, so chunks are roughly one function
+or one window of a long block. Each chunk is reduced to its terms:
+identifiers lowercased, plus their snake_case and camelCase parts, plus the
+words of the file's path. A query is tokenized the same way and chunks are
+ranked with Okapi BM25.
+
+The inverted index (term -> chunk ids and term frequencies) is persisted in
+the workspace cache and maintained like the trigram index: files are
+re-chunked when their mtime or size in the workspace snapshot changes, the
+chunks they had are tombstoned, and the postings are compacted once too many
+ids are dead.
+Large refreshes (a first build) tokenize files in grep's process pool.
+"""
+
+import heapq
+import math
+import os
+import pickle
+import re
+import threading
+from array import array
+from collections import Counter
+from functools import lru_cache
+from itertools import chain
+
+from .grep import GREP_BATCH_FILES, GREP_PARALLEL_MIN_FILES, GREP_WORKERS, get_pool
+from .snapshot import get_snapshot
+from .walk import cache_dir, is_binary, save_index, walk_files
+
+INDEX_VERSION = 1
+SEARCH_MAX_FILE_SIZE = 1024 * 1024  # larger files are not indexed
+SEARCH_CHUNK_LINES = 60
+SEARCH_MIN_CHUNK_LINES = 12
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_IDENT_RE = re.compile(rb"[A-Za-z_][A-Za-z0-9_]*|\d+")
+_PART_RE = re.compile(rb"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+_BOUNDARY_RE = re.compile(
+    rb"(?:\S|\s{0,4}(?:async\s+def|def|class|function|func|fn|pub\s+fn|impl)\s)"
+)
+_CLOSING = (b"}", b")", b"]", b"end")
+_TF_MAX = 0xFFFF
+
+
+@lru_cache(maxsize=1 << 16)
+def _word_terms(word):
+    """A word lowercased, plus its snake_case/camelCase parts if it has several."""
+    parts = _PART_RE.findall(word)
+    if len(parts) > 1:
+        return (word.lower(), *(p.lower() for p in parts))
+    return (word.lower(),)
+
+
+def term_counts(data):
+    """Counter of the index terms of a bytes text."""
+    counts = Counter()
+    for word, n in Counter(_IDENT_RE.findall(data)).items():
+        for term in _word_terms(word):
+            counts[term] += n
+    return counts
+
+
+def chunk_lines(lines):
+    """(start, end) line ranges (0-based, end exclusive) of a file's chunks."""
+    chunks, start = [], 0
+
+    def close(end):
+        while end > start + 1 and not lines[end - 1].strip():
+            end -= 1  # trailing blank lines only cost output
+        chunks.append((start, end))
+
+    for i, line in enumerate(lines):
+        size = i - start
+        if size >= SEARCH_CHUNK_LINES or (
+            size >= SEARCH_MIN_CHUNK_LINES
+            and _BOUNDARY_RE.match(line)
+            and not line.lstrip().startswith(_CLOSING)
+        ):
+            close(i)
+            start = i
+    if start < len(lines):
+        close(len(lines))
+    return chunks
+
+
+def _chunk_file(path, rel, size):
+    """(first line, end line, term counts) for each chunk of an indexed file."""
+    if size > SEARCH_MAX_FILE_SIZE or is_binary(path):
+        return []
+    try:
+        with open(path, "rb") as f:
+            lines = f.read().split(b"\n")
+    except OSError:
+        return []
+    path_terms = term_counts(rel.encode("utf-8", "surrogateescape"))
+    out = []
+    for start, end in chunk_lines(lines):
+        counts = term_counts(b"\n".join(lines[start:end]))
+        if counts:
+            counts.update(path_terms)
+            out.append((start, end, counts))
+    return out
+
+
+def _chunk_batch(items):
+    """_chunk_file for each (path, rel, size); runs in a worker for big refreshes."""
+    return [_chunk_file(*item) for item in items]
+
+
+class SearchIndex:
+    """BM25 index of the text files under root, persisted in the workspace cache."""
+
+    def __init__(self, root="."):
+        self.root = os.path.abspath(root)
+        self.path = os.path.join(cache_dir(self.root), "bm25.idx")
+        self.lock = threading.Lock()
+        self.saved_at = None  # monotonic time of the last save; see save_index()
+        self._reset()
+
+    def _reset(self):
+        self.chunks = []  # id -> (relative path, first line, end line), None once dead
+        self.lengths = array("I")  # id -> number of terms
+        self.postings = {}  # term -> (array of ids, array of term frequencies)
+        self.stats = {}  # relative path -> (mtime_ns, size, [chunk ids])
+        self.dead = 0
+        self.total_length = 0  # terms in live chunks
+
+    def load(self):
+        try:
+            with open(self.path, "rb") as f:
+                state = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return False
+        if state.get("version") != INDEX_VERSION or state.get("root") != self.root:
+            return False
+        self.chunks = state["chunks"]
+        self.lengths = state["lengths"]
+        self.postings = state["postings"]
+        self.stats = state["stats"]
+        self.dead = state["dead"]
+        self.total_length = state["total_length"]
+        return True
+
+    def save(self):
+        state = {
+            "version": INDEX_VERSION,
+            "root": self.root,
+            "chunks": self.chunks,
+            "lengths": self.lengths,
+            "postings": self.postings,
+            "stats": self.stats,
+            "dead": self.dead,
+            "total_length": self.total_length,
+        }
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+
+    def _remove(self, rel):
+        for chunk_id in self.stats.pop(rel)[2]:
+            self.chunks[chunk_id] = None
+            self.total_length -= self.lengths[chunk_id]
+            self.dead += 1
+
+    def _add(self, rel, st, file_chunks):
+        ids = []
+        self.stats[rel] = (st.st_mtime_ns, st.st_size, ids)
+        postings = self.postings
+        for start, end, counts in file_chunks:
+            chunk_id = len(self.chunks)
+            self.chunks.append((rel, start, end))
+            length = sum(counts.values())
+            self.lengths.append(length)
+            self.total_length += length
+            ids.append(chunk_id)
+            for term, tf in counts.items():
+                entry = postings.get(term)
+                if entry is None:
+                    entry = postings[term] = (array("I"), array("H"))
+                entry[0].append(chunk_id)
+                entry[1].append(tf if tf <= _TF_MAX else _TF_MAX)
+
+    def refresh(self, files=None):
+        """
+        Brings the index in line with the workspace; returns True if anything
+        changed. `files` is an iterable of (path, stat_result) for the current
+        tree, e.g. from a workspace snapshot; by default the root is walked.
+        """
+        changed = []
+        seen = set()
+        for path, st in files if files is not None else walk_files(self.root):
+            rel = os.path.relpath(path, self.root)
+            seen.add(rel)
+            old = self.stats.get(rel)
+            if old is not None and old[:2] == (st.st_mtime_ns, st.st_size):
+                continue
+            if old is not None:
+                self._remove(rel)
+            changed.append((path, rel, st))
+        removed = [rel for rel in self.stats if rel not in seen]
+        for rel in removed:
+            self._remove(rel)
+
+        items = [(path, rel, st.st_size) for path, rel, st in changed]
+        if len(items) >= GREP_PARALLEL_MIN_FILES and GREP_WORKERS > 1:
+            # A first build: tokenize in the grep process pool.
+            batches = [
+                items[i : i + GREP_BATCH_FILES]
+                for i in range(0, len(items), GREP_BATCH_FILES)
+            ]
+            results = chain.from_iterable(get_pool().map(_chunk_batch, batches))
+        else:
+            results = _chunk_batch(items)
+        for (_, rel, st), file_chunks in zip(changed, results):
+            self._add(rel, st, file_chunks)
+
+        if self.dead > max(1000, len(self.chunks) - self.dead):
+            self._compact()
+        if changed or removed:
+            save_index(self)
+        return bool(changed or removed)
+
+    def _compact(self):
+        """Drops tombstoned ids and renumbers the live chunks."""
+        remap = {}
+        chunks, lengths = [], array("I")
+        for old_id, chunk in enumerate(self.chunks):
+            if chunk is not None:
+                remap[old_id] = len(chunks)
+                chunks.append(chunk)
+                lengths.append(self.lengths[old_id])
+        postings = {}
+        for term, (ids, tfs) in self.postings.items():
+            live = [(remap[i], tf) for i, tf in zip(ids, tfs) if i in remap]
+            if live:
+                postings[term] = (
+                    array("I", (i for i, _ in live)),
+                    array("H", (tf for _, tf in live)),
+                )
+        self.chunks, self.lengths, self.postings = chunks, lengths, postings
+        self.stats = {
+            rel: (s[0], s[1], [remap[i] for i in s[2]]) for rel, s in self.stats.items()
+        }
+        self.dead = 0
+
+    def search(self, query, k, prefix=""):
+        """The k best chunks for query as [(score, rel, first line, end line)]."""
+        live = len(self.chunks) - self.dead
+        if not live:
+            return []
+        avg = self.total_length / live
+        scores = Counter()
+        for term in term_counts(query.encode("utf-8")):
+            entry = self.postings.get(term)
+            if entry is None:
+                continue
+            ids, tfs = entry
+            df = len(ids)  # counts dead ids too until compaction; close enough
+            idf = math.log(1 + (live - df + 0.5) / (df + 0.5))
+            lengths = self.lengths
+            for chunk_id, tf in zip(ids, tfs):
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[chunk_id] / avg)
+                scores[chunk_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        def candidates():
+            for chunk_id, score in scores.items():
+                chunk = self.chunks[chunk_id]
+                if chunk is None:
+                    continue
+                rel = chunk[0]
+                if not prefix or rel == prefix or rel.startswith(prefix + os.sep):
+                    yield score, rel, chunk[1], chunk[2]
+
+        return heapq.nlargest(k, candidates())
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(root=None):
+    """The shared, refreshed search index for root (default: the current directory)."""
+    root = os.path.abspath(root or os.getcwd())
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            index = _indexes[root] = SearchIndex(root)
+            index.load()
+    files = get_snapshot(root).walk()
+    with index.lock:
+        index.refresh((os.path.join(root, rel), st) for rel, st in files)
+    return index
@@ -0,0 +1,247 @@
+"""
+Subprocess engine for the bash tool.
+
+Commands run in their own process group and are read with `selectors`, so
+the deadline holds even for a command that never prints or never exits: at
+the deadline the whole group (the shell and anything it started) is killed.
+Output is capped: the first and last bytes are kept and the middle is
+dropped, so a runaway command can't fill memory or the context.
+
+ShellSession keeps one shell alive across commands, so `cd`, exported
+variables and shell functions carry over from one call to the next. Each
+command is followed by a marker line carrying its exit status, which is how
+the end of its output is found without closing the pipe.
+"""
+
+import os
+import selectors
+import shlex
+import shutil
+import signal
+import subprocess
+import threading
+import time
+
+_READ_SIZE = 64 * 1024
+_KILL_GRACE = 1.0  # seconds between SIGTERM and SIGKILL
+
+
+class OutputBuffer:
+    """Keeps the first and last `max_bytes // 2` bytes of a stream."""
+
+    def __init__(self, max_bytes, on_line=None):
+        self.half = max_bytes // 2
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.dropped = 0
+        self.on_line = on_line
+        self._line = bytearray()
+
+    def _echo(self, data):
+        # Echo only what fits in the head; the rest would just scroll by.
+        if self.dropped or len(self.head) + len(self.tail) >= self.half:
+            self._line.clear()
+            self.on_line("... (output continues)")
+            self.on_line = None
+            return
+        self._line += data
+        *lines, rest = self._line.split(b"\n")
+        for line in lines:
+            self.on_line(line.decode("utf-8", errors="replace"))
+        self._line = bytearray(rest)
+
+    def write(self, data):
+        if self.on_line is not None:
+            self._echo(data)
+        room = self.half - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        self.tail += data
+        excess = len(self.tail) - self.half
+        if excess > 0:
+            del self.tail[:excess]
+            self.dropped += excess
+
+    def flush(self):
+        if self.on_line is not None and self._line:
+            self.on_line(self._line.decode("utf-8", errors="replace"))
+            self._line.clear()
+
+    def text(self):
+        head = self.head.decode("utf-8", errors="replace")
+        tail = self.tail.decode("utf-8", errors="replace")
+        if self.dropped:
+            return f"{head}\n... ({self.dropped} bytes omitted) ...\n{tail}"
+        return head + tail
+
+
+def kill_group(proc):
+    """SIGTERM the process group, then SIGKILL whatever is left."""
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        return
+    try:
+        proc.wait(_KILL_GRACE)
+    except subprocess.TimeoutExpired:
+        pass
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    proc.wait()
+
+
+def _pump(stream, deadline, out, until=None):
+    """
+    Copies `stream` into `out` until EOF, the deadline, or `until(data)`
+    reports the end. Returns "eof", "timeout" or "done".
+    """
+    with selectors.DefaultSelector() as sel:
+        sel.register(stream, selectors.EVENT_READ)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return "timeout"
+            if not sel.select(remaining):
+                continue
+            data = os.read(stream.fileno(), _READ_SIZE)
+            if not data:
+                return "eof"
+            if until is not None:
+                data, done = until(data)
+                out.write(data)
+                if done:
+                    return "done"
+            else:
+                out.write(data)
+
+
+def run_command(cmd, timeout, max_bytes, on_line=None):
+    """Runs cmd in a fresh shell; returns (output, exit status or None on timeout)."""
+    out = OutputBuffer(max_bytes, on_line)
+    if not hasattr(os, "killpg"):  # Windows: no process groups or pipe selectors
+        try:
+            proc = subprocess.run(
+                cmd,
+                shell=True,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                timeout=timeout,
+            )
+        except subprocess.TimeoutExpired as err:
+            out.write(err.stdout or b"")
+            out.flush()
+            return out.text(), None
+        out.write(proc.stdout)
+        out.flush()
+        return out.text(), proc.returncode
+
+    proc = subprocess.Popen(
+        cmd,
+        shell=True,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        start_new_session=True,
+    )
+    deadline = time.monotonic() + timeout
+    try:
+        status = _pump(proc.stdout, deadline, out)
+        if status == "eof":
+            # Output closed; the command itself may still be running.
+            try:
+                proc.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                status = "timeout"
+    finally:
+        if proc.poll() is None:
+            kill_group(proc)
+        proc.stdout.close()
+        out.flush()
+    return out.text(), None if status == "timeout" else proc.returncode
+
+
+class ShellSession:
+    """One long-lived shell that runs commands in sequence."""
+
+    def __init__(self, shell=None):
+        self.shell = shell or shutil.which("bash") or "/bin/sh"
+        self._proc = None
+        self._marker = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        self._marker = f"__neu_done_{os.urandom(8).hex()}__".encode()
+        self._proc = subprocess.Popen(
+            [self.shell],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+
+    def run(self, cmd, timeout, max_bytes, on_line=None):
+        """
+        Runs cmd in the session; returns (output, exit status or None on
+        timeout, whether the shell had to be restarted afterwards).
+        """
+        with self._lock:
+            if self._proc is None or self._proc.poll() is not None:
+                self._start()
+            proc, marker = self._proc, self._marker
+            # eval keeps a syntax error from ending the shell; stdin is
+            # redirected so the command can't read the lines that follow it.
+            script = (
+                f"eval {shlex.quote(cmd)} < /dev/null\n"
+                f"printf '\\n{marker.decode()}%d\\n' \"$?\"\n"
+            )
+            out = OutputBuffer(max_bytes, on_line)
+            carry = bytearray()
+            result = {}
+
+            def until(data):
+                carry.extend(data)
+                i = carry.find(marker)
+                if i != -1:
+                    end = carry.find(b"\n", i)
+                    if end == -1:
+                        return b"", False  # wait for the rest of the status line
+                    result["status"] = int(carry[i + len(marker) : end] or b"1")
+                    # Drop the newline printed before the marker.
+                    data = bytes(carry[: max(i - 1, 0)])
+                    carry.clear()
+                    return data, True
+                # Hold back enough to recognize a marker split across reads.
+                keep = len(marker) + 1
+                data = bytes(carry[:-keep])
+                del carry[:-keep]
+                return data, False
+
+            try:
+                proc.stdin.write(script.encode())
+                proc.stdin.flush()
+                state = _pump(proc.stdout, time.monotonic() + timeout, out, until)
+            except BrokenPipeError:
+                state = "eof"
+            if state == "done":
+                out.flush()
+                return out.text(), result["status"], False
+
+            out.write(bytes(carry))
+            out.flush()
+            self.close()
+            if state == "timeout":
+                return out.text(), None, True
+            return out.text(), proc.returncode, True
+
+    def close(self):
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        if proc.poll() is None:
+            kill_group(proc)
+        proc.stdin.close()
+        proc.stdout.close()
@@ -0,0 +1,275 @@
+"""
+In-memory snapshot of the workspace tree with cached stat results.
+
+Listing a directory records the DirEntry stat of every file in it. A refresh
+stats each directory once and only re-lists the ones whose mtime changed, so
+repeated glob/grep/read calls in a session cost one syscall per directory
+instead of several per file.
+
+Editing a file in place does not change its directory's mtime; tools that
+write files call touch(), and anything that can change the tree arbitrarily
+(e.g. a shell command or a plugin tool) calls invalidate(). Neither covers a
+file changed by the user's editor, so the session also calls invalidate_all()
+when a new turn starts: the first walk of each turn stats every file again,
+and later ones within the turn only re-list changed directories.
+"""
+
+import os
+import re
+import threading
+
+from .walk import SKIP_DIRS, IgnoreRules, glob_to_regex
+
+
+class _Dir:
+    __slots__ = ("dirs", "files", "ignore_key", "ignore_rules", "mtime_ns")
+
+    def __init__(self, mtime_ns):
+        self.mtime_ns = mtime_ns
+        self.files = {}  # name -> stat_result
+        self.dirs = []  # sorted subdirectory names
+        self.ignore_key = None  # stat of this directory's .gitignore
+        self.ignore_rules = []
+
+
+class WorkspaceSnapshot:
+    """Cached view of the files under root, honouring SKIP_DIRS and .gitignore."""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self._dirs = {}  # relative dir ("" for root) -> _Dir
+        self._rules = {}  # relative dir -> IgnoreRules in effect inside it
+        self._lock = threading.RLock()
+
+    # -- maintenance ----------------------------------------------------------
+
+    def _list(self, rel, mtime_ns):
+        node = _Dir(mtime_ns)
+        try:
+            with os.scandir(os.path.join(self.root, rel)) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            return node
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIP_DIRS:
+                        node.dirs.append(entry.name)
+                elif entry.is_file():
+                    node.files[entry.name] = entry.stat()
+            except OSError:
+                continue
+        return node
+
+    def _own_rules(self, rel, node):
+        st = node.files.get(".gitignore")
+        key = (st.st_mtime_ns, st.st_size) if st else None
+        if key != node.ignore_key:
+            node.ignore_key = key
+            path = os.path.join(self.root, rel, ".gitignore")
+            node.ignore_rules = IgnoreRules.read(path, rel) if key else []
+        return node.ignore_rules
+
+    def refresh(self):
+        """Re-lists directories whose mtime changed since the last refresh."""
+        with self._lock:
+            dirs, rules_by_dir = {}, {}
+            stack = [("", IgnoreRules())]
+            while stack:
+                rel, parent_rules = stack.pop()
+                try:
+                    mtime_ns = os.stat(os.path.join(self.root, rel)).st_mtime_ns
+                except OSError:
+                    continue
+                node = self._dirs.get(rel)
+                if node is None or node.mtime_ns != mtime_ns:
+                    node = self._list(rel, mtime_ns)
+                dirs[rel] = node
+                rules = parent_rules.extend(self._own_rules(rel, node))
+                rules_by_dir[rel] = rules
+                for name in reversed(node.dirs):
+                    child = f"{rel}/{name}" if rel else name
+                    if not rules.ignored(child, name, True):
+                        stack.append((child, rules))
+            self._dirs, self._rules = dirs, rules_by_dir
+
+    def invalidate(self):
+        """Forces every directory to be re-listed on the next refresh."""
+        with self._lock:
+            for node in self._dirs.values():
+                node.mtime_ns = None
+
+    def touch(self, path):
+        """Updates the cached stat of a file written in place."""
+        rel = self.relpath(path)
+        if rel is None:
+            return
+        parent, _, name = rel.rpartition("/")
+        with self._lock:
+            node = self._dirs.get(parent)
+            if node is None:
+                return
+            try:
+                node.files[name] = os.stat(os.path.join(self.root, rel))
+            except OSError:
+                node.files.pop(name, None)
+
+    # -- queries --------------------------------------------------------------
+
+    def relpath(self, path):
+        """Path relative to root using '/', or None if it is outside the snapshot."""
+        target = os.path.abspath(path)
+        if target == self.root:
+            return ""
+        if not target.startswith(self.root + os.sep):
+            return None
+        return os.path.relpath(target, self.root).replace(os.sep, "/")
+
+    def _visible(self, rel, node):
+        rules = self._rules.get(rel)
+        for name, st in node.files.items():
+            child = f"{rel}/{name}" if rel else name
+            if rules is None or not rules.ignored(child, name, False):
+                yield name, st
+
+    def walk(self, rel=""):
+        """
+        Refreshes, then returns [(relative path, stat_result)] for the files
+        under rel, in the same order and with the same filtering as
+        walk.walk_files(); or None if rel is not a directory in the snapshot.
+        """
+        with self._lock:
+            self.refresh()
+            if rel not in self._dirs:
+                return None
+            result = []
+            stack = [iter(self._children(rel))]
+            while stack:
+                item = next(stack[-1], None)
+                if item is None:
+                    stack.pop()
+                elif item[1] is None:
+                    stack.append(iter(self._children(item[0])))
+                else:
+                    result.append(item)
+        return result
+
+    def _children(self, rel):
+        """Visible files and listed subdirectories of rel, by name; dirs have no stat."""
+        node = self._dirs.get(rel)
+        if node is None:
+            return []
+        prefix = f"{rel}/" if rel else ""
+        entries = list(self._visible(rel, node))
+        entries += [(name, None) for name in node.dirs if prefix + name in self._dirs]
+        entries.sort(key=lambda e: e[0])
+        return [(prefix + name, st) for name, st in entries]
+
+    def find_name(self, name, limit=5):
+        """Relative paths of files called `name` anywhere in the workspace."""
+        with self._lock:
+            self.refresh()
+            found = []
+            for rel in sorted(self._dirs):
+                if name in self._dirs[rel].files:
+                    found.append(f"{rel}/{name}" if rel else name)
+                    if len(found) == limit:
+                        break
+            return found
+
+    def glob(self, pattern, rel=""):
+        """
+        Relative paths under rel matching a glob pattern ('*', '?', '[...]',
+        '**' for any number of directories). As with glob.glob, wildcards
+        don't match names starting with '.' unless the pattern segment does.
+        Returns (path, mtime) pairs, newest first, with directories last; or
+        None if rel is not a directory in the snapshot.
+        """
+        with self._lock:
+            self.refresh()
+            if rel not in self._dirs:
+                return None
+            segments = [s for s in pattern.split("/") if s and s != "."]
+            matches = {}
+            self._match(rel, segments, matches)
+        return sorted(matches.items(), key=lambda item: item[1], reverse=True)
+
+    def _match(self, rel, segments, matches):
+        node = self._dirs.get(rel)
+        if node is None:
+            return
+        if not segments:
+            return
+        seg, rest = segments[0], segments[1:]
+        prefix = f"{rel}/" if rel else ""
+
+        if seg == "**":
+            if not rest:
+                for child, st in self._depth_first_all(rel):
+                    matches[child] = st.st_mtime if st else 0
+                return
+            self._match(rel, rest, matches)
+            for name in node.dirs:
+                if not name.startswith(".") and prefix + name in self._dirs:
+                    self._match(prefix + name, segments, matches)
+            return
+
+        regex = re.compile(glob_to_regex(seg))
+        hidden_ok = seg.startswith(".")
+
+        def candidates():
+            for name, st in self._visible(rel, node):
+                yield name, st
+            for name in node.dirs:
+                yield name, None
+
+        for name, st in candidates():
+            if (name.startswith(".") and not hidden_ok) or not regex.fullmatch(name):
+                continue
+            child = prefix + name
+            if not rest:
+                if st is not None or child in self._dirs:
+                    matches[child] = st.st_mtime if st else 0
+            elif st is None:
+                self._match(child, rest, matches)
+
+    def _depth_first_all(self, rel):
+        """Non-hidden files and directories under rel (for a trailing '**')."""
+        out = []
+        stack = [rel]
+        while stack:
+            current = stack.pop()
+            node = self._dirs.get(current)
+            if node is None:
+                continue
+            prefix = f"{current}/" if current else ""
+            for name, st in self._visible(current, node):
+                if not name.startswith("."):
+                    out.append((prefix + name, st))
+            for name in node.dirs:
+                child = prefix + name
+                if not name.startswith(".") and child in self._dirs:
+                    out.append((child, None))
+                    stack.append(child)
+        return out
+
+
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+def get_snapshot(root=None):
+    """The shared snapshot for root (default: the current directory)."""
+    root = os.path.abspath(root or os.getcwd())
+    with _snapshots_lock:
+        snapshot = _snapshots.get(root)
+        if snapshot is None:
+            snapshot = _snapshots[root] = WorkspaceSnapshot(root)
+        return snapshot
+
+
+def invalidate_all():
+    with _snapshots_lock:
+        snapshots = list(_snapshots.values())
+    for snapshot in snapshots:
+        snapshot.invalidate()
@@ -0,0 +1,128 @@
+"""
+Session spool for oversized tool results.
+
+A result longer than the spool threshold is written to a file in a per-session
+temporary directory, and the model gets its first and last lines plus a
+handle instead. The `page` tool reads a spooled result back by line range,
+byte range or regex, so only the part the model asks for enters the context.
+The directory is removed when the session ends.
+"""
+
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+from .constants import SPOOL_EXCERPT_CHARS, SPOOL_EXCERPT_LINES, SPOOL_THRESHOLD
+from .grep import GREP_HIT_LIMIT, search_file
+from .lineindex import format_line, read_numbered
+
+_HANDLE_RE = re.compile(r"out-\d+")
+
+
+def _cut(text, limit, from_end=False):
+    """At most `limit` chars of text, at a line boundary where possible."""
+    if len(text) <= limit:
+        return text
+    if from_end:
+        text = text[-limit:]
+        nl = text.find("\n")
+        return text[nl + 1 :] if 0 <= nl < len(text) - 1 else text
+    text = text[:limit]
+    nl = text.rfind("\n")
+    return text[: nl + 1] if nl > 0 else text
+
+
+class Spool:
+    def __init__(self, threshold=SPOOL_THRESHOLD):
+        self.threshold = threshold  # characters; 0 disables spooling
+        self.dir = None  # created on first use
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def path(self, handle):
+        if not _HANDLE_RE.fullmatch(handle) or self.dir is None:
+            raise FileNotFoundError(f"no spooled output '{handle}'")
+        path = os.path.join(self.dir, handle + ".txt")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"no spooled output '{handle}'")
+        return path
+
+    def _write(self, text):
+        with self._lock:
+            if self.dir is None:
+                self.dir = tempfile.mkdtemp(prefix="neu-spool-")
+            self._count += 1
+            handle = f"out-{self._count}"
+        with open(os.path.join(self.dir, handle + ".txt"), "w", encoding="utf-8") as f:
+            f.write(text)
+        return handle
+
+    def fit(self, name, result):
+        """Returns result, or an excerpt and handle if it is over the threshold."""
+        if not self.threshold or len(result) <= self.threshold:
+            return result
+        handle = self._write(result)
+        lines = result.split("\n")
+        n = SPOOL_EXCERPT_LINES
+        if len(lines) > 2 * n:
+            head, tail = "\n".join(lines[:n]), "\n".join(lines[-n:])
+            gap = f"... ({len(lines) - 2 * n} more lines) ..."
+            ranges = "offset/limit for lines, bytes=START-END for a byte range"
+        else:
+            head, tail, gap = result, result, "..."  # a few very long lines
+            ranges = "bytes=START-END for a byte range"
+        head = _cut(head, SPOOL_EXCERPT_CHARS)
+        tail = _cut(tail, SPOOL_EXCERPT_CHARS, from_end=True)
+        return (
+            f"[{name} output: {len(lines)} lines, {len(result)} chars; saved as "
+            f'"{handle}". Its start and end follow. Use page(handle="{handle}") '
+            f"with {ranges}, or pat to filter lines by regex.]\n"
+            f"{head}\n{gap}\n{tail}"
+        )
+
+    def page(self, handle, offset=0, limit=None, byte_range=None, pat=None):
+        """A slice of a spooled result, capped at the spool threshold."""
+        path = self.path(handle)
+        budget = self.threshold or None
+        if byte_range:
+            start, _, end = byte_range.partition("-")
+            start = int(start or 0)
+            end = int(end) if end else os.path.getsize(path)
+            note = ""
+            if budget and end - start > budget:
+                end = start + budget
+                note = f"\n... (output limit reached; continue with bytes={end}-)"
+            with open(path, "rb") as f:
+                f.seek(start)
+                data = f.read(max(end - start, 0))
+            return data.decode("utf-8", errors="replace") + note
+        if pat:
+            pattern = re.compile(pat)
+            out, used = [], 0
+            for number, line in search_file(path, pattern):
+                text = format_line(number, line.encode("utf-8") + b"\n")
+                if len(out) == GREP_HIT_LIMIT or (budget and used + len(text) > budget):
+                    out.append(
+                        f"... (limit reached; more matches from line {number})\n"
+                    )
+                    break
+                out.append(text)
+                used += len(text)
+            return "".join(out) or "none"
+        if budget:
+            return read_numbered(path, offset, limit, budget)
+        return read_numbered(path, offset, limit)
+
+    def close(self):
+        if self.dir is not None:
+            shutil.rmtree(self.dir, ignore_errors=True)
+            self.dir = None
+
+
+_spool = Spool()
+
+
+def get_spool():
+    return _spool
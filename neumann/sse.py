@@ -0,0 +1,301 @@
+"""
+Incremental Server-Sent Events parser.
+
+Replaces the vendored sseclient-py reader on the streaming hot path: bytes are
+appended to a single growable buffer, scanned once for line endings, and each
+event's data is decoded exactly once when the event is dispatched.
+"""
+
+import re
+
+# Per the spec a line ends with CRLF, a lone LF, or a lone CR.
+_LINE_END = re.compile(rb"\r\n|\r|\n")
+
+_READ_SIZE = 64 * 1024
+
+
+class Event:
+    """Representation of an event from the event stream."""
+
+    __slots__ = ("data", "event", "id", "retry")
+
+    def __init__(self, id=None, event="message", data="", retry=None):
+        self.id = id
+        self.event = event
+        self.data = data
+        self.retry = retry
+
+    def __repr__(self):
+        return f"Event(id={self.id!r}, event={self.event!r}, data={self.data!r})"
+
+    def __str__(self):
+        s = f"{self.event} event"
+        if self.id:
+            s += f" #{self.id}"
+        if self.data:
+            s += f", {len(self.data)} byte{'s' if len(self.data) != 1 else ''}"
+        else:
+            s += ", no data"
+        if self.retry:
+            s += f", retry in {self.retry}ms"
+        return s
+
+
+class SSEParser:
+    """
+    Push parser for an SSE byte stream.
+
+    Call feed() with raw chunks as they arrive; it returns the events completed
+    by that chunk. Call flush() at end of stream to dispatch a trailing event
+    that was not terminated by a blank line.
+    """
+
+    __slots__ = ("_buf", "_char_enc", "_cr", "_data", "_event", "_id", "_retry")
+
+    def __init__(self, char_enc="utf-8"):
+        self._char_enc = char_enc
+        self._buf = bytearray()
+        self._cr = False
+        self._reset()
+
+    def _reset(self):
+        self._data = bytearray()
+        self._event = None
+        self._id = None
+        self._retry = None
+
+    def feed(self, chunk):
+        buf = self._buf
+        # Only the unconsumed tail of a partial line is re-examined: resume the
+        # scan one byte early in case it ended on a CR.
+        scan = len(buf) - 1 if buf else 0
+        buf += chunk
+        if not self._cr and b"\r" in chunk:
+            # The LF-only framing below leaves whole lines in the buffer, so
+            # switching to per-line scanning starts over from its beginning.
+            self._cr = True
+            scan = 0
+        events = []
+        pos = 0
+
+        if self._cr:
+            end_of_buf = len(buf)
+            search = _LINE_END.search
+            while True:
+                match = search(buf, scan)
+                if match is None:
+                    break
+                start, end = match.span()
+                # A trailing CR may be the first half of a CRLF split across chunks.
+                if end == end_of_buf and buf[start:end] == b"\r":
+                    break
+                self._line(buf, pos, start, events)
+                pos = scan = end
+        else:
+            # LF-only streams (the common case) are framed a whole event at a
+            # time by searching for the blank line that terminates it.
+            find = buf.find
+            while True:
+                end = find(b"\n\n", scan)
+                if end == -1:
+                    break
+                self._block(buf, pos, end, events)
+                pos = scan = end + 2
+
+        # Drop consumed bytes once per chunk so the buffer only holds a partial line.
+        if pos:
+            del buf[:pos]
+        return events
+
+    def _block(self, buf, start, end, events):
+        """Handles the LF-terminated lines in buf[start:end] plus the blank line after them."""
+        if (
+            not self._data
+            and buf.startswith(b"data:", start)
+            and buf.find(b"\n", start, end) == -1
+        ):
+            # Single `data:` line with no other fields: decode straight from the buffer.
+            start += 5
+            if start < end and buf[start] == 0x20:
+                start += 1
+            events.append(
+                Event(
+                    self._id,
+                    self._event or "message",
+                    buf[start:end].decode(self._char_enc),
+                    self._retry,
+                )
+            )
+            if self._event or self._id or self._retry is not None:
+                self._reset()
+            return
+        while start < end:
+            line_end = buf.find(b"\n", start, end)
+            if line_end == -1:
+                line_end = end
+            self._line(buf, start, line_end, events)
+            start = line_end + 1
+        self._line(buf, end, end, events)
+
+    def _line(self, buf, start, end, events):
+        if start == end:
+            event = self._dispatch()
+            if event is not None:
+                events.append(event)
+        elif buf.startswith(b"data:", start):
+            start += 5
+            if start < end and buf[start] == 0x20:
+                start += 1
+            self._data += buf[start:end]
+            self._data += b"\n"
+        else:
+            self._field(buf, start, end)
+
+    def flush(self):
+        """Dispatch whatever is left in the buffer at end of stream."""
+        buf = self._buf
+        events = []
+        pos = 0
+        for match in _LINE_END.finditer(buf):
+            self._line(buf, pos, match.start(), events)
+            pos = match.end()
+        if pos < len(buf):
+            self._line(buf, pos, len(buf), events)
+        buf.clear()
+        event = self._dispatch()
+        if event is not None:
+            events.append(event)
+        return events
+
+    def _field(self, buf, start, end):
+        # Lines starting with a colon are comments.
+        if buf[start] == 0x3A:
+            return
+        colon = buf.find(b":", start, end)
+        if colon == -1:
+            field, value_start = bytes(buf[start:end]), end
+        else:
+            field = bytes(buf[start:colon])
+            value_start = colon + 1
+            if value_start < end and buf[value_start] == 0x20:
+                value_start += 1
+
+        if field == b"data":
+            self._data += buf[value_start:end]
+            self._data += b"\n"
+        elif field == b"event":
+            self._event = buf[value_start:end].decode(self._char_enc)
+        elif field == b"id":
+            self._id = buf[value_start:end].decode(self._char_enc)
+        elif field == b"retry":
+            value = buf[value_start:end]
+            if value.isdigit():
+                self._retry = int(value)
+
+    def _dispatch(self):
+        data = self._data
+        event = None
+        # Events with no data are not dispatched.
+        if data:
+            event = Event(
+                self._id,
+                self._event or "message",
+                data[:-1].decode(self._char_enc),
+                self._retry,
+            )
+        self._reset()
+        return event
+
+
+class SSEClient:
+    """
+    Drop-in replacement for the vendored SSEClient, backed by SSEParser.
+
+    The event source may be any file-like HTTP response or an iterable of
+    byte chunks.
+    """
+
+    def __init__(self, event_source, char_enc="utf-8"):
+        self._event_source = event_source
+        self._char_enc = char_enc
+        self.chunks = 0  # reads that returned data
+        self.bytes = 0
+
+    def _chunks(self):
+        read1 = getattr(self._event_source, "read1", None)
+        if read1 is None:
+            yield from self._event_source
+            return
+        while True:
+            chunk = read1(_READ_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    def events(self):
+        parser = SSEParser(self._char_enc)
+        for chunk in self._chunks():
+            self.chunks += 1
+            self.bytes += len(chunk)
+            yield from parser.feed(chunk)
+        yield from parser.flush()
+
+    def close(self):
+        """Manually close the event source stream."""
+        self._event_source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncSSEClient:
+    """
+    asyncio version of SSEClient over an async iterable of byte chunks, such
+    as an aiotransport.AsyncResponse.
+    """
+
+    def __init__(self, event_source, char_enc="utf-8"):
+        self._event_source = event_source
+        self._char_enc = char_enc
+        self._stream = None
+        self._first = None  # event read ahead by prefetch()
+        self.chunks = 0
+        self.bytes = 0
+
+    async def _parse(self):
+        parser = SSEParser(self._char_enc)
+        async for chunk in self._event_source:
+            self.chunks += 1
+            self.bytes += len(chunk)
+            for event in parser.feed(chunk):
+                yield event
+        for event in parser.flush():
+            yield event
+
+    async def prefetch(self):
+        """
+        Waits for the first event without consuming it, so a caller can tell
+        a backend that fails before answering from one that is streaming.
+        Errors from the event source propagate.
+        """
+        self._stream = self._parse()
+        try:
+            self._first = await self._stream.__anext__()
+        except StopAsyncIteration:
+            pass
+
+    async def events(self):
+        if self._stream is None:
+            self._stream = self._parse()
+        if self._first is not None:
+            first, self._first = self._first, None
+            yield first
+        async for event in self._stream:
+            yield event
+
+    def close(self):
+        """Closes the event source; aborts the connection if the stream is unfinished."""
+        self._event_source.close()
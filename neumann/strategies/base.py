@@ -14,12 +14,13 @@ class BaseStrategy(ABC):
         pass
 
     @abstractmethod
-    def get_system_prompt(self, tool_registry: dict) -> str:
+    def get_system_prompt(self, tool_registry: dict, repo_map: str = None) -> str:
         """
         Generates the system prompt including tool definitions.
 
         Args:
             tool_registry: Dictionary of tool names to tool instances.
+            repo_map: Optional outline of the workspace (see symbols.repo_map).
 
         Returns:
             The formatted system prompt.
@@ -43,3 +44,50 @@ class BaseStrategy(ABC):
             }]
         """
         pass
+
+    def stream_parser(self) -> "ToolCallStreamParser":
+        """
+        Returns a parser that is fed content deltas while the response streams.
+
+        Strategies that can recognize a complete tool call before the stream ends
+        should override this; the default buffers everything and defers to
+        parse_tool_calls() in finish().
+        """
+        return BufferedToolCallParser(self)
+
+
+class ToolCallStreamParser(ABC):
+    """
+    Incremental tool call parser.
+
+    feed() receives each content delta and returns the tool calls completed by
+    it; finish() is called once at the end of the stream. `consumed` is the
+    number of characters of input up to the end of the last emitted call.
+    """
+
+    consumed = 0
+
+    @abstractmethod
+    def feed(self, text: str) -> list[dict]:
+        pass
+
+    def finish(self) -> list[dict]:
+        return []
+
+
+class BufferedToolCallParser(ToolCallStreamParser):
+    """Fallback parser that only parses once the whole text is known."""
+
+    def __init__(self, strategy: BaseStrategy):
+        self._strategy = strategy
+        self._chunks = []
+
+    def feed(self, text: str) -> list[dict]:
+        self._chunks.append(text)
+        return []
+
+    def finish(self) -> list[dict]:
+        text = "".join(self._chunks)
+        self._chunks = []
+        self.consumed += len(text)
+        return self._strategy.parse_tool_calls(text)
@@ -2,7 +2,7 @@ import json
 import os
 import re
 
-from .base import BaseStrategy
+from .base import BaseStrategy, ToolCallStreamParser
 
 
 class QwenStrategy(BaseStrategy):
@@ -14,47 +14,141 @@ class QwenStrategy(BaseStrategy):
     def name(self) -> str:
         return "qwen"
 
-    def get_system_prompt(self, tool_registry: dict) -> str:
-        prompt = f"Concise coding assistant. cwd: {os.getcwd()}\n\n"
+    def get_system_prompt(self, tool_registry: dict, repo_map: str = None) -> str:
+        # Everything but the cwd is identical across sessions, and tools are listed
+        # by name rather than load order, so the backend can reuse a cached prefix.
+        prompt = "Concise coding assistant.\n\n"
         prompt += "You have access to the following tools:\n"
 
-        for tool in tool_registry.values():
+        for _, tool in sorted(tool_registry.items()):
             param_str = ", ".join(f"{k}: {v}" for k, v in tool.parameters.items())
             prompt += f"- {tool.name}({param_str}): {tool.description}\n"
 
+        if "patch" in tool_registry:
+            prompt += (
+                "\nTo change existing code, prefer one patch call with a unified "
+                "diff over several edit or write calls: it can change many places "
+                "in many files, and you only send the changed lines with about "
+                "three lines of context.\n"
+            )
+
         prompt += "\nTo use a tool, you MUST use this exact XML format:\n"
         prompt += "<function=tool_name>\n<parameter=param_name>value</parameter>\n</function>\n"
         prompt += "\nExample:\n<function=read>\n<parameter=path>file.txt</parameter>\n</function>\n"
+        if repo_map:
+            prompt += (
+                f"\nRepository map (file: classes[methods]; functions):\n{repo_map}\n"
+            )
+        prompt += f"\ncwd: {os.getcwd()}\n"
 
         return prompt
 
     def parse_tool_calls(self, text: str) -> list[dict]:
         """Parses Qwen/XML-style tool calls from text content."""
-        tools = []
-        # Find all function blocks
-        func_iter = re.finditer(r"<function=(\w+)>(.*?)</function>", text, re.DOTALL)
-        for match in func_iter:
-            name = match.group(1)
-            body = match.group(2)
-            args = {}
-            # Parse parameters
-            param_iter = re.finditer(
-                r"<parameter=(\w+)>(.*?)</parameter>", body, re.DOTALL
-            )
-            for p_match in param_iter:
-                key = p_match.group(1)
-                # Use strip() to remove surrounding whitespace/newlines
-                val = p_match.group(2).strip()
-                args[key] = val
-
-            tools.append(
-                {
-                    "id": f"call_{os.urandom(4).hex()}",
-                    "type": "function",
-                    "function": {
-                        "name": name,
-                        "arguments": json.dumps(args),
-                    },
-                }
-            )
-        return tools
+        parser = self.stream_parser()
+        return parser.feed(text) + parser.finish()
+
+    def stream_parser(self) -> "QwenToolCallParser":
+        return QwenToolCallParser()
+
+
+_OPEN_TAG = "<function="
+_CLOSE_TAG = "</function>"
+_NAME_RE = re.compile(r"\w+")
+_PARAM_RE = re.compile(r"<parameter=(\w+)>(.*?)</parameter>", re.DOTALL)
+
+
+def _make_tool_call(name: str, body: str) -> dict:
+    args = {}
+    # Parse parameters
+    for p_match in _PARAM_RE.finditer(body):
+        key = p_match.group(1)
+        # Use strip() to remove surrounding whitespace/newlines
+        val = p_match.group(2).strip()
+        args[key] = val
+
+    return {
+        "id": f"call_{os.urandom(4).hex()}",
+        "type": "function",
+        "function": {
+            "name": name,
+            "arguments": json.dumps(args),
+        },
+    }
+
+
+class QwenToolCallParser(ToolCallStreamParser):
+    """
+    State machine over the Qwen XML format, fed one delta at a time.
+
+    Matches the same blocks as `<function=(\\w+)>(.*?)</function>` would over the
+    full text, but emits each block as soon as its closing tag arrives.
+    Outside a function body only a possible partial tag is kept in memory.
+    """
+
+    # States
+    TEXT, NAME, BODY = range(3)
+
+    def __init__(self):
+        self._state = self.TEXT
+        self._pending = ""  # unresolved text in the TEXT and NAME states
+        self._offset = 0  # absolute input position of _pending (or of the body text)
+        self._name = ""
+        self._parts = []  # body deltas received so far
+        self._tail = ""  # end of the body, in case the closing tag is split
+
+    def feed(self, text: str) -> list[dict]:
+        calls = []
+        while True:
+            if self._state == self.BODY:
+                window = self._tail + text
+                k = window.find(_CLOSE_TAG)
+                if k == -1:
+                    self._parts.append(text)
+                    self._tail = window[-(len(_CLOSE_TAG) - 1) :]
+                    self._offset += len(text)
+                    return calls
+                cut = k - len(self._tail)  # closing tag position within text
+                body = "".join(self._parts)
+                body = body[:cut] if cut < 0 else body + text[:cut]
+                calls.append(_make_tool_call(self._name, body))
+                self._offset += cut + len(_CLOSE_TAG)
+                self.consumed = self._offset
+                text = text[cut + len(_CLOSE_TAG) :]
+                self._parts, self._tail = [], ""
+                self._state = self.TEXT
+                continue
+
+            buf = self._pending + text
+            text = ""
+
+            if self._state == self.TEXT:
+                i = buf.find(_OPEN_TAG)
+                if i == -1:
+                    # Keep only what could still be the start of an opening tag.
+                    keep = min(len(buf), len(_OPEN_TAG) - 1)
+                    self._offset += len(buf) - keep
+                    self._pending = buf[len(buf) - keep :]
+                    return calls
+                self._offset += i
+                self._pending = buf[i:]
+                self._state = self.NAME
+                continue
+
+            # NAME: buf starts with the opening tag
+            j = buf.find(">", len(_OPEN_TAG))
+            name = buf[len(_OPEN_TAG) : j if j != -1 else len(buf)]
+            if (name or j != -1) and not _NAME_RE.fullmatch(name):
+                # Not a tool call after all; resume scanning past the '<'.
+                self._offset += 1
+                self._pending = buf[1:]
+                self._state = self.TEXT
+                continue
+            if j == -1:
+                self._pending = buf
+                return calls
+            self._name = name
+            self._offset += j + 1
+            self._pending = ""
+            self._state = self.BODY
+            text = buf[j + 1 :]
@@ -0,0 +1,395 @@
+"""
+Symbol index of the Python files in the workspace.
+
+Each file is parsed with `ast` into its definitions (classes, functions,
+methods, module- and class-level names), imports and call sites, each with
+its line number, so "where is X defined / who calls X" is one lookup instead
+of a glob, a grep and several reads. The index is persisted in the workspace
+cache and kept up to date by mtime and size, like the trigram index: only
+source files whose workspace snapshot stat changed are parsed again.
+
+repo_map() condenses the index to the top-level classes and functions of the
+most referenced files, for the system prompt.
+"""
+
+import ast
+import os
+import pickle
+import threading
+import warnings
+from collections import Counter
+
+from .snapshot import get_snapshot
+from .walk import cache_dir, save_index, walk_files
+
+INDEX_VERSION = 2
+SYMBOL_MAX_FILE_SIZE = 1024 * 1024  # larger (generated) files are not parsed
+SYMBOL_RESULT_LIMIT = 50
+SOURCE_SUFFIXES = (".py", ".pyi")
+
+# Kinds of definitions
+CLASS, FUNCTION, METHOD, VARIABLE = "class", "def", "method", "var"
+
+
+def _signature(args):
+    """A short parameter list: names only, with * and ** markers."""
+    names = [a.arg for a in getattr(args, "posonlyargs", [])]
+    names += [a.arg for a in args.args]
+    if args.vararg:
+        names.append("*" + args.vararg.arg)
+    elif args.kwonlyargs:
+        names.append("*")
+    names += [a.arg for a in args.kwonlyargs]
+    if args.kwarg:
+        names.append("**" + args.kwarg.arg)
+    return "(" + ", ".join(names) + ")"
+
+
+def _call_name(func):
+    if isinstance(func, ast.Name):
+        return func.id
+    if isinstance(func, ast.Attribute):
+        return func.attr
+    return None
+
+
+def _receiver(func):
+    """What a method is called on: "self", "parser", "self.parser"; "" if not
+    a plain dotted name, None for a call of a bare name."""
+    if not isinstance(func, ast.Attribute):
+        return None
+    parts = []
+    node = func.value
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return ""
+    parts.append(node.id)
+    return ".".join(reversed(parts))
+
+
+class _Collector(ast.NodeVisitor):
+    def __init__(self):
+        self.defs = []  # (name, kind, line, qualname, signature)
+        self.imports = []  # (bound name, imported module path, line)
+        # (name, line, enclosing qualname, receiver, receiver's class if known)
+        self.calls = []
+        self._scope = []  # (qualname, is_class)
+        self._types = [{}]  # per scope: local name -> class it was made from
+
+    def _qualname(self, name):
+        return f"{self._scope[-1][0]}.{name}" if self._scope else name
+
+    def _define(self, node, kind, signature=""):
+        qualname = self._qualname(node.name)
+        self.defs.append((node.name, kind, node.lineno, qualname, signature))
+        self._scope.append((qualname, kind == CLASS))
+        self._types.append({})
+        self.generic_visit(node)
+        self._types.pop()
+        self._scope.pop()
+
+    def visit_ClassDef(self, node):
+        self._define(node, CLASS)
+
+    def visit_FunctionDef(self, node):
+        in_class = bool(self._scope) and self._scope[-1][1]
+        self._define(node, METHOD if in_class else FUNCTION, _signature(node.args))
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def _assign(self, targets, line):
+        # Only names that belong to a module or class, not function locals.
+        if self._scope and not self._scope[-1][1]:
+            return
+        for target in targets:
+            for node in ast.walk(target):
+                if isinstance(node, ast.Name):
+                    qualname = self._qualname(node.id)
+                    self.defs.append((node.id, VARIABLE, line, qualname, ""))
+
+    def visit_Assign(self, node):
+        self._assign(node.targets, node.lineno)
+        # x = Name(...) with a capitalized Name: remember x's class, so that
+        # x.method() calls can be told apart by class.
+        value = node.value
+        if (
+            isinstance(value, ast.Call)
+            and isinstance(value.func, ast.Name)
+            and value.func.id[:1].isupper()
+        ):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    self._types[-1][target.id] = value.func.id
+        self.generic_visit(node)
+
+    def visit_AnnAssign(self, node):
+        self._assign([node.target], node.lineno)
+        self.generic_visit(node)
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            bound = alias.asname or alias.name.split(".")[0]
+            self.imports.append((bound, alias.name, node.lineno))
+
+    def visit_ImportFrom(self, node):
+        module = "." * node.level + (node.module or "")
+        for alias in node.names:
+            path = f"{module}.{alias.name}" if node.module else module + alias.name
+            self.imports.append((alias.asname or alias.name, path, node.lineno))
+
+    def visit_Call(self, node):
+        name = _call_name(node.func)
+        if name is not None:
+            scope = self._scope[-1][0] if self._scope else ""
+            receiver = _receiver(node.func)
+            known = self._types[-1].get(receiver) if receiver else None
+            self.calls.append((name, node.lineno, scope, receiver, known))
+        self.generic_visit(node)
+
+
+def parse_symbols(source, filename="<unknown>"):
+    """(defs, imports, calls) of Python source; raises SyntaxError."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # e.g. invalid escapes in old code
+        tree = ast.parse(source, filename)
+    collector = _Collector()
+    collector.visit(tree)
+    return collector.defs, collector.imports, collector.calls
+
+
+def _format_def(rel, entry):
+    _, kind, line, qualname, signature = entry
+    return f"{kind:<6} {rel}:{line}  {qualname}{signature}"
+
+
+class SymbolIndex:
+    """Symbols of the Python files under root, persisted in the workspace cache."""
+
+    def __init__(self, root="."):
+        self.root = os.path.abspath(root)
+        self.path = os.path.join(cache_dir(self.root), "symbols.idx")
+        self.files = {}  # relative path -> (mtime_ns, size, defs, imports, calls)
+        self.lock = threading.Lock()
+        self.saved_at = None  # monotonic time of the last save; see save_index()
+        self._names = None  # name -> [(rel, def entry)], rebuilt after changes
+
+    def load(self):
+        try:
+            with open(self.path, "rb") as f:
+                state = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return False
+        if state.get("version") != INDEX_VERSION or state.get("root") != self.root:
+            return False
+        self.files = state["files"]
+        self._names = None
+        return True
+
+    def save(self):
+        state = {"version": INDEX_VERSION, "root": self.root, "files": self.files}
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+
+    def _parse(self, path, st):
+        if st.st_size > SYMBOL_MAX_FILE_SIZE:
+            return (), (), ()
+        try:
+            with open(path, "rb") as f:
+                return parse_symbols(f.read(), path)
+        except (OSError, SyntaxError, ValueError):
+            return (), (), ()  # unreadable or not valid Python (yet)
+
+    def refresh(self, files=None):
+        """
+        Re-parses new and changed source files and drops deleted ones;
+        returns True if anything changed. `files` is an iterable of
+        (path, stat_result) for the current tree; by default root is walked.
+        """
+        changed = False
+        seen = set()
+        for path, st in files if files is not None else walk_files(self.root):
+            if not path.endswith(SOURCE_SUFFIXES):
+                continue
+            rel = os.path.relpath(path, self.root)
+            seen.add(rel)
+            old = self.files.get(rel)
+            if old is not None and old[:2] == (st.st_mtime_ns, st.st_size):
+                continue
+            self.files[rel] = (st.st_mtime_ns, st.st_size, *self._parse(path, st))
+            changed = True
+        for rel in [rel for rel in self.files if rel not in seen]:
+            del self.files[rel]
+            changed = True
+        if changed:
+            self._names = None
+            save_index(self)
+        return changed
+
+    def _by_name(self):
+        if self._names is None:
+            names = {}
+            for rel, (_, _, defs, _, _) in self.files.items():
+                for entry in defs:
+                    names.setdefault(entry[0], []).append((rel, entry))
+            self._names = names
+        return self._names
+
+    def definitions(self, name):
+        """[(rel, def entry)] for a bare name or a dotted qualname suffix."""
+        base = name.rsplit(".", 1)[-1]
+        found = self._by_name().get(base, [])
+        if "." in name:
+            found = [(rel, e) for rel, e in found if ("." + e[3]).endswith("." + name)]
+        return sorted(found, key=lambda item: (item[1][1] == VARIABLE, item[0]))
+
+    def similar(self, name, limit=5):
+        """Defined names containing name, ignoring case, for "did you mean"."""
+        needle = name.rsplit(".", 1)[-1].lower()
+        matches = [n for n in self._by_name() if needle in n.lower()]
+        return sorted(matches, key=lambda n: (len(n), n))[:limit]
+
+    def _classes(self):
+        return {
+            name
+            for name, entries in self._by_name().items()
+            if any(e[1] == CLASS for _, e in entries)
+        }
+
+    def _call_match(self, owner, call, classes, imported):
+        """
+        For a Class.method query: True if a call of method is on owner, None
+        if only the name matches, False if it is clearly on something else
+        (a bare function, a module, another class, self in another class).
+        """
+        _, _, scope, receiver, known = call
+        if known:
+            return known == owner
+        if receiver is None:
+            return False
+        enclosing = scope.split(".")[:-1]
+        if receiver == owner or (receiver in ("self", "cls") and owner in enclosing):
+            return True
+        if receiver in ("self", "cls") or receiver in classes or receiver in imported:
+            return False
+        return None
+
+    def query(self, name, kind="all", prefix="", limit=SYMBOL_RESULT_LIMIT):
+        """
+        Formatted definitions, imports and call sites of name, as lines.
+        For Class.method, calls of the method name are kept when they are on
+        the class, self in the class, or a local made by Class(...); calls on
+        something of unknown type are listed as "call?", name-only matches.
+        """
+        base = name.rsplit(".", 1)[-1]
+        owner = name.rsplit(".", 2)[-2] if "." in name else None
+        classes = self._classes() - {owner} if owner else ()
+
+        def under(rel):
+            return not prefix or rel == prefix or rel.startswith(prefix + os.sep)
+
+        lines = []
+        if kind in ("all", "def"):
+            lines += [
+                _format_def(rel, e) for rel, e in self.definitions(name) if under(rel)
+            ]
+        for rel in sorted(self.files):
+            if not under(rel):
+                continue
+            _, _, _, imports, calls = self.files[rel]
+            imported = {bound for bound, _, _ in imports} - {owner} if owner else ()
+            if kind in ("all", "import"):
+                for bound, module, line in imports:
+                    if bound == base or module.rsplit(".", 1)[-1] == base:
+                        lines.append(f"{'import':<6} {rel}:{line}  {module} as {bound}")
+            if kind in ("all", "call"):
+                for call in calls:
+                    called, line, scope, receiver, _ = call
+                    if called != base:
+                        continue
+                    label = "call"
+                    if owner:
+                        match = self._call_match(owner, call, classes, imported)
+                        if match is False:
+                            continue
+                        if match is None:
+                            label = "call?"
+                    if receiver is None:
+                        shown = called
+                    else:
+                        shown = f"{receiver or '(...)'}.{called}"
+                    where = f"  (in {scope})" if scope else ""
+                    lines.append(f"{label:<6} {rel}:{line}  {shown}(){where}")
+        if len(lines) > limit:
+            rest = len(lines) - limit
+            lines = lines[:limit] + [f"... ({rest} more; narrow with kind or path)"]
+        return lines
+
+    def repo_map(self, max_chars):
+        """
+        The top-level classes (with their methods) and functions of each
+        file, most referenced files first, cut off at max_chars.
+        """
+        # A file's weight: imports elsewhere of the names it defines, then
+        # calls of them (bare call names are ambiguous, so they count less).
+        imported, called = Counter(), Counter()
+        for _, _, _, imports, calls in self.files.values():
+            imported.update(module.rsplit(".", 1)[-1] for _, module, _ in imports)
+            called.update(call[0] for call in calls)
+        ranked = []
+        for rel, (_, _, defs, _, _) in self.files.items():
+            top = [
+                e[0]
+                for e in defs
+                if "." not in e[3] and e[1] != VARIABLE and not e[0].startswith("_")
+            ]
+            if top:
+                weight = (sum(imported[n] for n in top), sum(called[n] for n in top))
+                ranked.append((-weight[0], -weight[1], rel, defs))
+        ranked.sort()
+
+        out, size = [], 0
+        for *_, rel, defs in ranked:
+            parts = []
+            for name, kind, _, qualname, signature in defs:
+                if name.startswith("_"):
+                    continue
+                if kind == CLASS and "." not in qualname:
+                    methods = [
+                        e[0]
+                        for e in defs
+                        if e[1] == METHOD
+                        and e[3] == f"{qualname}.{e[0]}"
+                        and not e[0].startswith("_")
+                    ]
+                    parts.append(f"{name}[{', '.join(methods)}]" if methods else name)
+                elif kind == FUNCTION and "." not in qualname:
+                    parts.append(name + signature)
+            line = f"{rel}: {'; '.join(parts)}"
+            if size + len(line) + 1 > max_chars:
+                out.append(f"... ({len(ranked) - len(out)} more files)")
+                break
+            out.append(line)
+            size += len(line) + 1
+        return "\n".join(out)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_symbol_index(root=None):
+    """The shared, refreshed symbol index for root (default: the current directory)."""
+    root = os.path.abspath(root or os.getcwd())
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            index = _indexes[root] = SymbolIndex(root)
+            index.load()
+    files = get_snapshot(root).walk()
+    with index.lock:
+        index.refresh((os.path.join(root, rel), st) for rel, st in files)
+    return index
@@ -0,0 +1,174 @@
+"""
+Latency and throughput telemetry for the agentic loop.
+
+Each API request and each tool call is recorded as a span. With a trace file,
+spans are appended as JSON lines tagged with a session id and turn number, so
+traces from many sessions can be concatenated and aggregated. Per-turn totals
+back the --stats summary.
+"""
+
+import json
+import os
+import threading
+import time
+
+
+class RequestSpan:
+    """Timestamps (perf_counter) and counters for one streamed API request."""
+
+    __slots__ = (
+        "bytes",
+        "chunks",
+        "end",
+        "events",
+        "first_byte",
+        "first_event",
+        "first_token",
+        "parse_time",
+        "prompt_tokens",
+        "start",
+        "status",
+        "tokens",
+    )
+
+    def __init__(self, prompt_tokens=None):
+        self.start = time.perf_counter()
+        self.first_byte = self.first_event = self.first_token = self.end = None
+        self.events = self.chunks = self.bytes = self.tokens = 0
+        self.parse_time = 0.0
+        self.prompt_tokens = prompt_tokens
+        self.status = "ok"
+
+    def _ms(self, t):
+        return None if t is None else round((t - self.start) * 1000, 2)
+
+    def decode_rate(self):
+        """Content deltas per second from the first one to the end of the stream."""
+        if self.first_token is None or self.end is None or self.tokens < 2:
+            return None
+        elapsed = self.end - self.first_token
+        return (self.tokens - 1) / elapsed if elapsed > 0 else None
+
+    def to_dict(self):
+        duration = (self.end or time.perf_counter()) - self.start
+        rate = self.decode_rate()
+        return {
+            "ttfb_ms": self._ms(self.first_byte),
+            "first_event_ms": self._ms(self.first_event),
+            "ttft_ms": self._ms(self.first_token),
+            "duration_ms": round(duration * 1000, 2),
+            "events": self.events,
+            "chunks": self.chunks,
+            "bytes": self.bytes,
+            "tokens": self.tokens,
+            "tokens_per_s": None if rate is None else round(rate, 2),
+            "chunks_per_s": round(self.chunks / duration, 2) if duration > 0 else None,
+            "parse_ms": round(self.parse_time * 1000, 3),
+            "prompt_tokens_est": self.prompt_tokens,
+            "status": self.status,
+        }
+
+
+class Telemetry:
+    def __init__(self):
+        self.session = os.urandom(6).hex()
+        self.turn = 0
+        self._epoch = time.time() - time.perf_counter()
+        self._trace = None
+        self._lock = threading.Lock()
+        self._reset_turn()
+
+    def open_trace(self, path):
+        # _write appends each span with its own open(), so no handle stays
+        # open. Opening it once here still reports a bad path at startup.
+        with open(path, "a", encoding="utf-8"):
+            pass
+        self._trace = path
+
+    def close(self):
+        self._trace = None
+
+    def _write(self, kind, start, attrs):
+        if self._trace is None:
+            return
+        record = {
+            "type": kind,
+            "session": self.session,
+            "turn": self.turn,
+            "ts": round(self._epoch + start, 6),
+            **attrs,
+        }
+        line = json.dumps(record) + "\n"
+        with self._lock, open(self._trace, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def _reset_turn(self):
+        self._turn_start = time.perf_counter()
+        self._requests = []
+        self._tools = []  # (wall seconds, output bytes)
+
+    # -- recording ------------------------------------------------------------
+
+    def begin_turn(self):
+        self.turn += 1
+        self._reset_turn()
+
+    def request(self, span):
+        if span.end is None:
+            span.end = time.perf_counter()
+        self._requests.append(span)
+        self._write("request", span.start, span.to_dict())
+
+    def tool(self, name, start, end, result):
+        size = len(result.encode("utf-8", errors="replace"))
+        with self._lock:
+            self._tools.append((end - start, size))
+        self._write(
+            "tool",
+            start,
+            {
+                "name": name,
+                "duration_ms": round((end - start) * 1000, 2),
+                "output_bytes": size,
+                "error": result.startswith("error:"),
+            },
+        )
+
+    def end_turn(self, status="ok"):
+        """Records the turn's totals and returns its one-line summary."""
+        requests, tools = self._requests, list(self._tools)
+        wall = time.perf_counter() - self._turn_start
+        tokens = sum(r.tokens for r in requests)
+        ttfts = [r.first_token - r.start for r in requests if r.first_token]
+        rates = [r.decode_rate() for r in requests]
+        rates = [r for r in rates if r]
+        summary = {
+            "status": status,
+            "duration_ms": round(wall * 1000, 2),
+            "requests": len(requests),
+            "tokens": tokens,
+            "ttft_ms_first": round(ttfts[0] * 1000, 2) if ttfts else None,
+            "ttft_ms_mean": round(sum(ttfts) / len(ttfts) * 1000, 2) if ttfts else None,
+            "tokens_per_s": round(sum(rates) / len(rates), 2) if rates else None,
+            "parse_ms": round(sum(r.parse_time for r in requests) * 1000, 3),
+            "tools": len(tools),
+            "tool_ms": round(sum(t for t, _ in tools) * 1000, 2),
+            "tool_output_bytes": sum(size for _, size in tools),
+        }
+        self._write("turn", self._turn_start, summary)
+
+        parts = [f"{wall:.2f}s", f"{len(requests)} req", f"{tokens:,} tok"]
+        if ttfts:
+            parts.append(f"ttft {ttfts[0]:.2f}s")
+        if rates:
+            parts.append(f"{summary['tokens_per_s']:.1f} tok/s")
+        parts.append(f"parse {summary['parse_ms']:.1f}ms")
+        if tools:
+            parts.append(
+                f"{len(tools)} tools {summary['tool_ms'] / 1000:.2f}s "
+                f"{summary['tool_output_bytes'] / 1024:.1f}KB"
+            )
+        return " · ".join(parts)
+
+
+telemetry = Telemetry()
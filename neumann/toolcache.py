@@ -0,0 +1,161 @@
+"""
+Session memoization of read-only tool results.
+
+A result is keyed on the tool name and its canonical arguments. Tools that
+can describe what their output depends on provide `cache_state(args)` (e.g.
+the mtime and size of the files involved); while that state is unchanged the
+tool is not run again. Other read-only tools still run, and their output is
+compared with the previous one.
+
+When the model already has an identical result in its context, it gets a
+short reference to the tool_call_id of that message instead of the full
+content again. Results only become referable once they are actually shown
+(mark_shown) and stop being referable when the context manager compacts that
+message away (forget), so a reference never points at something the model
+can no longer see.
+
+Tools that are not read-only invalidate entries as they run: a tool with
+`modifies = "<arg>"` drops the entries for the file named by that argument
+and any tree-wide ones (grep, glob); anything else clears the cache.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from .constants import TOOL_CACHE_BYTES
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode("utf-8", errors="replace")).digest()
+
+
+class _Entry:
+    __slots__ = ("digest", "paths", "result", "shown", "state")
+
+    def __init__(self, state, result, paths):
+        self.state = state
+        self.result = result
+        self.digest = _digest(result)
+        self.paths = paths  # absolute paths the result covers, None for any
+        self.shown = None  # tool_call_id of the message showing the result
+
+
+class ToolResultCache:
+    """LRU of tool results for one session, capped at `max_bytes` of output."""
+
+    def __init__(self, registry, max_bytes=TOOL_CACHE_BYTES):
+        self._registry = registry
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (name, args json) -> _Entry
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _cacheable(self, tool):
+        return getattr(tool, "read_only", False) and not getattr(tool, "confirm", False)
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._size -= len(entry.result)
+
+    def _store(self, key, entry):
+        if key in self._entries:
+            self._drop(key)
+        if len(entry.result) > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self._size += len(entry.result)
+        while self._size > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+
+    def run(self, name, args, execute):
+        """Returns execute(name, args), or a cached result or reference to one."""
+        tool = self._registry.get(name)
+        if tool is None or not self._cacheable(tool):
+            result = execute(name, args)
+            if tool is not None:
+                self.invalidate(self._modified_path(tool, args))
+            return result
+
+        key = (name, json.dumps(args, sort_keys=True, default=str))
+        state_of = getattr(tool, "cache_state", None)
+        try:
+            state = state_of(args) if state_of else None
+        except (OSError, ValueError, TypeError, KeyError):
+            state = None  # bad arguments: not cached; the call reports them
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and state is not None and entry.state == state:
+                self._entries.move_to_end(key)
+                if entry.shown:
+                    return self._reference(name, entry)
+                return entry.result
+
+        result = execute(name, args)
+        if result.startswith("error"):
+            return result
+
+        paths = None
+        if "path" in args and os.path.isfile(str(args["path"])):
+            paths = frozenset([os.path.abspath(args["path"])])
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.shown and entry.digest == _digest(result):
+                entry.state = state
+                self._entries.move_to_end(key)
+                return self._reference(name, entry)
+            self._store(key, _Entry(state, result, paths))
+        return result
+
+    def _reference(self, name, entry):
+        return (
+            f"[unchanged since tool call {entry.shown}: the earlier {name} "
+            "result with the same arguments is still current]"
+        )
+
+    def _modified_path(self, tool, args):
+        arg = getattr(tool, "modifies", None)
+        if arg and args.get(arg):
+            return os.path.abspath(str(args[arg]))
+        return None
+
+    # -- context bookkeeping --------------------------------------------------
+
+    def mark_shown(self, content, tool_call_id):
+        """Records that a tool result was added to the conversation."""
+        digest = _digest(content)
+        with self._lock:
+            for entry in self._entries.values():
+                if entry.digest == digest:
+                    entry.shown = tool_call_id
+
+    def forget(self, msg):
+        """Records that a tool message was compacted out of the context."""
+        digest = _digest(msg.get("content") or "")
+        with self._lock:
+            for entry in self._entries.values():
+                # A later copy of the same result may still be in the context.
+                if entry.digest == digest and entry.shown == msg.get("tool_call_id"):
+                    entry.shown = None
+
+    # -- invalidation ---------------------------------------------------------
+
+    def invalidate(self, path=None):
+        """Drops entries covering `path` (and tree-wide ones); all if path is None."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._size = 0
+                return
+            for key in [
+                key
+                for key, entry in self._entries.items()
+                if entry.paths is None or path in entry.paths
+            ]:
+                self._drop(key)
+
+    def clear(self):
+        self.invalidate()
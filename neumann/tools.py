@@ -1,34 +1,77 @@
 import glob as globlib
+import hashlib
 import os
 import re
-import subprocess
+import threading
 
-from .constants import DIM, RESET
+from .constants import (
+    BASH_MAX_TIMEOUT,
+    BASH_OUTPUT_BYTES,
+    BASH_TIMEOUT,
+    DIM,
+    GLOB_RESULT_LIMIT,
+    RESET,
+    SEARCH_BYTES,
+    SEARCH_MAX_RESULTS,
+    SEARCH_RESULTS,
+)
+from .edit import edit_file
+from .grep import grep_files
+from .lineindex import read_numbered
+from .patch import PatchError, apply_patch
+from .search import get_search_index
+from .shell import ShellSession, run_command
+from .snapshot import get_snapshot, invalidate_all
+from .spool import get_spool
+from .symbols import get_symbol_index
+from .trigram import TrigramIndex
+from .walk import glob_filter, walk_files
+
+
+def file_state(path):
+    """(mtime_ns, size) of a file, or None if it can't be stat'ed."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
 
 
 class ReadTool:
     name = "read"
-    description = "Read file with line numbers (file path, not directory)"
+    description = (
+        "Read file with line numbers (file path, not directory); "
+        "a negative offset reads the last lines"
+    )
     parameters = {"path": "string", "offset": "number?", "limit": "number?"}
+    read_only = True
+
+    def cache_state(self, args):
+        return file_state(args["path"])
 
     def run(self, args):
-        lines = open(args["path"]).readlines()
-        offset = args.get("offset", 0)
-        limit = args.get("limit", len(lines))
-        selected = lines[offset : offset + limit]
-        return "".join(
-            f"{offset + idx + 1:4}| {line}" for idx, line in enumerate(selected)
-        )
+        offset = int(args.get("offset") or 0)
+        limit = args.get("limit")
+        limit = int(limit) if limit not in (None, "") else None
+        try:
+            return read_numbered(args["path"], offset, limit)
+        except FileNotFoundError as err:
+            similar = get_snapshot().find_name(os.path.basename(args["path"]))
+            if similar:
+                return f"error: {err}. Did you mean: {', '.join(similar)}"
+            raise
 
 
 class WriteTool:
     name = "write"
     description = "Write content to file"
     parameters = {"path": "string", "content": "string"}
+    modifies = "path"
 
     def run(self, args):
         with open(args["path"], "w") as f:
             f.write(args["content"])
+        get_snapshot().touch(args["path"])
         return "ok"
 
 
@@ -36,94 +79,305 @@ class EditTool:
     name = "edit"
     description = "Replace old with new in file (old must be unique unless all=true)"
     parameters = {"path": "string", "old": "string", "new": "string", "all": "boolean?"}
+    modifies = "path"
 
     def run(self, args):
-        text = open(args["path"]).read()
-        old, new = args["old"], args["new"]
-        if old not in text:
+        count = edit_file(args["path"], args["old"], args["new"], args.get("all"))
+        if not count:
             return "error: old_string not found"
-        count = text.count(old)
         if not args.get("all") and count > 1:
             return f"error: old_string appears {count} times, must be unique (use all=true)"
-        replacement = (
-            text.replace(old, new) if args.get("all") else text.replace(old, new, 1)
-        )
-        with open(args["path"], "w") as f:
-            f.write(replacement)
+        get_snapshot().touch(args["path"])
         return "ok"
 
 
+class PatchTool:
+    name = "patch"
+    description = (
+        "Apply a unified diff (---/+++ headers, @@ hunks) to one or more files; "
+        "hunks are located by their context, and nothing is written unless "
+        "every hunk applies"
+    )
+    parameters = {"diff": "string"}
+
+    def run(self, args):
+        try:
+            return apply_patch(args["diff"])
+        except PatchError as err:
+            return f"error: {err}"
+
+
 class GlobTool:
     name = "glob"
     description = "Find files by pattern, sorted by mtime"
-    parameters = {"pat": "string", "path": "string?"}
+    parameters = {"pat": "string", "path": "string?", "limit": "number?"}
+    read_only = True
 
     def run(self, args):
-        pattern = (args.get("path", ".") + "/" + args["pat"]).replace("//", "/")
-        files = globlib.glob(pattern, recursive=True)
-        files = sorted(
-            files,
-            key=lambda f: os.path.getmtime(f) if os.path.isfile(f) else 0,
-            reverse=True,
-        )
+        path = args.get("path", ".")
+        limit = int(args.get("limit") or GLOB_RESULT_LIMIT)
+        snapshot = get_snapshot()
+        rel = snapshot.relpath(path)
+        matches = None
+        if rel is not None and not os.path.isabs(args["pat"]):
+            matches = snapshot.glob(args["pat"], rel)
+        if matches:
+            strip = len(rel) + 1 if rel else 0
+            files = [os.path.join(path, m[strip:]) for m, _ in matches]
+        else:
+            # Outside the workspace snapshot, or only in ignored directories
+            # (build/*, node_modules/x/*): ask the filesystem.
+            pattern = (path + "/" + args["pat"]).replace("//", "/")
+            files = globlib.glob(pattern, recursive=True)
+            files = sorted(
+                files,
+                key=lambda f: os.path.getmtime(f) if os.path.isfile(f) else 0,
+                reverse=True,
+            )
+        if len(files) > limit:
+            return "\n".join(files[:limit]) + f"\n... ({len(files) - limit} more)"
         return "\n".join(files) or "none"
 
 
 class GrepTool:
     name = "grep"
-    description = "Search files for regex pattern"
-    parameters = {"pat": "string", "path": "string?"}
+    description = (
+        "Search files for regex pattern (include/exclude: comma-separated globs)"
+    )
+    parameters = {
+        "pat": "string",
+        "path": "string?",
+        "include": "string?",
+        "exclude": "string?",
+        "max_size": "number?",
+    }
+    read_only = True
+    max_concurrency = 2  # scans already fan out to a process pool
+    use_index = False  # set by --grep-index
+
+    def __init__(self):
+        self._index = None
+        self._index_lock = threading.Lock()
+
+    def _indexed_paths(self, pat, path, max_size):
+        """Candidate files from the workspace trigram index, or None if path is outside it."""
+        root = os.getcwd()
+        target = os.path.abspath(path)
+        if os.path.commonpath([root, target]) != root:
+            return None
+        with self._index_lock:
+            if self._index is None or self._index.root != root:
+                self._index = TrigramIndex(root)
+                self._index.load()
+            index = self._index
+        files = get_snapshot(root).walk()
+        with index.lock:
+            index.refresh((os.path.join(root, f), st) for f, st in files)
+            candidates = index.candidates(pat)
+            if max_size:
+                stats = index.stats
+                candidates = [rel for rel in candidates if stats[rel][2] <= max_size]
+        prefix = os.path.relpath(target, root)
+        if prefix != ".":
+            candidates = [
+                rel
+                for rel in candidates
+                if rel == prefix or rel.startswith(prefix + os.sep)
+            ]
+        return [os.path.join(path, os.path.relpath(rel, prefix)) for rel in candidates]
+
+    def _walk(self, path):
+        """[(file path, stat_result)] under path, from the snapshot if it covers path."""
+        snapshot = get_snapshot()
+        rel = snapshot.relpath(path)
+        files = snapshot.walk(rel) if rel is not None else None
+        if files is None:
+            return list(walk_files(path))
+        strip = len(rel) + 1 if rel else 0
+        return [(os.path.join(path, f[strip:]), st) for f, st in files]
+
+    def _walked_paths(self, walked, max_size):
+        for filepath, st in walked:
+            if not max_size or st.st_size <= max_size:
+                yield filepath
+
+    def cache_state(self, args):
+        path = args.get("path", ".")
+        if os.path.isfile(path):
+            return file_state(path)
+        max_size = int(args.get("max_size") or 0)
+        digest = hashlib.sha1()
+        for p, st in self._walk(path):
+            if not max_size or st.st_size <= max_size:
+                state = (st.st_mtime_ns, st.st_size)
+                digest.update(f"{p}\0{state}\n".encode("utf-8", "surrogateescape"))
+        return digest.digest()
 
     def run(self, args):
         pattern = re.compile(args["pat"])
-        hits = []
-        for filepath in globlib.glob(args.get("path", ".") + "/**", recursive=True):
+        path = args.get("path", ".")
+        if os.path.isfile(path):
+            return grep_files([path], pattern)
+        max_size = int(args.get("max_size") or 0)
+        paths = None
+        if self.use_index:
+            paths = self._indexed_paths(args["pat"], path, max_size)
+        if paths is None:
+            paths = self._walked_paths(self._walk(path), max_size)
+        if args.get("include") or args.get("exclude"):
+            accept = glob_filter(args.get("include"), args.get("exclude"))
+            paths = (p for p in paths if accept(os.path.relpath(p, path)))
+        return grep_files(paths, pattern)
+
+
+class SearchTool:
+    name = "search"
+    description = (
+        "Rank code chunks by relevance to words or identifiers (BM25); "
+        "use when you don't know the exact pattern to grep for"
+    )
+    parameters = {"query": "string", "path": "string?", "k": "number?"}
+    read_only = True
+
+    def run(self, args):
+        k = int(args.get("k") or SEARCH_RESULTS)
+        k = min(max(k, 1), SEARCH_MAX_RESULTS)
+        index = get_search_index()
+        prefix = os.path.relpath(os.path.abspath(args.get("path") or "."), index.root)
+        if prefix == os.pardir or prefix.startswith(os.pardir + os.sep):
+            return f"error: {args['path']} is outside the workspace"
+        with index.lock:
+            hits = index.search(args["query"], k, "" if prefix == "." else prefix)
+        out, budget = [], SEARCH_BYTES
+        for n, (score, rel, start, end) in enumerate(hits):
+            header = f"{rel}:{start + 1}-{end} (score {score:.2f})\n"
+            budget -= len(header)
+            if budget <= 0:
+                out.append(f"... ({len(hits) - n} more results over the output limit)")
+                break
             try:
-                for line_num, line in enumerate(open(filepath), 1):
-                    if pattern.search(line):
-                        hits.append(f"{filepath}:{line_num}:{line.rstrip()}")
-            except Exception:
-                pass
-        return "\n".join(hits[:50]) or "none"
+                body = read_numbered(
+                    os.path.join(index.root, rel), start, end - start, budget
+                )
+            except OSError:
+                continue
+            out.append(header + body)
+            budget -= len(body)
+        return "\n".join(out) or "none"
+
+
+class SymbolTool:
+    name = "symbol"
+    description = (
+        "Find where a Python name (or Class.method) is defined, imported and "
+        "called, as file:line (kind: def, import, call or all); call? marks a "
+        "call of the method name on a receiver of unknown class"
+    )
+    parameters = {"name": "string", "kind": "string?", "path": "string?"}
+    read_only = True
+    kinds = ("all", "def", "import", "call")
+
+    def run(self, args):
+        kind = args.get("kind") or "all"
+        if kind not in self.kinds:
+            return f"error: kind must be one of {', '.join(self.kinds)}"
+        index = get_symbol_index()
+        prefix = os.path.relpath(os.path.abspath(args.get("path") or "."), index.root)
+        if prefix == os.pardir or prefix.startswith(os.pardir + os.sep):
+            return f"error: {args['path']} is outside the workspace"
+        with index.lock:
+            lines = index.query(args["name"], kind, "" if prefix == "." else prefix)
+            if lines:
+                return "\n".join(lines)
+            similar = index.similar(args["name"])
+        if similar:
+            return f"none. Defined names like it: {', '.join(similar)}"
+        return "none"
+
+
+class PageTool:
+    name = "page"
+    description = (
+        "Read a spooled tool output by handle: lines (offset/limit), "
+        "a byte range (bytes=START-END), or lines matching a regex (pat)"
+    )
+    parameters = {
+        "handle": "string",
+        "offset": "number?",
+        "limit": "number?",
+        "bytes": "string?",
+        "pat": "string?",
+    }
+    read_only = True
+    spool = False  # already capped at the spool threshold
+
+    def cache_state(self, args):
+        return file_state(get_spool().path(args["handle"]))
+
+    def run(self, args):
+        offset = int(args.get("offset") or 0)
+        limit = args.get("limit")
+        limit = int(limit) if limit not in (None, "") else None
+        return get_spool().page(
+            args["handle"], offset, limit, args.get("bytes"), args.get("pat")
+        )
 
 
 class BashTool:
     name = "bash"
-    description = "Run shell command"
-    parameters = {"cmd": "string"}
+    description = f"Run shell command (timeout in seconds, default {BASH_TIMEOUT})"
+    parameters = {"cmd": "string", "timeout": "number?"}
     confirm = True  # Safety flag
+    persistent = False  # set by --persistent-shell
+
+    def __init__(self):
+        self._session = None
 
     def run(self, args):
         # Confirmation is now handled by the runner
-        proc = subprocess.Popen(
-            args["cmd"],
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-        )
-        output_lines = []
-        try:
-            while True:
-                line = proc.stdout.readline()
-                if not line and proc.poll() is not None:
-                    break
-                if line:
-                    print(f"  {DIM}│ {line.rstrip()}{RESET}", flush=True)
-                    output_lines.append(line)
-            proc.wait(timeout=30)
-        except subprocess.TimeoutExpired:
-            proc.kill()
-            output_lines.append("\n(timed out after 30s)")
-        return "".join(output_lines).strip() or "(empty)"
+        timeout = float(args.get("timeout") or BASH_TIMEOUT)
+        timeout = min(max(timeout, 1), BASH_MAX_TIMEOUT)
+
+        def echo(line):
+            print(f"  {DIM}│ {line.rstrip()}{RESET}", flush=True)
+
+        restarted = False
+        if self.persistent:
+            if self._session is None:
+                self._session = ShellSession()
+            output, status, restarted = self._session.run(
+                args["cmd"], timeout, BASH_OUTPUT_BYTES, echo
+            )
+        else:
+            output, status = run_command(args["cmd"], timeout, BASH_OUTPUT_BYTES, echo)
+        # The command may have changed anything in the workspace.
+        invalidate_all()
+
+        output = output.strip()
+        if status is None:
+            output += f"\n(timed out after {timeout:g}s; process group killed)"
+        elif status:
+            output += f"\n(exit status {status})"
+        if restarted:
+            output += "\n(shell session ended; the next command starts a new one)"
+        return output.strip() or "(empty)"
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
 
 
 BUILTIN_TOOLS = [
     ReadTool(),
     WriteTool(),
     EditTool(),
+    PatchTool(),
     GlobTool(),
     GrepTool(),
+    SearchTool(),
+    SymbolTool(),
+    PageTool(),
     BashTool(),
 ]
 
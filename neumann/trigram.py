@@ -0,0 +1,289 @@
+"""
+On-disk trigram index of the workspace, used to narrow regex searches to the
+files that can possibly match before any line is scanned.
+
+Every indexed file contributes the set of (ASCII-lowercased) byte trigrams it
+contains. A regex is reduced to the trigrams any match must contain, and only
+files holding all of them are searched. The index is kept up to date by mtime
+and size: changed or deleted files are tombstoned and re-added, and the
+postings are compacted once too many ids are dead. A changed index is saved
+at most every INDEX_SAVE_INTERVAL seconds, and at the end of the session.
+"""
+
+import os
+import pickle
+import re
+import threading
+from array import array
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+from .walk import cache_dir, is_binary, path_sort_key, save_index, walk_files
+
+INDEX_VERSION = 1
+INDEX_MAX_FILE_SIZE = 1024 * 1024  # larger files are always searched, never indexed
+
+# File kinds
+_INDEXED, _UNINDEXED, _BINARY = range(3)
+
+
+def _trigrams(data):
+    """The distinct trigrams of data, as ints, ignoring ASCII case."""
+    # Repeated lines are common in code; dedupe them before sliding the window.
+    text = b"\n".join(set(data.lower().splitlines()))
+    return {a << 16 | b << 8 | c for a, b, c in zip(text, text[1:], text[2:])}
+
+
+# -----------------------------------------------------------------------------
+# Query planning: regex -> trigram query
+#
+# A query is None (matches every file), ("tri", int), ("and", [...]) or
+# ("or", [...]).
+# -----------------------------------------------------------------------------
+
+
+def _and(nodes):
+    nodes = [n for n in nodes if n is not None]
+    if not nodes:
+        return None
+    return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+
+def _or(nodes):
+    if not nodes or any(n is None for n in nodes):
+        return None
+    return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+
+def _literal_query(literal, ignorecase):
+    if len(literal) < 3 or (ignorecase and not literal.isascii()):
+        return None
+    data = literal.encode("utf-8").lower()
+    return _and([("tri", tri) for tri in _trigrams(data)])
+
+
+def _sequence_query(parsed, ignorecase):
+    nodes = []
+    run = []
+
+    def end_run():
+        if run:
+            nodes.append(_literal_query("".join(run), ignorecase))
+            run.clear()
+
+    for op, av in parsed:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+        end_run()
+        if op is sre_parse.SUBPATTERN:
+            nodes.append(_sequence_query(av[-1], ignorecase))
+        elif op is sre_parse.BRANCH:
+            nodes.append(_or([_sequence_query(b, ignorecase) for b in av[1]]))
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+            nodes.append(_sequence_query(av[2], ignorecase))
+        elif op is getattr(sre_parse, "POSSESSIVE_REPEAT", None) and av[0] >= 1:
+            nodes.append(_sequence_query(av[2], ignorecase))
+        elif op is getattr(sre_parse, "ATOMIC_GROUP", None):
+            nodes.append(_sequence_query(av, ignorecase))
+    end_run()
+    return _and(nodes)
+
+
+def regex_query(pattern, flags=0):
+    """Reduces a regex to the trigrams that every match must contain."""
+    parsed = sre_parse.parse(pattern, flags)
+    # Inline (?i) anywhere makes us treat the whole pattern as case-insensitive.
+    ignorecase = bool(parsed.state.flags & re.IGNORECASE)
+    return _sequence_query(parsed, ignorecase)
+
+
+def query_matches(query, data):
+    """
+    Whether ASCII-lowercased bytes `data` contain the trigrams `query` needs.
+    Lets a scan skip decoding files that cannot match.
+    """
+    if query is None:
+        return True
+    kind, arg = query
+    if kind == "tri":
+        return bytes((arg >> 16, (arg >> 8) & 0xFF, arg & 0xFF)) in data
+    if kind == "and":
+        return all(query_matches(child, data) for child in arg)
+    return any(query_matches(child, data) for child in arg)
+
+
+# -----------------------------------------------------------------------------
+# Index
+# -----------------------------------------------------------------------------
+
+
+class TrigramIndex:
+    """Trigram index of the files under root, persisted in the workspace cache."""
+
+    def __init__(self, root="."):
+        self.root = os.path.abspath(root)
+        self.path = os.path.join(cache_dir(self.root), "trigram.idx")
+        self.lock = threading.Lock()
+        self.saved_at = None  # monotonic time of the last save; see save_index()
+        self._reset()
+
+    def _reset(self):
+        self.files = []  # id -> relative path, or None once dead
+        self.kinds = []  # id -> _INDEXED / _UNINDEXED / _BINARY
+        self.stats = {}  # relative path -> (id, mtime_ns, size)
+        self.postings = {}  # trigram -> array of ids
+        self.dead = 0
+
+    def load(self):
+        try:
+            with open(self.path, "rb") as f:
+                state = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return False
+        if state.get("version") != INDEX_VERSION or state.get("root") != self.root:
+            return False
+        self.files = state["files"]
+        self.kinds = state["kinds"]
+        self.stats = state["stats"]
+        self.postings = state["postings"]
+        self.dead = state["dead"]
+        return True
+
+    def save(self):
+        state = {
+            "version": INDEX_VERSION,
+            "root": self.root,
+            "files": self.files,
+            "kinds": self.kinds,
+            "stats": self.stats,
+            "postings": self.postings,
+            "dead": self.dead,
+        }
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+
+    def _remove(self, rel):
+        file_id = self.stats.pop(rel)[0]
+        self.files[file_id] = None
+        self.dead += 1
+
+    def _add(self, rel, path, st):
+        file_id = len(self.files)
+        self.files.append(rel)
+        self.stats[rel] = (file_id, st.st_mtime_ns, st.st_size)
+        if is_binary(path):
+            self.kinds.append(_BINARY)
+            return
+        if st.st_size > INDEX_MAX_FILE_SIZE:
+            self.kinds.append(_UNINDEXED)
+            return
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            self.kinds.append(_UNINDEXED)
+            return
+        self.kinds.append(_INDEXED)
+        postings = self.postings
+        for tri in _trigrams(data):
+            ids = postings.get(tri)
+            if ids is None:
+                postings[tri] = array("I", (file_id,))
+            else:
+                ids.append(file_id)
+
+    def refresh(self, files=None):
+        """
+        Brings the index in line with the workspace; returns True if anything
+        changed. `files` is an iterable of (path, stat_result) for the current
+        tree, e.g. from a workspace snapshot; by default the root is walked.
+        """
+        changed = False
+        seen = set()
+        for path, st in files if files is not None else walk_files(self.root):
+            rel = os.path.relpath(path, self.root)
+            seen.add(rel)
+            old = self.stats.get(rel)
+            if old is not None and old[1:] == (st.st_mtime_ns, st.st_size):
+                continue
+            if old is not None:
+                self._remove(rel)
+            self._add(rel, path, st)
+            changed = True
+
+        for rel in [rel for rel in self.stats if rel not in seen]:
+            self._remove(rel)
+            changed = True
+
+        if self.dead > max(1000, len(self.stats)):
+            self._compact()
+        if changed:
+            save_index(self)
+        return changed
+
+    def _compact(self):
+        """Drops tombstoned ids and renumbers the live files."""
+        remap = {}
+        files, kinds = [], []
+        for old_id, rel in enumerate(self.files):
+            if rel is not None:
+                remap[old_id] = len(files)
+                files.append(rel)
+                kinds.append(self.kinds[old_id])
+        postings = {}
+        for tri, ids in self.postings.items():
+            live = array("I", (remap[i] for i in ids if i in remap))
+            if live:
+                postings[tri] = live
+        self.files, self.kinds, self.postings = files, kinds, postings
+        self.stats = {rel: (remap[s[0]],) + s[1:] for rel, s in self.stats.items()}
+        self.dead = 0
+
+    def _evaluate(self, node):
+        kind, arg = node
+        if kind == "tri":
+            return set(self.postings.get(arg, ()))
+        if kind == "and":
+            result = None
+            # Start from the rarest trigrams so the sets shrink quickly.
+            for child in sorted(arg, key=self._estimate):
+                ids = self._evaluate(child)
+                result = ids if result is None else result & ids
+                if not result:
+                    break
+            return result
+        result = set()
+        for child in arg:
+            result |= self._evaluate(child)
+        return result
+
+    def _estimate(self, node):
+        if node[0] == "tri":
+            return len(self.postings.get(node[1], ()))
+        return len(self.files)
+
+    def candidates(self, pattern, flags=0):
+        """
+        Relative paths of the files that may contain a match for pattern, in
+        walk order. Binary files are never candidates; files too large to
+        index always are.
+        """
+        query = regex_query(pattern, flags)
+        ids = None if query is None else self._evaluate(query)
+        paths = []
+        for file_id, rel in enumerate(self.files):
+            if rel is None:
+                continue
+            kind = self.kinds[file_id]
+            if kind == _UNINDEXED or (
+                kind == _INDEXED and (ids is None or file_id in ids)
+            ):
+                paths.append(rel)
+        paths.sort(key=path_sort_key)
+        return paths
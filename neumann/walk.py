@@ -0,0 +1,263 @@
+"""
+Workspace file walking shared by the search tools.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+
+from .constants import DEFAULT_CACHE_DIR
+
+# Directories that never contain anything worth searching.
+SKIP_DIRS = {
+    ".git",
+    ".hg",
+    ".svn",
+    ".venv",
+    "venv",
+    "__pycache__",
+    "node_modules",
+    ".mypy_cache",
+    ".pytest_cache",
+    ".ruff_cache",
+    ".tox",
+    ".nox",
+}
+
+BINARY_SNIFF_BYTES = 8192
+INDEX_SAVE_INTERVAL = 30.0  # seconds; see save_index()
+
+
+def glob_to_regex(pattern):
+    """Translates a gitignore-style glob ('*', '?', '[...]', '**') to a regex."""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            j = pattern.find("]", i + 2)
+            if j == -1:
+                out.append("\\[")
+            else:
+                body = pattern[i + 1 : j]
+                if body[0] in "!^":
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = j
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+class IgnoreRules:
+    """
+    The .gitignore rules that apply inside one directory: its parent's rules
+    followed by those of its own .gitignore, where the last match wins.
+    """
+
+    def __init__(self, rules=()):
+        self.rules = list(rules)
+
+    def child(self, directory, base):
+        """Rules for `directory` (at `base` relative to the walk root)."""
+        own = self.read(os.path.join(directory, ".gitignore"), base)
+        return self.extend(own)
+
+    def extend(self, rules):
+        return IgnoreRules(self.rules + rules) if rules else self
+
+    @classmethod
+    def read(cls, path, base):
+        """Parses one .gitignore file into rules; [] if it doesn't exist."""
+        try:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return []
+        return [r for r in (cls._parse(line, base) for line in lines) if r is not None]
+
+    @staticmethod
+    def _parse(line, base):
+        if line.endswith(" ") and not line.endswith("\\ "):
+            line = line.rstrip(" ")
+        if not line or line.startswith("#"):
+            return None
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        elif line.startswith("\\"):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            return None
+        anchored = "/" in line
+        regex = re.compile(glob_to_regex(line.lstrip("/")))
+        return regex, negate, dir_only, anchored, base
+
+    def ignored(self, rel, name, is_dir):
+        result = False
+        for regex, negate, dir_only, anchored, base in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if anchored:
+                if base:
+                    if not rel.startswith(base + "/"):
+                        continue
+                    target = rel[len(base) + 1 :]
+                else:
+                    target = rel
+            else:
+                target = name
+            if regex.fullmatch(target):
+                result = not negate
+        return result
+
+
+def _sorted_entries(path):
+    try:
+        with os.scandir(path) as it:
+            return sorted(it, key=lambda e: e.name)
+    except OSError:
+        return []
+
+
+def walk_files(root, gitignore=True):
+    """
+    Yields (path, stat_result) for every regular file under root, skipping
+    SKIP_DIRS, symlinked directories and (unless gitignore is False) anything
+    matched by .gitignore files along the way. Entries are visited depth-first
+    in name order, so the sequence matches sorting by path_sort_key().
+    """
+    rules = IgnoreRules().child(root, "") if gitignore else None
+    stack = [(iter(_sorted_entries(root)), "", rules)]
+    while stack:
+        entries, base, rules = stack[-1]
+        entry = next(entries, None)
+        if entry is None:
+            stack.pop()
+            continue
+        try:
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if is_dir and entry.name in SKIP_DIRS:
+                continue
+            rel = f"{base}/{entry.name}" if base else entry.name
+            if rules is not None and rules.ignored(rel, entry.name, is_dir):
+                continue
+            if is_dir:
+                child_rules = (
+                    rules.child(entry.path, rel) if rules is not None else None
+                )
+                stack.append((iter(_sorted_entries(entry.path)), rel, child_rules))
+            elif entry.is_file():
+                yield entry.path, entry.stat()
+        except OSError:
+            continue
+
+
+def glob_filter(include=None, exclude=None):
+    """
+    Returns a predicate on paths (relative to the search root) for
+    comma-separated include/exclude globs. A glob without '/' matches the
+    file name, otherwise the whole relative path.
+    """
+
+    def compile_globs(globs):
+        return [
+            (re.compile(glob_to_regex(g.strip())), "/" in g)
+            for g in (globs or "").split(",")
+            if g.strip()
+        ]
+
+    includes, excludes = compile_globs(include), compile_globs(exclude)
+
+    def matches(globs, rel, name):
+        return any(rx.fullmatch(rel if full else name) for rx, full in globs)
+
+    def accept(rel):
+        rel = rel.replace(os.sep, "/")
+        name = rel.rsplit("/", 1)[-1]
+        if includes and not matches(includes, rel, name):
+            return False
+        return not matches(excludes, rel, name)
+
+    return accept
+
+
+def path_sort_key(path):
+    return path.split(os.sep)
+
+
+def is_binary(path):
+    """Sniffs the start of a file for NUL bytes."""
+    try:
+        with open(path, "rb") as f:
+            return b"\0" in f.read(BINARY_SNIFF_BYTES)
+    except OSError:
+        return True
+
+
+def cache_dir(root):
+    """Per-workspace cache directory (NEU_CACHE_DIR overrides the default location)."""
+    base = os.environ.get("NEU_CACHE_DIR") or DEFAULT_CACHE_DIR
+    key = hashlib.sha1(os.path.abspath(root).encode()).hexdigest()[:16]
+    path = os.path.join(base, key)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+_unsaved = {}  # id -> persisted index with changes not yet written
+_save_lock = threading.Lock()
+
+
+def save_index(index):
+    """
+    Writes a changed persisted index (one with save(), saved_at and a lock,
+    held by the caller) now if it hasn't been saved for INDEX_SAVE_INTERVAL
+    seconds; otherwise it is written by a later change or by flush_indexes(). Each
+    save pickles the whole index, which on a large tree costs far more than
+    the refresh that changed a few files.
+    """
+    now = time.monotonic()
+    with _save_lock:
+        if index.saved_at is not None and now - index.saved_at < INDEX_SAVE_INTERVAL:
+            _unsaved[id(index)] = index
+            return
+        _unsaved.pop(id(index), None)
+    index.saved_at = now
+    try:
+        index.save()
+    except OSError:
+        pass  # the cache is an optimization; the next save tries again
+
+
+def flush_indexes():
+    """Writes every index with changes save_index() put off (at session end)."""
+    with _save_lock:
+        pending = list(_unsaved.values())
+        _unsaved.clear()
+    for index in pending:
+        with index.lock:
+            index.saved_at = time.monotonic()
+            try:
+                index.save()
+            except OSError:
+                pass
@@ -0,0 +1,85 @@
+"""ContextManager: stubbing old tool results and dropping whole turns."""
+
+from neumann.context import ContextManager
+
+
+def _turn(i, size=300):
+    call = {
+        "id": f"call_{i}",
+        "type": "function",
+        "function": {"name": "read", "arguments": f'{{"path": "f{i}.py"}}'},
+    }
+    return [
+        {"role": "user", "content": f"question {i}"},
+        {"role": "assistant", "content": "", "tool_calls": [call]},
+        {
+            "role": "tool",
+            "tool_call_id": f"call_{i}",
+            "name": "read",
+            "content": f"{i}" * size,
+        },
+        {"role": "assistant", "content": f"answer {i}"},
+    ]
+
+
+def _history(turns, size=300):
+    return [msg for i in range(turns) for msg in _turn(i, size)]
+
+
+def _is_stub(msg):
+    return msg["role"] == "tool" and "result compacted" in msg["content"]
+
+
+def test_unlimited_budget_sends_everything():
+    messages = _history(3)
+    payload, report = ContextManager().build("system", messages)
+    assert payload == [{"role": "system", "content": "system"}, *messages]
+    assert report.messages == len(payload)
+    assert (report.compacted, report.dropped) == (0, 0)
+    assert "over budget" not in str(report)
+
+
+def test_old_tool_results_are_stubbed_first():
+    messages = _history(4)
+    compacted = []
+    context = ContextManager(budget=400, on_compact=compacted.append)
+    payload, report = context.build("system", messages)
+    assert report.dropped == 0 and report.compacted > 0
+    assert report.tokens <= 400
+    stubs = [msg["tool_call_id"] for msg in payload if _is_stub(msg)]
+    assert stubs == [msg["tool_call_id"] for msg in compacted]
+    assert stubs == [f"call_{i}" for i in range(report.compacted)]
+    assert payload[-1] == messages[-1]
+    # The history itself is never modified.
+    assert messages == _history(4)
+
+
+def test_the_results_being_answered_are_never_stubbed():
+    messages = _history(2, size=3000)[:-1]  # the model has yet to read call_1
+    payload, _ = ContextManager(budget=1500).build("system", messages)
+    assert payload[-1] == messages[-1]
+    assert _is_stub(payload[3])
+
+
+def test_whole_turns_are_dropped_when_stubs_are_not_enough():
+    messages = _history(6, size=30)
+    messages[0]["content"] = "  please\n  refactor   the parser "
+    compacted = []
+    context = ContextManager(budget=120, on_compact=compacted.append)
+    payload, report = context.build("system", messages)
+    assert report.dropped > 0
+    summary = payload[1]["content"]
+    assert summary.startswith(f"[{report.dropped} earlier turns were dropped")
+    assert "- please refactor the parser" in summary
+    assert payload[2] == {"role": "user", "content": f"question {report.dropped}"}
+    assert payload[-1] == messages[-1]
+    dropped_ids = {msg["tool_call_id"] for msg in compacted}
+    assert {f"call_{i}" for i in range(report.dropped)} <= dropped_ids
+
+
+def test_a_new_conversation_resets_compaction():
+    context = ContextManager(budget=400)
+    _, report = context.build("system", _history(4))
+    assert report.compacted > 0
+    _, report = context.build("system", _history(1))
+    assert (report.compacted, report.dropped) == (0, 0)
@@ -0,0 +1,123 @@
+"""Streaming replacement in neumann.edit."""
+
+import os
+import random
+
+import pytest
+
+from neumann.edit import edit_file, replace_in_file
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 8, 64])
+def test_matches_across_chunk_boundaries(tmp_path, chunk_size):
+    rng = random.Random(chunk_size)
+    path = tmp_path / "f"
+    for _ in range(300):
+        data = bytes(rng.choice(b"ab\n") for _ in range(rng.randint(0, 40)))
+        old = bytes(rng.choice(b"ab\n") for _ in range(rng.randint(1, 4)))
+        replace_all = rng.random() < 0.5
+        path.write_bytes(data)
+        count = replace_in_file(path, old, b"<X>", replace_all, chunk_size)
+        assert count == data.count(old)
+        if count and (replace_all or count == 1):
+            expected = data.replace(old, b"<X>", -1 if replace_all else 1)
+        else:
+            expected = data
+        assert path.read_bytes() == expected
+
+
+def test_refused_edit_leaves_the_file_alone(tmp_path):
+    path = tmp_path / "f"
+    path.write_bytes(b"x x")
+    assert replace_in_file(path, b"x", b"y") == 2
+    assert path.read_bytes() == b"x x"
+    assert os.listdir(tmp_path) == ["f"]
+
+
+def test_crlf_file_keeps_crlf(tmp_path):
+    path = tmp_path / "f"
+    path.write_bytes(b"one\r\ntwo\r\nthree\r\n")
+    assert edit_file(path, "one\ntwo\n", "1\n2\n") == 1
+    assert path.read_bytes() == b"1\r\n2\r\nthree\r\n"
+
+
+def test_lf_file_is_matched_as_is(tmp_path):
+    path = tmp_path / "f"
+    path.write_bytes(b"one\ntwo\n")
+    assert edit_file(path, "one\ntwo", "1\n2") == 1
+    assert path.read_bytes() == b"1\n2\n"
+
+
+def test_mode_is_kept(tmp_path):
+    path = tmp_path / "f"
+    path.write_bytes(b"hello")
+    os.chmod(path, 0o750)
+    edit_file(path, "hello", "bye")
+    assert os.stat(path).st_mode & 0o777 == 0o750
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="needs symlinks")
+def test_edits_through_symlink(tmp_path):
+    real, link = tmp_path / "real", tmp_path / "link"
+    real.write_text("hello\n")
+    os.symlink("real", link)
+    assert edit_file(link, "hello", "bye") == 1
+    assert os.path.islink(link)
+    assert real.read_text() == "bye\n"
+
+
+@pytest.mark.skipif(not hasattr(os, "link"), reason="needs hard links")
+def test_hard_links_stay_linked(tmp_path):
+    first, second = tmp_path / "first", tmp_path / "second"
+    first.write_text("hello\n")
+    os.link(first, second)
+    assert edit_file(first, "hello", "bye") == 1
+    assert second.read_text() == "bye\n"
+    assert os.path.samefile(first, second)
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="needs symlinks")
+def test_symlink_to_another_directory(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "lib").mkdir()
+    real = tmp_path / "lib" / "real"
+    real.write_text("hello\n")
+    os.symlink(os.path.join("..", "lib", "real"), tmp_path / "src" / "link")
+    os.symlink("link", tmp_path / "src" / "chain")
+    assert edit_file(tmp_path / "src" / "chain", "hello", "bye") == 1
+    assert real.read_text() == "bye\n"
+    # The temporary file lived beside the target, and is gone.
+    assert os.listdir(tmp_path / "lib") == ["real"]
+    assert sorted(os.listdir(tmp_path / "src")) == ["chain", "link"]
+    assert os.path.islink(tmp_path / "src" / "link")
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="needs symlinks")
+def test_refused_and_dangling_symlink_edits(tmp_path):
+    real, link = tmp_path / "real", tmp_path / "link"
+    real.write_text("x x\n")
+    os.symlink("real", link)
+    assert edit_file(link, "x", "y") == 2
+    assert real.read_text() == "x x\n"
+    os.symlink("missing", tmp_path / "dangling")
+    with pytest.raises(FileNotFoundError):
+        edit_file(tmp_path / "dangling", "x", "y")
+    assert sorted(os.listdir(tmp_path)) == ["dangling", "link", "real"]
+
+
+@pytest.mark.skipif(not hasattr(os, "link"), reason="needs hard links")
+def test_hard_linked_file_keeps_its_inode_and_mode(tmp_path):
+    first, second = tmp_path / "first", tmp_path / "second"
+    first.write_text("x x\n")
+    os.chmod(first, 0o640)
+    os.link(first, second)
+    inode = os.stat(first).st_ino
+    assert edit_file(second, "x", "y", replace_all=True) == 2
+    assert first.read_text() == "y y\n"
+    assert os.stat(first).st_ino == os.stat(second).st_ino == inode
+    assert os.stat(first).st_mode & 0o777 == 0o640
+    assert os.stat(first).st_nlink == 2
+    # A refused edit leaves both names alone.
+    assert edit_file(first, "y", "z") == 2
+    assert second.read_text() == "y y\n"
+    assert sorted(os.listdir(tmp_path)) == ["first", "second"]
@@ -0,0 +1,142 @@
+"""ToolExecutor batches: call order, concurrent reads and ordered barriers."""
+
+import json
+import threading
+import time
+
+import pytest
+
+from neumann.executor import ToolExecutor
+
+
+class Tool:
+    def __init__(self, read_only=False, confirm=False, max_concurrency=None):
+        self.read_only = read_only
+        self.confirm = confirm
+        if max_concurrency:
+            self.max_concurrency = max_concurrency
+
+
+class Runner:
+    """Records when each call starts and ends; a call sleeps args["wait"] seconds."""
+
+    def __init__(self):
+        self.events = []
+        self.running = {}
+        self.peak = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, name, args):
+        with self._lock:
+            self.events.append(("start", args["id"]))
+            self.running[name] = self.running.get(name, 0) + 1
+            self.peak[name] = max(self.peak.get(name, 0), self.running[name])
+        time.sleep(args.get("wait", 0))
+        with self._lock:
+            self.events.append(("end", args["id"]))
+            self.running[name] -= 1
+        return f"{name} {args['id']}"
+
+
+_REGISTRY = {
+    "read": Tool(read_only=True),
+    "write": Tool(),
+    "ask": Tool(read_only=True, confirm=True),
+    "slow": Tool(read_only=True, max_concurrency=1),
+}
+
+
+@pytest.fixture
+def runner():
+    return Runner()
+
+
+@pytest.fixture
+def executor(runner):
+    executor = ToolExecutor(_REGISTRY, runner, max_workers=4)
+    yield executor
+    executor.shutdown()
+
+
+def _call(name, **args):
+    return {"function": {"name": name, "arguments": json.dumps(args)}}
+
+
+def _wait_running(runner, name, count):
+    deadline = time.monotonic() + 5
+    while runner.running.get(name, 0) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert runner.running.get(name, 0) == count
+
+
+def _results(batch):
+    return [future.result(timeout=5) for _, _, _, future in batch]
+
+
+def test_results_come_in_call_order(executor):
+    batch = executor.batch()
+    for i, wait in enumerate([0.2, 0.0, 0.1]):
+        batch.add(_call("read", id=i, wait=wait))
+    assert _results(batch) == ["read 0", "read 1", "read 2"]
+
+
+def test_reads_start_while_streaming_and_overlap(executor, runner):
+    batch = executor.batch()
+    batch.add(_call("read", id=0, wait=0.3))
+    batch.add(_call("read", id=1, wait=0.3))
+    # Both are running before anyone iterates the batch.
+    _wait_running(runner, "read", 2)
+    _results(batch)
+
+
+def test_ordered_calls_are_barriers(executor, runner):
+    batch = executor.batch()
+    batch.add(_call("read", id="r1", wait=0.1))
+    batch.add(_call("write", id="w", wait=0.1))
+    batch.add(_call("read", id="r2"))
+    batch.add(_call("read", id="r3"))
+    time.sleep(0.2)
+    # Nothing after the write starts before iteration reaches it.
+    assert [e for e in runner.events if e[0] == "start"] == [("start", "r1")]
+    assert _results(batch) == ["read r1", "write w", "read r2", "read r3"]
+    order = runner.events
+    assert order.index(("end", "w")) < order.index(("start", "r2"))
+    assert order.index(("end", "w")) < order.index(("start", "r3"))
+
+
+def test_confirm_gated_reads_run_in_order(executor, runner):
+    batch = executor.batch()
+    batch.add(_call("ask", id="a", wait=0.1))
+    batch.add(_call("read", id="r"))
+    time.sleep(0.2)
+    assert runner.events == []
+    assert _results(batch) == ["ask a", "read r"]
+    assert runner.events.index(("end", "a")) < runner.events.index(("start", "r"))
+
+
+def test_max_concurrency(executor, runner):
+    batch = executor.batch()
+    for i in range(3):
+        batch.add(_call("slow", id=i, wait=0.05))
+        batch.add(_call("read", id=i, wait=0.05))
+    _results(batch)
+    assert runner.peak["slow"] == 1
+    assert runner.peak["read"] > 1
+
+
+def test_bad_arguments(executor):
+    batch = executor.batch()
+    batch.add({"function": {"name": "read", "arguments": "{not json"}})
+    batch.add({"function": {"name": "read", "arguments": "[1]"}})
+    assert [(args, ok) for _, args, ok, _ in batch] == [({}, False), ({}, False)]
+
+
+def test_cancel_drops_calls_that_have_not_started(executor, runner):
+    batch = executor.batch()
+    for i in range(6):
+        batch.add(_call("read", id=i, wait=0.2))
+    _wait_running(runner, "read", 4)
+    batch.cancel()  # the other two are waiting for one of the 4 workers
+    time.sleep(0.5)
+    assert len([e for e in runner.events if e[0] == "start"]) == 4
+    assert len([e for e in runner.events if e[0] == "end"]) == 4
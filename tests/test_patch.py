@@ -0,0 +1,159 @@
+"""Unified diffs through neumann.patch.apply_patch."""
+
+import os
+
+import pytest
+
+from neumann.patch import PatchError, apply_patch, parse_patch
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def _lines(n):
+    return "".join(f"line {i}\n" for i in range(1, n + 1))
+
+
+def test_modify_with_offset_hunk(workspace):
+    (workspace / "a.txt").write_text("new top\n" * 3 + _lines(10))
+    result = apply_patch(
+        "--- a.txt\n+++ a.txt\n@@ -4,3 +4,3 @@\n line 4\n-line 5\n+LINE 5\n line 6\n"
+    )
+    assert result.splitlines()[0] == "ok: patched a.txt (1 hunk)"
+    assert "applied at line 7" in result
+    text = (workspace / "a.txt").read_text()
+    assert "LINE 5\n" in text and "line 5\n" not in text
+
+
+def test_create_delete_and_rename(workspace):
+    (workspace / "old.txt").write_text("keep\n")
+    (workspace / "gone.txt").write_text("bye\n")
+    diff = (
+        "diff --git a/new.txt b/new.txt\n"
+        "--- /dev/null\n+++ b/new.txt\n@@ -0,0 +1,2 @@\n+one\n+two\n"
+        "diff --git a/gone.txt b/gone.txt\n"
+        "--- a/gone.txt\n+++ /dev/null\n@@ -1 +0,0 @@\n-bye\n"
+        "diff --git a/old.txt b/moved.txt\n"
+        "--- a/old.txt\n+++ b/moved.txt\n@@ -1 +1,2 @@\n keep\n+more\n"
+    )
+    result = apply_patch(diff)
+    assert result == (
+        "ok: created new.txt, deleted gone.txt, renamed old.txt -> moved.txt"
+    )
+    assert (workspace / "new.txt").read_text() == "one\ntwo\n"
+    assert not (workspace / "gone.txt").exists()
+    assert not (workspace / "old.txt").exists()
+    assert (workspace / "moved.txt").read_text() == "keep\nmore\n"
+
+
+def test_pure_additions_use_the_line_number(workspace):
+    (workspace / "a.txt").write_text("a\nb\nc\n")
+    apply_patch("--- a.txt\n+++ a.txt\n@@ -0,0 +1 @@\n+TOP\n")
+    assert (workspace / "a.txt").read_text() == "TOP\na\nb\nc\n"
+    apply_patch("--- a.txt\n+++ a.txt\n@@ -2,0 +3 @@\n+MID\n")
+    assert (workspace / "a.txt").read_text() == "TOP\na\nMID\nb\nc\n"
+    # A bare @@ has no line to go by: the lines are appended.
+    apply_patch("--- a.txt\n+++ a.txt\n@@\n+END\n")
+    assert (workspace / "a.txt").read_text() == "TOP\na\nMID\nb\nc\nEND\n"
+
+
+@pytest.mark.parametrize(
+    "lines",
+    [
+        ["x = 1", "-- old", "y = 2"],  # the pair in the middle of the hunk
+        ["x = 1", "-- old"],  # the pair ending it
+    ],
+)
+def test_dash_dash_and_plus_plus_lines_stay_in_the_hunk(workspace, lines):
+    (workspace / "q.hs").write_text("".join(line + "\n" for line in lines))
+    body = "".join(
+        "--- old\n+++ new\n" if line == "-- old" else f" {line}\n" for line in lines
+    )
+    n = len(lines)
+    diff = f"--- q.hs\n+++ q.hs\n@@ -1,{n} +1,{n} @@\n{body}"
+    assert len(parse_patch(diff)) == 1
+    assert apply_patch(diff) == "ok: patched q.hs (1 hunk)"
+    expected = [("++ new" if line == "-- old" else line) for line in lines]
+    assert (workspace / "q.hs").read_text().splitlines() == expected
+
+
+def test_file_header_after_a_hunk_with_wrong_counts(workspace):
+    (workspace / "a.txt").write_text("one\n")
+    (workspace / "b.txt").write_text("two\n")
+    diff = (
+        "--- a.txt\n+++ a.txt\n@@ -1,3 +1,2 @@\n-one\n+ONE\n"
+        "--- b.txt\n+++ b.txt\n@@ -1 +1 @@\n-two\n+TWO\n"
+    )
+    assert [fp.path for fp in parse_patch(diff)] == ["a.txt", "b.txt"]
+    apply_patch(diff)
+    assert (workspace / "a.txt").read_text() == "ONE\n"
+    assert (workspace / "b.txt").read_text() == "TWO\n"
+
+
+def test_missing_trailing_blank_context_line(workspace):
+    (workspace / "a.py").write_text("def f():\n    return 1\n\n\ndef g():\n")
+    # The header counts 4 old lines, but the sender dropped the blank last one.
+    diff = (
+        "--- a.py\n+++ a.py\n@@ -1,4 +1,4 @@\n"
+        " def f():\n-    return 1\n+    return 2\n \n"
+    )
+    assert parse_patch(diff)[0].hunks[0].old == ["def f():", "    return 1", "", ""]
+    apply_patch(diff)
+    assert (workspace / "a.py").read_text() == "def f():\n    return 2\n\n\ndef g():\n"
+
+
+def test_fuzzy_context_keeps_the_file_lines(workspace):
+    (workspace / "a.py").write_text("if x:\n\tcall()  \n\tdone()\n")
+    diff = (
+        "--- a.py\n+++ a.py\n@@ -1,3 +1,3 @@\n"
+        " if x:\n-    call()\n+\tcall(1)\n     done()\n"
+    )
+    assert "matched ignoring indentation" in apply_patch(diff)
+    assert (workspace / "a.py").read_text() == "if x:\n\tcall(1)\n\tdone()\n"
+
+
+def test_failure_changes_nothing(workspace):
+    (workspace / "a.txt").write_text(_lines(5))
+    (workspace / "b.txt").write_text(_lines(5))
+    diff = (
+        "--- a.txt\n+++ a.txt\n@@ -1,2 +1,2 @@\n-line 1\n+LINE 1\n line 2\n"
+        "--- b.txt\n+++ b.txt\n@@ -2,2 +2,2 @@\n line 2\n-line 9\n+LINE 9\n"
+    )
+    with pytest.raises(PatchError) as err:
+        apply_patch(diff)
+    message = str(err.value)
+    assert message.startswith("patch not applied, no file was changed:")
+    assert "b.txt hunk 1" in message and "closest match at line 2" in message
+    assert "a.txt" not in message.split("\n", 1)[1]
+    assert (workspace / "a.txt").read_text() == _lines(5)
+    assert (workspace / "b.txt").read_text() == _lines(5)
+    assert sorted(os.listdir(workspace)) == ["a.txt", "b.txt"]
+
+
+def test_crlf_is_kept(workspace):
+    (workspace / "a.txt").write_bytes(b"one\r\ntwo\r\n")
+    apply_patch("--- a.txt\n+++ a.txt\n@@ -1,2 +1,2 @@\n one\n-two\n+three\n")
+    assert (workspace / "a.txt").read_bytes() == b"one\r\nthree\r\n"
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="needs symlinks")
+def test_patches_through_symlink(workspace):
+    (workspace / "real").write_text("hello\n")
+    os.symlink("real", workspace / "link")
+    assert apply_patch("--- link\n+++ link\n@@ -1 +1 @@\n-hello\n+bye\n") == (
+        "ok: patched link (1 hunk)"
+    )
+    assert os.path.islink(workspace / "link")
+    assert (workspace / "real").read_text() == "bye\n"
+
+
+@pytest.mark.skipif(not hasattr(os, "link"), reason="needs hard links")
+def test_patch_keeps_hard_links(workspace):
+    (workspace / "a.txt").write_text("hello\n")
+    os.link(workspace / "a.txt", workspace / "b.txt")
+    apply_patch("--- a.txt\n+++ a.txt\n@@ -1 +1 @@\n-hello\n+bye\n")
+    assert (workspace / "b.txt").read_text() == "bye\n"
+    assert os.path.samefile(workspace / "a.txt", workspace / "b.txt")
@@ -0,0 +1,137 @@
+"""Isolated plugin tools: worker reuse, timeouts, crashes and the memory limit."""
+
+import os
+import textwrap
+import time
+
+import pytest
+
+from neumann import pluginpool
+from neumann.pluginpool import PluginPool
+
+_PLUGIN = textwrap.dedent(
+    """
+    import os
+    import subprocess
+    import sys
+    import time
+
+
+    class Echo:
+        name = "echo"
+        description = "echo"
+        parameters = {"text": "string"}
+
+        def run(self, args):
+            return f"{os.getpid()} {args['text']}"
+
+
+    class Sleep:
+        name = "sleep"
+        description = "sleep"
+        parameters = {}
+
+        def run(self, args):
+            # A background child in the same process group, as a shell leaves.
+            child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+            print(child.pid, flush=True)
+            time.sleep(60)
+
+
+    class Boom:
+        name = "boom"
+        description = "boom"
+        parameters = {}
+
+        def run(self, args):
+            raise ValueError("bad input")
+
+
+    class Exit:
+        name = "exit"
+        description = "exit"
+        parameters = {}
+
+        def run(self, args):
+            os._exit(3)
+
+
+    class Hog:
+        name = "hog"
+        description = "hog"
+        parameters = {}
+
+        def run(self, args):
+            return str(len(bytearray(1024 * 1024 * 1024)))
+    """
+)
+
+
+@pytest.fixture
+def plugin(tmp_path):
+    path = tmp_path / "tools.py"
+    path.write_text(_PLUGIN)
+    return str(path)
+
+
+@pytest.fixture
+def pool():
+    pool = PluginPool(size=1, timeout=2.0, memory_mb=512)
+    yield pool
+    pool.close()
+
+
+def _echo(pool, plugin, text="hi"):
+    pid, echoed = pool.call("echo", plugin, "Echo", {"text": text}).split()
+    assert echoed == text
+    return int(pid)
+
+
+def _alive(pid, wait=2.0):
+    # An orphaned child lingers until init reaps it.
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def test_worker_is_reused(pool, plugin):
+    assert _echo(pool, plugin) == _echo(pool, plugin, "again")
+
+
+def test_tool_errors_keep_the_worker(pool, plugin):
+    pid = _echo(pool, plugin)
+    assert pool.call("boom", plugin, "Boom", {}) == "error: ValueError: bad input"
+    assert _echo(pool, plugin) == pid
+
+
+@pytest.mark.skipif(not hasattr(os, "killpg"), reason="needs process groups")
+def test_timeout_kills_the_worker_group(pool, plugin, capfd):
+    pid = _echo(pool, plugin)
+    pool.timeout = 0.5
+    result = pool.call("sleep", plugin, "Sleep", {})
+    assert result.startswith("error: sleep: timed out after 0.5s")
+    assert result.endswith("will restart")
+    child = int(capfd.readouterr().err.split()[-1])  # tool prints go to stderr
+    assert not _alive(pid)
+    assert not _alive(child)
+    pool.timeout = 2.0
+    assert _echo(pool, plugin) != pid
+
+
+def test_crashed_worker_is_replaced(pool, plugin):
+    pid = _echo(pool, plugin)
+    result = pool.call("exit", plugin, "Exit", {})
+    assert "the worker exited with status 3" in result
+    assert _echo(pool, plugin) != pid
+
+
+@pytest.mark.skipif(pluginpool.resource is None, reason="needs RLIMIT_AS")
+def test_memory_limit(pool, plugin):
+    pid = _echo(pool, plugin)
+    assert pool.call("hog", plugin, "Hog", {}) == "error: out of memory (limit 512 MB)"
+    assert _echo(pool, plugin) == pid
@@ -0,0 +1,56 @@
+"""StreamRenderer's markdown bold state across delta boundaries."""
+
+import io
+
+import pytest
+
+from neumann.constants import BOLD, RESET
+from neumann.render import StreamRenderer
+
+_TEXTS = [
+    "plain **bold** text\n",
+    "a *single* star and **two words**",
+    "**open across\na line** closed",
+    "**open\n\nended by the paragraph break",
+    "x ** y ** z\n\n**q**",
+]
+
+
+def _render(chunks, tty=True):
+    out = io.StringIO()
+    renderer = StreamRenderer(out, fps=0, tty=tty)
+    for chunk in chunks:
+        renderer.write(chunk)
+    renderer.close()
+    return out.getvalue()
+
+
+def test_bold_markers():
+    assert _render(["say **hi** now"]) == f"say {BOLD}hi{RESET} now"
+
+
+@pytest.mark.parametrize("text", _TEXTS)
+def test_any_split_renders_like_the_whole(text):
+    whole = _render([text])
+    for i in range(1, len(text)):
+        assert _render([text[:i], text[i:]]) == whole, (text[:i], text[i:])
+    assert _render(list(text)) == whole
+
+
+def test_paragraph_break_ends_bold():
+    assert _render(["**a\n", "\nb"]) == f"{BOLD}a\n{RESET}\nb"
+    assert _render(["**a\n\nb"]) == f"{BOLD}a\n{RESET}\nb"
+
+
+def test_bold_survives_a_single_line_break():
+    assert _render(["**a\n", "b**"]) == f"{BOLD}a\nb{RESET}"
+
+
+def test_close_resets_unclosed_markup():
+    assert _render(["**open"]) == f"{BOLD}open{RESET}"
+    assert _render(["trailing *"]) == "trailing *"
+
+
+def test_non_tty_passes_text_through():
+    text = "**bold** and *star*"
+    assert _render([text[:3], text[3:]], tty=False) == text
@@ -0,0 +1,49 @@
+"""RequestBuilder: a prompt prefix that stays the same between requests."""
+
+from neumann.context import ContextManager
+from neumann.request import RequestBuilder
+
+
+def _history(turns, size=300):
+    messages = []
+    for i in range(turns):
+        call = {
+            "id": f"call_{i}",
+            "type": "function",
+            "function": {"name": "read", "arguments": f'{{"path": "f{i}.py"}}'},
+        }
+        messages += [
+            {"role": "user", "content": f"question {i}"},
+            {"role": "assistant", "content": "", "tool_calls": [call]},
+            {"role": "tool", "tool_call_id": f"call_{i}", "content": f"{i}" * size},
+            {"role": "assistant", "content": f"answer {i}"},
+        ]
+    return messages
+
+
+def test_compaction_is_sticky_and_keeps_the_prefix():
+    messages = _history(4)
+    builder = RequestBuilder("system", ContextManager(budget=400))
+    first, report = builder.build(messages)
+    assert report.compacted > 0
+    assert report.changed_at is None  # nothing was sent before
+
+    # The next request only appends, so the previous payload is its prefix.
+    messages.append({"role": "user", "content": "one more"})
+    second, report = builder.build(messages)
+    assert second["messages"][: len(first["messages"])] == first["messages"]
+    assert report.changed_at is None
+    assert 0 < report.reused < report.tokens
+    assert f"~{report.tokens - report.reused:,} new" in str(report)
+
+
+def test_changed_history_is_reported():
+    messages = _history(2)
+    builder = RequestBuilder("system")
+    builder.build(messages)
+    messages[5]["content"] = "edited"
+    body, report = builder.build(messages)
+    assert report.changed_at == 6  # the system prompt comes first
+    assert body["cache_prompt"] is True and body["stream"] is True
+    body, _ = RequestBuilder("system", cache_prompt=False).build(messages, stream=False)
+    assert "cache_prompt" not in body and body["stream"] is False
@@ -0,0 +1,108 @@
+"""The bash tool's runner: deadlines, the output cap, group kills and sessions."""
+
+import os
+import time
+
+import pytest
+
+from neumann.shell import OutputBuffer, ShellSession, run_command
+from neumann.tools import BashTool
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(os, "killpg"), reason="needs process groups"
+)
+
+
+def _alive(pid, wait=2.0):
+    # A killed grandchild lingers until init reaps it.
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+@pytest.fixture
+def session():
+    session = ShellSession()
+    yield session
+    session.close()
+
+
+def test_output_and_status():
+    assert run_command("echo hi; echo err >&2; exit 3", 5, 1000) == ("hi\nerr\n", 3)
+
+
+def test_deadline_holds_for_silent_commands():
+    start = time.monotonic()
+    output, status = run_command("echo started; sleep 30", 0.5, 1000)
+    assert (output, status) == ("started\n", None)
+    assert time.monotonic() - start < 5
+
+
+def test_deadline_holds_after_output_is_closed():
+    start = time.monotonic()
+    assert run_command("exec >&-; sleep 30", 0.5, 1000) == ("", None)
+    assert time.monotonic() - start < 5
+
+
+def test_timeout_kills_the_whole_group():
+    output, status = run_command("sleep 60 & echo $!; wait", 0.5, 1000)
+    assert status is None
+    assert not _alive(int(output))
+
+
+def test_output_is_capped_in_the_middle():
+    output, status = run_command("seq 1 100000", 10, 1000)
+    assert status == 0
+    head, omitted, tail = output.partition("\n... (")
+    assert head.startswith("1\n2\n3\n") and tail.endswith("99999\n100000\n")
+    assert omitted and "bytes omitted) ...\n" in tail
+    assert len(head) + len(tail) < 1100
+
+
+def test_echo_stops_once_the_head_is_full():
+    lines = []
+    out = OutputBuffer(20, lines.append)
+    out.write(b"one\ntwo\nthr")
+    out.write(b"ee\n" + b"x" * 50)
+    out.write(b"more\n")
+    out.flush()
+    assert lines == ["one", "two", "... (output continues)"]
+    assert out.text() == "one\ntwo\nth\n... (49 bytes omitted) ...\nxxxxxmore\n"
+
+
+def test_session_keeps_shell_state(session):
+    assert session.run("cd /; export NEU_TEST=1", 5, 1000) == ("", 0, False)
+    assert session.run("pwd; echo $NEU_TEST", 5, 1000) == ("/\n1\n", 0, False)
+    assert session.run("false", 5, 1000) == ("", 1, False)
+
+
+def test_session_survives_syntax_errors_and_stdin_reads(session):
+    _, status, restarted = session.run("if then", 5, 1000)
+    assert status != 0 and not restarted
+    assert session.run("cat; echo after", 5, 1000) == ("after\n", 0, False)
+
+
+def test_session_restarts_after_exit_and_timeout(session):
+    session.run("cd /", 5, 1000)
+    assert session.run("exit 4", 5, 1000) == ("", 4, True)
+    assert session.run("pwd", 5, 1000)[0] != "/\n"
+    session.run("cd /", 5, 1000)
+    output, status, restarted = session.run("sleep 60 & echo $!; wait", 0.5, 1000)
+    assert (status, restarted) == (None, True)
+    assert not _alive(int(output))
+    assert session.run("pwd", 5, 1000)[0] != "/\n"
+
+
+def test_bash_tool_reports_timeouts(monkeypatch):
+    monkeypatch.setattr("builtins.print", lambda *args, **kwargs: None)
+    tool = BashTool()
+    assert tool.run({"cmd": "echo out; sleep 30", "timeout": 1}) == (
+        "out\n(timed out after 1s; process group killed)"
+    )
+    assert tool.run({"cmd": "exit 2"}) == "(exit status 2)"
+    assert tool.run({"cmd": "true"}) == "(empty)"
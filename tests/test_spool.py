@@ -0,0 +1,79 @@
+"""Spooled tool output and paging it back with the page tool."""
+
+import os
+
+import pytest
+
+from neumann.spool import Spool
+
+_TEXT = "\n".join(f"line {i}" for i in range(1, 101))
+
+
+@pytest.fixture
+def spool():
+    spool = Spool(threshold=200)
+    yield spool
+    spool.close()
+
+
+def test_short_results_pass_through(spool):
+    assert spool.fit("bash", "short") == "short"
+    assert spool.dir is None
+    assert Spool(threshold=0).fit("bash", _TEXT) == _TEXT
+
+
+def test_long_results_get_an_excerpt_and_handle(spool):
+    excerpt = spool.fit("bash", _TEXT)
+    assert excerpt.startswith('[bash output: 100 lines, 791 chars; saved as "out-1".')
+    assert "\nline 1\n" in excerpt and excerpt.endswith("\nline 100")
+    assert "line 50\n" not in excerpt
+    with open(spool.path("out-1"), encoding="utf-8") as f:
+        assert f.read() == _TEXT
+    assert spool.fit("bash", _TEXT).startswith(
+        '[bash output: 100 lines, 791 chars; saved as "out-2".'
+    )
+
+
+def test_page_by_lines(spool):
+    spool.fit("bash", _TEXT)
+    assert spool.page("out-1", offset=10, limit=3) == (
+        "  11| line 11\n  12| line 12\n  13| line 13\n"
+    )
+    first = spool.page("out-1")
+    assert len(first) <= 200 + 80  # the continuation note comes on top
+    assert first.endswith("(output limit reached; continue with offset=14)\n")
+
+
+def test_page_by_bytes(spool):
+    spool.fit("bash", _TEXT)
+    assert spool.page("out-1", byte_range="0-20") == "line 1\nline 2\nline 3"
+    assert spool.page("out-1", byte_range=f"{len(_TEXT) - 8}-") == "line 100"
+    capped = spool.page("out-1", byte_range="0-500")
+    assert capped.endswith("\n... (output limit reached; continue with bytes=200-)")
+    assert capped.startswith(_TEXT[:200])
+
+
+def test_page_by_pattern(spool):
+    spool.fit("bash", _TEXT)
+    assert spool.page("out-1", pat=r"line 9\d") == "".join(
+        f"  {n}| line {n}\n" for n in range(90, 100)
+    )
+    assert spool.page("out-1", pat="nothing") == "none"
+    capped = spool.page("out-1", pat="line")
+    assert capped.endswith("... (limit reached; more matches from line 15)\n")
+
+
+def test_unknown_handles(spool):
+    spool.fit("bash", _TEXT)
+    for handle in ("out-9", "../out-1", "out-1.txt"):
+        with pytest.raises(FileNotFoundError):
+            spool.page(handle)
+
+
+def test_close_removes_the_directory(spool):
+    spool.fit("bash", _TEXT)
+    directory = spool.dir
+    spool.close()
+    assert not os.path.exists(directory)
+    with pytest.raises(FileNotFoundError):
+        spool.page("out-1")
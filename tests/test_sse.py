@@ -0,0 +1,71 @@
+"""SSEParser against the vendored sseclient-py parser it replaced."""
+
+import random
+
+import pytest
+
+from neumann.sse import SSEClient, SSEParser
+from neumann.sse_client import SSEClient as VendoredSSEClient
+
+_VALUES = ["", "a", "hello world", "x: y", " lead", "[DONE]", '{"k": 1}', "é€"]
+
+
+def _random_stream(rng, eol):
+    lines = []
+    for _ in range(rng.randint(1, 6)):
+        for _ in range(rng.randint(1, 4)):
+            kind = rng.choice(["data", "data", "data", "event", "id", "comment"])
+            if kind == "comment":
+                lines.append(": " + rng.choice(_VALUES))
+            elif kind == "data" and rng.random() < 0.1:
+                lines.append("data")
+            else:
+                sep = rng.choice([": ", ":"])
+                lines.append(kind + sep + rng.choice(_VALUES))
+        lines.append("")
+    if rng.random() < 0.5:
+        lines.pop()  # the last event is ended by the end of the stream
+        if rng.random() < 0.5:
+            lines.append("")
+    return (eol.join(lines) + (eol if rng.random() < 0.7 else "")).encode()
+
+
+def _split(data, rng):
+    cuts = sorted(
+        rng.sample(range(1, len(data)), min(len(data) - 1, rng.randint(0, 8)))
+    )
+    return [data[i:j] for i, j in zip([0, *cuts], [*cuts, len(data)])]
+
+
+def _summary(events):
+    return [(e.event, e.data, e.id or None) for e in events]
+
+
+@pytest.mark.parametrize("eol", ["\n", "\r\n", "\r"])
+def test_matches_vendored_parser(eol):
+    rng = random.Random(eol)
+    for _ in range(500):
+        data = _random_stream(rng, eol)
+        expected = _summary(VendoredSSEClient([data]).events())
+        assert _summary(SSEClient(_split(data, rng)).events()) == expected, data
+
+
+@pytest.mark.parametrize(
+    "data, expected",
+    [
+        (b"data: [DONE]\n", ["[DONE]"]),
+        (b"data: a\ndata: b\n", ["a\nb"]),
+        (b"data: a\ndata: b", ["a\nb"]),
+        (b"data: a\n\ndata: b\n", ["a", "b"]),
+    ],
+)
+def test_flush_splits_unterminated_event(data, expected):
+    parser = SSEParser()
+    events = parser.feed(data) + parser.flush()
+    assert [e.data for e in events] == expected
+
+
+def test_switch_to_cr_keeps_buffered_lf_lines():
+    parser = SSEParser()
+    events = parser.feed(b"data: a\ndata: b") + parser.feed(b"\r\n\r\ndata: c\r\n\r\n")
+    assert [e.data for e in events] == ["a\nb", "c"]
@@ -0,0 +1,51 @@
+"""Python symbol index queries."""
+
+from neumann.symbols import SymbolIndex, parse_symbols
+
+SOURCE = b"""
+import json
+from .sse import SSEParser
+
+
+class SSEParser:
+    def feed(self, chunk):
+        self.feed(chunk)
+
+
+class Other:
+    def feed(self, text):
+        self.feed(text)
+
+
+def run(client, chunks):
+    parser = SSEParser()
+    other = Other()
+    parser.feed(b"")
+    other.feed("")
+    client.parser.feed(b"")
+    json.feed()
+    feed()
+"""
+
+
+def _index(tmp_path):
+    index = SymbolIndex(tmp_path)
+    index.files["m.py"] = (0, 0, *parse_symbols(SOURCE))
+    return index
+
+
+def test_qualified_calls_are_filtered_by_receiver(tmp_path, monkeypatch):
+    monkeypatch.setenv("NEU_CACHE_DIR", str(tmp_path / ".cache"))
+    calls = _index(tmp_path).query("SSEParser.feed", kind="call")
+    assert calls == [
+        "call   m.py:8  self.feed()  (in SSEParser.feed)",
+        "call   m.py:19  parser.feed()  (in run)",
+        "call?  m.py:21  client.parser.feed()  (in run)",
+    ]
+
+
+def test_bare_name_lists_every_call(tmp_path, monkeypatch):
+    monkeypatch.setenv("NEU_CACHE_DIR", str(tmp_path / ".cache"))
+    calls = _index(tmp_path).query("feed", kind="call")
+    assert len(calls) == 7
+    assert all(line.startswith("call ") for line in calls)
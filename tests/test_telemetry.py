@@ -0,0 +1,75 @@
+"""Request spans filled in by the stream loop, and the trace they end up in."""
+
+import asyncio
+import json
+
+import pytest
+
+from neumann.main import StreamState, aread_stream
+from neumann.sse import AsyncSSEClient
+from neumann.telemetry import RequestSpan, Telemetry
+
+
+def _delta(text):
+    return json.dumps({"choices": [{"delta": {"content": text}}]})
+
+
+async def _chunks(*events):
+    for data in events:
+        yield f"data: {data}\n\n".encode()
+
+
+def test_stream_fills_the_span(capsys):
+    span = RequestSpan()
+    client = AsyncSSEClient(_chunks(_delta("Hel"), _delta("lo"), "[DONE]"))
+    state = StreamState(span=span)
+    content, _, _ = asyncio.run(aread_stream(client, state=state))
+    assert content == "Hello"
+    assert (span.events, span.tokens) == (3, 2)
+    assert span.start <= span.first_event <= span.first_token
+    assert "Hello" in capsys.readouterr().out
+
+
+def test_trace_records_spans_and_the_turn(tmp_path):
+    trace = tmp_path / "trace.jsonl"
+    telemetry = Telemetry()
+    telemetry.open_trace(trace)
+    telemetry.begin_turn()
+
+    span = RequestSpan(prompt_tokens=100)
+    span.first_byte = span.start + 0.25
+    span.first_token = span.start + 0.5
+    span.end = span.start + 1.5
+    span.tokens = 11
+    telemetry.request(span)
+    telemetry.tool("read", 0.0, 0.25, "error: no such file")
+    summary = telemetry.end_turn()
+
+    records = [json.loads(line) for line in trace.read_text().splitlines()]
+    assert [r["type"] for r in records] == ["request", "tool", "turn"]
+    assert {r["session"] for r in records} == {telemetry.session}
+    assert {r["turn"] for r in records} == {1}
+    request, tool, turn = records
+    assert (request["ttfb_ms"], request["ttft_ms"]) == (250, 500)
+    assert request["tokens_per_s"] == 10
+    assert request["prompt_tokens_est"] == 100
+    assert (tool["name"], tool["duration_ms"], tool["error"]) == ("read", 250, True)
+    assert (turn["requests"], turn["tokens"], turn["tools"]) == (1, 11, 1)
+    assert "10.0 tok/s" in summary and "ttft 0.50s" in summary
+
+
+def test_spans_without_a_trace_still_count(tmp_path):
+    telemetry = Telemetry()
+    telemetry.begin_turn()
+    telemetry.tool("bash", 0.0, 1.0, "ok")
+    assert "1 tools 1.00s" in telemetry.end_turn()
+    telemetry.open_trace(tmp_path / "trace.jsonl")
+    telemetry.close()
+    telemetry.begin_turn()
+    telemetry.end_turn()
+    assert (tmp_path / "trace.jsonl").read_text() == ""
+
+
+def test_open_trace_reports_a_bad_path(tmp_path):
+    with pytest.raises(OSError):
+        Telemetry().open_trace(tmp_path / "missing" / "trace.jsonl")
@@ -0,0 +1,152 @@
+"""ToolResultCache: reuse, references to shown results, and invalidation."""
+
+import os
+
+import pytest
+
+from neumann.toolcache import ToolResultCache
+
+
+class Read:
+    read_only = True
+
+    def cache_state(self, args):
+        st = os.stat(args["path"])
+        return (st.st_mtime_ns, st.st_size)
+
+    def run(self, args):
+        try:
+            with open(args["path"]) as f:
+                return f.read()
+        except OSError as err:
+            return f"error: {err}"
+
+
+class Tree:
+    """A tree-wide read-only tool with no cache_state, like a listing."""
+
+    read_only = True
+
+    def __init__(self):
+        self.output = "a.txt b.txt"
+
+    def run(self, args):
+        return self.output
+
+
+class Write:
+    modifies = "path"
+
+    def run(self, args):
+        with open(args["path"], "w") as f:
+            f.write(args["text"])
+        return "ok"
+
+
+class Shell:
+    def run(self, args):
+        return "ok"
+
+
+@pytest.fixture
+def files(tmp_path):
+    for name in ("a.txt", "b.txt"):
+        (tmp_path / name).write_text(f"{name} contents\n")
+    return tmp_path
+
+
+class Session:
+    """A cache over the tools above that records which ones actually ran."""
+
+    def __init__(self, **kwargs):
+        self.tools = {
+            "read": Read(),
+            "tree": Tree(),
+            "write": Write(),
+            "shell": Shell(),
+        }
+        self.runs = []
+        self.cache = ToolResultCache(self.tools, **kwargs)
+
+    def _execute(self, name, args):
+        self.runs.append(name)
+        return self.tools[name].run(args)
+
+    def call(self, name, **args):
+        return self.cache.run(name, args, self._execute)
+
+    def __getattr__(self, attr):
+        return getattr(self.cache, attr)
+
+
+@pytest.fixture
+def cache():
+    return Session()
+
+
+def test_unchanged_state_reuses_the_result(cache, files):
+    a = str(files / "a.txt")
+    assert cache.call("read", path=a) == "a.txt contents\n"
+    assert cache.call("read", path=a) == "a.txt contents\n"
+    assert cache.runs == ["read"]
+    (files / "a.txt").write_text("changed, and longer\n")
+    assert cache.call("read", path=a) == "changed, and longer\n"
+    assert cache.runs == ["read", "read"]
+
+
+def test_shown_results_become_references(cache, files):
+    a = str(files / "a.txt")
+    result = cache.call("read", path=a)
+    cache.mark_shown(result, "call_1")
+    assert "tool call call_1" in cache.call("read", path=a)
+
+    # Compacting another copy of the same text doesn't affect call_1.
+    cache.forget({"tool_call_id": "call_2", "content": result})
+    assert "tool call call_1" in cache.call("read", path=a)
+    cache.forget({"tool_call_id": "call_1", "content": result})
+    assert cache.call("read", path=a) == result
+
+
+def test_tools_without_state_rerun_but_still_reference(cache):
+    result = cache.call("tree")
+    cache.mark_shown(result, "call_1")
+    assert "tool call call_1" in cache.call("tree")
+    cache.tools["tree"].output = "a.txt b.txt c.txt"
+    assert cache.call("tree") == "a.txt b.txt c.txt"
+    assert cache.runs == ["tree"] * 3
+
+
+def test_write_drops_its_file_and_tree_wide_entries(cache, files):
+    a, b = str(files / "a.txt"), str(files / "b.txt")
+    cache.call("read", path=a)
+    cache.call("read", path=b)
+    cache.call("tree")
+    cache.runs.clear()
+
+    assert cache.call("write", path=a, text="new\n") == "ok"
+    cache.call("read", path=a)
+    cache.call("read", path=b)
+    cache.call("tree")
+    assert cache.runs == ["write", "read", "tree"]
+
+
+def test_other_tools_clear_everything(cache, files):
+    a = str(files / "a.txt")
+    cache.call("read", path=a)
+    cache.call("shell")
+    cache.call("read", path=a)
+    assert cache.runs == ["read", "shell", "read"]
+
+
+def test_errors_are_not_cached(cache, files):
+    missing = str(files / "missing.txt")
+    assert cache.call("read", path=missing).startswith("error:")
+    (files / "missing.txt").write_text("here now\n")
+    assert cache.call("read", path=missing) == "here now\n"
+
+
+def test_size_cap_evicts_least_recently_used(files):
+    cache = Session(max_bytes=len("a.txt contents\n") + 1)
+    for name in ("a.txt", "b.txt", "b.txt", "a.txt"):
+        cache.call("read", path=str(files / name))
+    assert cache.runs == ["read"] * 3
@@ -0,0 +1,106 @@
+"""Workspace snapshot, and the tools and indexes that read through it."""
+
+import os
+
+import pytest
+
+from neumann import grep as grep_engine
+from neumann import main
+from neumann.snapshot import get_snapshot, invalidate_all
+from neumann.tools import TOOL_REGISTRY, GlobTool, GrepTool
+from neumann.trigram import TrigramIndex
+from neumann.walk import flush_indexes
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("NEU_CACHE_DIR", str(tmp_path / ".cache"))
+    (tmp_path / ".gitignore").write_text(".cache/\nbuild/\n")
+    (tmp_path / "a.txt").write_text("hello\n")
+    return tmp_path
+
+
+def _rewrite_in_place(path, text):
+    # Keeps the directory's mtime, as an editor saving in place does.
+    directory = os.path.dirname(os.path.abspath(path))
+    before = os.stat(directory)
+    with open(path, "w") as f:
+        f.write(text)
+    os.utime(directory, ns=(before.st_atime_ns, before.st_mtime_ns))
+
+
+def test_indexed_grep_sees_in_place_edits_from_the_next_turn(workspace):
+    grep = GrepTool()
+    grep.use_index = True
+    assert "hello" in grep.run({"pat": "hello"})
+    _rewrite_in_place("a.txt", "goodbye\n")
+    invalidate_all()  # as the session does when a turn starts
+    assert "goodbye" in grep.run({"pat": "goodbye"})
+    assert grep.run({"pat": "hello"}) == "none"
+
+
+def test_index_saves_are_deferred(workspace, monkeypatch):
+    saves = []
+    monkeypatch.setattr(TrigramIndex, "save", lambda index: saves.append(index))
+    grep = GrepTool()
+    grep.use_index = True
+    grep.run({"pat": "hello"})
+    assert saves == [grep._index]  # the first build is written at once
+    (workspace / "b.txt").write_text("hello again\n")
+    assert "b.txt" in grep.run({"pat": "hello"})
+    assert saves.count(grep._index) == 1
+    flush_indexes()
+    assert saves.count(grep._index) == 2
+    flush_indexes()
+    assert saves.count(grep._index) == 2
+
+
+def test_grep_streams_large_files(workspace, monkeypatch):
+    (workspace / "big.txt").write_text("x\r\nhello there\rend\n")
+    monkeypatch.setattr(grep_engine, "GREP_READ_MAX", 4)
+    hits = GrepTool().run({"pat": "hello"}).splitlines()
+    assert sorted(hits) == ["./a.txt:1:hello", "./big.txt:2:hello there"]
+
+
+def test_glob_finds_ignored_files(workspace):
+    (workspace / "build").mkdir()
+    (workspace / "build" / "out.js").write_text("")
+    assert GlobTool().run({"pat": "build/*"}) == os.path.join(".", "build/out.js")
+    assert GlobTool().run({"pat": "*.txt"}) == os.path.join(".", "a.txt")
+
+
+def test_tools_that_write_invalidate_the_snapshot(workspace, monkeypatch):
+    class Plugin:
+        name = "plugin"
+
+        def run(self, args):
+            _rewrite_in_place("a.txt", "a longer line\n")
+            return "ok"
+
+    monkeypatch.setitem(TOOL_REGISTRY, "plugin", Plugin())
+    get_snapshot().walk()
+    assert main._run_tool("plugin", {}) == "ok"
+    sizes = {rel: st.st_size for rel, st in get_snapshot().walk()}
+    assert sizes["a.txt"] == len("a longer line\n")
+
+
+@pytest.mark.parametrize("use_index", [False, True])
+def test_cached_grep_sees_new_matches(workspace, use_index):
+    from neumann.toolcache import ToolResultCache
+
+    grep = GrepTool()
+    grep.use_index = use_index
+    cache = ToolResultCache({"grep": grep})
+    runs = []
+
+    def execute(name, args):
+        runs.append(args)
+        return grep.run(args)
+
+    first = cache.run("grep", {"pat": "hello"}, execute)
+    assert "a.txt" in first
+    assert cache.run("grep", {"pat": "hello"}, execute) == first
+    (workspace / "b.txt").write_text("hello again\n")
+    assert "b.txt" in cache.run("grep", {"pat": "hello"}, execute)
+    assert len(runs) == 2